@@ -0,0 +1,53 @@
+"""
+Measure how long create_scans() takes to group batch inputs of different
+sizes, the time per URL should be roughly constant (linear scaling) when the
+number of lines and hosts grows. When `workers` is set the URLs are grouped
+using create_scans_parallel() with that number of processes.
+
+    python -m ci.benchmarks.batch_grouping [max_lines] [workers]
+"""
+import sys
+import time
+
+from tagcube_cli.subcommands.batch import create_scans, create_scans_parallel
+
+# Roughly the ratio found in our crawler dumps: 1M lines, 50k hosts
+LINES_PER_HOST = 20
+
+
+def generate_urls(lines):
+    hosts = max(1, lines / LINES_PER_HOST)
+
+    for i in xrange(lines):
+        yield 'http://host-%s.example.com/path/%s/index.html' % (i % hosts, i)
+
+
+def benchmark(lines, workers=None):
+    urls = list(generate_urls(lines))
+
+    start = time.time()
+    if workers is None:
+        scans = create_scans(urls)
+    else:
+        scans = create_scans_parallel(urls, workers)
+    spent = time.time() - start
+
+    return len(scans), spent
+
+
+def main():
+    max_lines = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    print('%10s %10s %10s %14s' % ('lines', 'hosts', 'seconds', 'usec/line'))
+
+    lines = 10000
+    while lines <= max_lines:
+        hosts, spent = benchmark(lines, workers)
+        args = (lines, hosts, spent, spent * 1e6 / lines)
+        print('%10s %10s %10.2f %14.2f' % args)
+        lines *= 10
+
+
+if __name__ == '__main__':
+    main()
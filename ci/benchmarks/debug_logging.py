@@ -0,0 +1,74 @@
+"""
+Measure the time TagCubeClient.handle_response() spends on large responses
+when the debug output is disabled (the default), compared with the previous
+implementation which always pretty printed the response for the debug log.
+
+    python -m ci.benchmarks.debug_logging [objects] [iterations]
+"""
+import sys
+import json
+import time
+
+from tagcube.client.api import TagCubeClient
+
+
+class FakeResponse(object):
+    status_code = 200
+
+    def __init__(self, json_data):
+        self.content = json.dumps(json_data)
+
+
+def get_scan_listing(objects):
+    """
+    :return: A page of scans, each with a long list of vulnerabilities
+    """
+    scan = {'id': 1,
+            'href': '/1.0/scans/1',
+            'status': 'finished',
+            'vulnerabilities_href': ['/1.0/vulnerabilities/%s' % i
+                                     for i in xrange(50)]}
+
+    return {'meta': {'limit': objects, 'next': None, 'offset': 0,
+                     'previous': None, 'total_count': objects},
+            'objects': [dict(scan, id=i) for i in xrange(objects)]}
+
+
+def legacy_handle_response(client, url, response):
+    json_data = json.loads(response.content)
+    pretty_json = json.dumps(json_data, indent=4)
+    msg = 'Received %s HTTP response from the wire:\n%s'
+    msg % (response.status_code, pretty_json)
+    client.handle_api_errors(response.status_code, json_data)
+    return response.status_code, json_data
+
+
+def benchmark(func, iterations):
+    start = time.time()
+
+    for _ in xrange(iterations):
+        func()
+
+    return (time.time() - start) / iterations
+
+
+def main():
+    objects = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    client = TagCubeClient('x@y.com', 'key', verbose=False)
+    response = FakeResponse(get_scan_listing(objects))
+    url = client.build_full_url('/scans/')
+
+    legacy = benchmark(lambda: legacy_handle_response(client, url, response),
+                       iterations)
+    lazy = benchmark(lambda: client.handle_response(url, response),
+                     iterations)
+
+    print('%20s %14s' % ('implementation', 'msec/response'))
+    print('%20s %14.2f' % ('eager (legacy)', legacy * 1000))
+    print('%20s %14.2f' % ('lazy', lazy * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Compare decoding a large scan listing using requests' response.json() (the
+previous implementation) with each of the JSON backends which are installed.
+
+    python -m ci.benchmarks.json_codec [objects] [iterations]
+"""
+import sys
+import json
+import time
+
+from requests.models import Response
+
+from tagcube.utils.json_codec import JSON_BACKENDS, get_json_codec
+from ci.benchmarks.debug_logging import get_scan_listing
+
+
+def get_response(json_data):
+    response = Response()
+    response.status_code = 200
+    response.headers['Content-Type'] = 'application/json'
+    response._content = json.dumps(json_data)
+    return response
+
+
+def benchmark(func, iterations):
+    start = time.time()
+
+    for _ in xrange(iterations):
+        func()
+
+    return (time.time() - start) / iterations
+
+
+def main():
+    objects = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    response = get_response(get_scan_listing(objects))
+
+    print('%20s %14s' % ('decoder', 'msec/response'))
+
+    spent = benchmark(response.json, iterations)
+    print('%20s %14.2f' % ('response.json()', spent * 1000))
+
+    for backend in JSON_BACKENDS:
+        try:
+            codec = get_json_codec(backend)
+        except ImportError:
+            print('%20s %14s' % (backend, 'not installed'))
+            continue
+
+        spent = benchmark(lambda: codec.loads(response.content), iterations)
+        print('%20s %14.2f' % (backend, spent * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Compare the memory used to keep many scan records in memory with the
+previous Resource implementation (self.__dict__ = self), the cycle-free
+Resource and the slotted Scan model.
+
+    python -m ci.benchmarks.resources [records]
+
+The size is the shallow size of the containers (sys.getsizeof), the values
+are shared by all the implementations. "cyclic garbage" is the number of
+objects which are only released by the cyclic GC after the records are
+deleted.
+"""
+import gc
+import sys
+import time
+
+from tagcube.utils.resource import Resource, Scan
+
+
+class LegacyResource(dict):
+    """
+    The previous implementation, kept here as the baseline
+    """
+    def __init__(self, *args, **kwargs):
+        super(LegacyResource, self).__init__(*args, **kwargs)
+        self.__dict__ = self
+
+
+def get_scan_records(records):
+    return [{'id': i,
+             'href': '/1.0/scans/%s' % i,
+             'status': 'finished',
+             'progress': 100,
+             'verification_href': '/1.0/verifications/%s' % i,
+             'profile_href': '/1.0/profiles/1',
+             'email_notifications_href': []}
+            for i in xrange(records)]
+
+
+def get_size(obj):
+    size = sys.getsizeof(obj)
+
+    extra = getattr(obj, '_extra', None)
+    if extra is not None:
+        size += sys.getsizeof(extra)
+
+    return size
+
+
+def measure(resource_type, records):
+    gc.collect()
+    gc.disable()
+
+    try:
+        start = time.time()
+        resources = [resource_type(record) for record in records]
+        spent = time.time() - start
+
+        size = sum(get_size(resource) for resource in resources)
+
+        del resources
+        garbage = gc.collect()
+    finally:
+        gc.enable()
+
+    return size, spent, garbage
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    records = get_scan_records(count)
+
+    print('%16s %14s %14s %16s' % ('type', 'bytes/record', 'usec/record',
+                                   'cyclic garbage'))
+
+    for resource_type in (LegacyResource, Resource, Scan):
+        size, spent, garbage = measure(resource_type, records)
+        print('%16s %14.1f %14.2f %16s' % (resource_type.__name__,
+                                           float(size) / count,
+                                           spent * 1e6 / count,
+                                           garbage))
+
+
+if __name__ == '__main__':
+    main()
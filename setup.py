@@ -39,7 +39,7 @@ setup(
 
     packages=find_packages(exclude=('ci',)),
     include_package_data=True,
-    install_requires=['requests[security]>=2.3.0',
+    install_requires=['requests[security]>=2.4.0',
                       'PyYAML>=3.11'],
 
     entry_points={
@@ -1,9 +1,14 @@
 import os
+import time
+import threading
 import requests
 import logging
 import json
 import urllib
 
+from multiprocessing.pool import ThreadPool
+from requests.exceptions import ConnectionError, Timeout, RequestException
+
 # These two lines enable debugging at httplib level
 # (requests->urllib3->http.client) You will see the REQUEST, including HEADERS
 # and DATA, and RESPONSE with HEADERS but without DATA.
@@ -16,12 +21,29 @@ except ImportError:
 
 
 from tagcube import __VERSION__
-from tagcube.utils.exceptions import TagCubeAPIException, IncorrectAPICredentials
-from tagcube.utils.resource import Resource
+from tagcube.utils.exceptions import (TagCubeAPIException,
+                                      IncorrectAPICredentials,
+                                      TagCubeNotFoundException,
+                                      TagCubeInvalidHrefException,
+                                      TagCubeClientException)
+from tagcube.utils.resource import Resource, ResourceDict
+from tagcube.utils.sanitize import (install_stdout_sanitizer,
+                                    uninstall_stdout_sanitizer)
+from tagcube.utils.retry import RetryPolicy
+from tagcube.utils.http_adapter import TagCubeHTTPAdapter
+from tagcube.utils.polling import PollInterval, PollState
+from tagcube.utils.cache import (ResourceCache, DiskStore, get_cache_key,
+                                 get_disk_cache_filename)
+from tagcube.utils.http_cache import HTTPCache
+from tagcube.utils.json_codec import get_json_codec
+from tagcube.utils.json_stream import StreamedPage
 from tagcube.utils.result_handlers import (ONE_RESULT, LATEST_RESULT,
-                                           RESULT_HANDLERS)
-from tagcube.utils.urlparsing import (get_domain_from_url, use_ssl,
-                                      get_port_from_url)
+                                           ITER_RESULTS, RESULT_HANDLERS,
+                                           iter_objects_from_pages,
+                                           iter_objects_from_streamed_pages,
+                                           get_objects_from_json,
+                                           is_latest_first)
+from tagcube.utils.urlparsing import parse_url
 
 api_logger = logging.getLogger(__name__)
 
@@ -58,14 +80,113 @@ class TagCubeClient(object):
 
     DESCRIPTION = 'Created by TagCube REST API client'
 
-    def __init__(self, email, api_key, verbose=False):
+    # Resource lookups (profiles, domains, notifications, etc.) are cached for
+    # this amount of seconds
+    DEFAULT_CACHE_TTL = 300
+    DEFAULT_CACHE_SIZE = 1024
+    DEFAULT_CACHE_DIR = '~/.tagcube-cache/'
+
+    # Max number of GET responses stored to send conditional requests, see
+    # HTTPCache
+    DEFAULT_HTTP_CACHE_SIZE = 256
+
+    # HTTP connection pool and (connect, read) timeouts in seconds
+    DEFAULT_POOL_CONNECTIONS = 10
+    DEFAULT_POOL_MAXSIZE = 10
+    DEFAULT_TIMEOUT = (10, 120)
+
+    # get_scans() queries this number of ids at once, or sends up to this
+    # number of requests in parallel if the REST API doesn't support id__in
+    DEFAULT_BULK_CHUNK_SIZE = 100
+    DEFAULT_BULK_CONCURRENCY = 8
+
+    # Scan resource fields used by wait_for_scans()
+    SCAN_STATUS_FIELD = 'status'
+    SCAN_PROGRESS_FIELD = 'progress'
+    SCAN_FINISHED_STATUSES = ('finished', 'failed', 'stopped', 'cancelled')
+
+    # Seconds between scan status polls, see PollInterval
+    DEFAULT_POLL_MIN_INTERVAL = 5
+    DEFAULT_POLL_MAX_INTERVAL = 120
+
+    # Threads shared by all quick_scan() calls to send the scan profile and
+    # email notification lookups in parallel
+    LOOKUP_THREADS = 4
+
+    def __init__(self, email, api_key, verbose=False,
+                 cache_ttl=DEFAULT_CACHE_TTL, cache_size=DEFAULT_CACHE_SIZE,
+                 cache_dir=None, retry_policy=None, rate_limiter=None,
+                 pool_connections=DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE, timeout=DEFAULT_TIMEOUT,
+                 keep_alive=True, http_cache_size=DEFAULT_HTTP_CACHE_SIZE,
+                 debug_body_limit=None, json_codec=None):
+        """
+        :param cache_dir: When set, resource lookups and HTTP responses are
+                          also cached in this directory and shared between
+                          processes which use the same credentials and REST
+                          API root URL.
+        :param retry_policy: A RetryPolicy instance which defines how failed
+                             requests are retried. By default GET requests are
+                             sent up to three times.
+        :param rate_limiter: A TokenBucket (or FileTokenBucket, to share the
+                             limit with other processes) which is used to
+                             limit the number of requests per second sent
+                             to the REST API. No limit is applied when None.
+        :param http_cache_size: The max number of GET responses to store in
+                                the HTTPCache, zero disables conditional
+                                requests.
+        :param debug_body_limit: The max number of characters of each
+                                 response body to write to the debug output,
+                                 None writes the whole body.
+        :param json_codec: The JSONCodec used to encode and decode the REST
+                           API requests and responses, by default the
+                           fastest JSON library which is installed is used
+                           to decode (see get_json_codec).
+
+        See configure_requests() for the HTTP connection parameters.
+        """
         self.email = email
         self.api_key = api_key
         self.session = None
+        self.timeout = None
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.rate_limiter = rate_limiter
+        self.debug_body_limit = debug_body_limit
+        self.json_codec = json_codec or get_json_codec()
+
+        # Set by get_scans() and get_latest_verification(), None until we
+        # know if the REST API supports id__in filters and order_by
+        self.supports_id_in = None
+        self.supports_order_by = None
+
+        # Created by get_lookup_pool() when quick_scan() is first called
+        self._lookup_pool = None
+        self._lookup_pool_lock = threading.Lock()
 
         self.root_url = os.environ.get('ROOT_URL', self.DEFAULT_ROOT_URL)
         self.verify = self.root_url == self.DEFAULT_ROOT_URL
 
+        store = None
+        if cache_dir is not None:
+            filename = get_disk_cache_filename(cache_dir, email, api_key,
+                                               self.root_url)
+            store = DiskStore(filename, max_size=cache_size)
+
+        self.cache = ResourceCache(ttl=cache_ttl, max_size=cache_size,
+                                   store=store)
+
+        self.http_cache = None
+        if http_cache_size > 0:
+            http_store = None
+            if cache_dir is not None:
+                filename = get_disk_cache_filename(cache_dir, email, api_key,
+                                                   self.root_url,
+                                                   suffix='-http')
+                http_store = DiskStore(filename, max_size=http_cache_size)
+
+            self.http_cache = HTTPCache(max_size=http_cache_size,
+                                        store=http_store)
+
         if not self.verify:
             # Remove warnings when running tests
             #
@@ -73,7 +194,10 @@ class TagCubeClient(object):
             requests.packages.urllib3.disable_warnings()
 
         self.set_verbose(verbose)
-        self.configure_requests()
+        self.configure_requests(pool_connections=pool_connections,
+                                pool_maxsize=pool_maxsize,
+                                timeout=timeout,
+                                keep_alive=keep_alive)
 
     def test_auth_credentials(self):
         """
@@ -129,10 +253,55 @@ class TagCubeClient(object):
 
         :return: The newly generated scan id
         """
+        try:
+            return self._quick_scan_impl(target_url, email_notify,
+                                         scan_profile, path_list)
+        except TagCubeInvalidHrefException, tihe:
+            if self.cache.ttl <= 0:
+                raise
+
+            # One of the cached resources was removed (by the user, using the
+            # web UI?) and the REST API rejected its href, flush the cache and
+            # try again without it
+            msg = 'Cached %s rejected (%s), retrying without cache'
+            api_logger.debug(msg % (', '.join(tihe.fields), tihe))
+
+            self.cache.invalidate()
+            return self._quick_scan_impl(target_url, email_notify,
+                                         scan_profile, path_list,
+                                         use_cache=False)
+
+    def _quick_scan_impl(self, target_url, email_notify, scan_profile,
+                         path_list, use_cache=True):
+        parsed_url = parse_url(target_url)
+        domain = parsed_url.host
+        port = str(parsed_url.port or 80)
+        is_ssl = parsed_url.scheme == 'https'
+        notif_email = self.email if email_notify is None else email_notify
+
+        #
+        # The scan profile, domain (and its verification) and email
+        # notification lookups don't depend on each other, so they are sent
+        # in parallel. Resources are only created after all the lookups
+        # finished and the scan profile was found.
+        #
+        lookup_pool = self.get_lookup_pool()
+        kwargs = {'use_cache': use_cache}
+
+        scan_profile_call = lookup_pool.apply_async(self.get_scan_profile,
+                                                    (scan_profile,), kwargs)
+        notification_call = lookup_pool.apply_async(self.get_email_notification,
+                                                     (notif_email,), kwargs)
+
+        domain_resource, verification_resource = \
+            self._get_domain_and_verification(domain, port, is_ssl, use_cache)
+
+        scan_profile_resource = scan_profile_call.get()
+        email_notification_resource = notification_call.get()
+
         #
         # Scan profile handling
         #
-        scan_profile_resource = self.get_scan_profile(scan_profile)
         if scan_profile_resource is None:
             msg = 'The specified scan profile "%s" does not exist'
             raise ValueError(msg % scan_profile)
@@ -140,26 +309,19 @@ class TagCubeClient(object):
         #
         # Domain verification handling
         #
-        domain = get_domain_from_url(target_url)
-        port = get_port_from_url(target_url)
-        is_ssl = use_ssl(target_url)
-
-        # First, is there a domain resource to verify?
-        domain_resource = self.get_domain(domain)
         if domain_resource is None:
             domain_resource = self.domain_add(domain)
 
-        verification_resource = self.get_latest_verification(domain_resource.domain,
-                                                             port, is_ssl)
-
         if verification_resource is None:
             # This seems to be the first scan to this domain, we'll have to
             # verify the client's ownership.
             #
             # Depending on the user's configuration, license, etc. this can
             # succeed or fail
+            # pylint: disable=E1101
             verification_resource = self.verification_add(domain_resource.id,
                                                           port, is_ssl)
+            # pylint: enable=E1101
 
             if not self.can_scan(verification_resource):
                 msg = verification_resource.get('verification_message', '')
@@ -168,8 +330,6 @@ class TagCubeClient(object):
         #
         # Email notification handling
         #
-        notif_email = self.email if email_notify is None else email_notify
-        email_notification_resource = self.get_email_notification(notif_email)
         if email_notification_resource is None:
             email_notification_resource = self.email_notification_add(notif_email)
 
@@ -179,6 +339,46 @@ class TagCubeClient(object):
         return self.low_level_scan(verification_resource, scan_profile_resource,
                                    path_list, [email_notification_resource])
 
+    def get_lookup_pool(self):
+        """
+        :return: The ThreadPool used to send lookups in parallel, created on
+                 the first call and shared by all threads using the client
+        """
+        with self._lookup_pool_lock:
+            if self._lookup_pool is None:
+                self._lookup_pool = ThreadPool(self.LOOKUP_THREADS)
+
+            return self._lookup_pool
+
+    def close(self):
+        """
+        Stop the lookup threads and close the HTTP connections
+        """
+        with self._lookup_pool_lock:
+            if self._lookup_pool is not None:
+                self._lookup_pool.terminate()
+                self._lookup_pool.join()
+                self._lookup_pool = None
+
+        self.session.close()
+
+    def _get_domain_and_verification(self, domain, port, is_ssl, use_cache):
+        """
+        :return: A tuple with the domain resource and the latest verification
+                 for it. None is returned for the resources which don't exist.
+        """
+        domain_resource = self.get_domain(domain, use_cache=use_cache)
+        if domain_resource is None:
+            # A new domain won't have any verifications
+            return None, None
+
+        # pylint: disable=E1101
+        verification_resource = self.get_latest_verification(domain_resource.domain,
+                                                             port, is_ssl,
+                                                             use_cache=use_cache)
+        # pylint: enable=E1101
+        return domain_resource, verification_resource
+
     def low_level_scan(self, verification_resource, scan_profile_resource,
                        path_list, notification_resource_list):
         """
@@ -217,11 +417,12 @@ class TagCubeClient(object):
         url = self.build_full_url('/scans/')
         return self.create_resource(url, data)
 
-    def get_scan_profile(self, scan_profile):
+    def get_scan_profile(self, scan_profile, use_cache=True):
         """
         :return: The scan profile resource (as Resource), or None
         """
-        return self.filter_resource('profiles', 'name', scan_profile)
+        return self.filter_resource('profiles', 'name', scan_profile,
+                                    use_cache=use_cache)
 
     def verification_add(self, domain_resource_id, port, is_ssl):
         """
@@ -242,9 +443,16 @@ class TagCubeClient(object):
                 "port": port,
                 "ssl": 'true' if is_ssl else 'false'}
         url = self.build_full_url(self.VERIFICATIONS)
-        return self.create_resource(url, data)
+        verification_resource = self.create_resource(url, data)
+
+        # We don't know the domain name, so we can't build the cache key for
+        # the get_latest_verification() call, just flush all verifications
+        self.cache.invalidate('verifications')
 
-    def get_latest_verification(self, domain_name, port, is_ssl):
+        return verification_resource
+
+    def get_latest_verification(self, domain_name, port, is_ssl,
+                                use_cache=True):
         """
         :return: A verification resource (as Resource), or None. If there is
                  more than one verification resource available it will return
@@ -255,12 +463,141 @@ class TagCubeClient(object):
                        'domain': domain_name,
                        'success': True}
         return self.multi_filter_resource('verifications', filter_dict,
-                                          result_handler=LATEST_RESULT)
+                                          result_handler=LATEST_RESULT,
+                                          use_cache=use_cache)
 
     def multi_filter_resource(self, resource_name, filter_dict,
-                              result_handler=ONE_RESULT):
+                              result_handler=ONE_RESULT, use_cache=True,
+                              limit=None, stream=False):
+        """
+        :param use_cache: When False the resource cache is bypassed and the
+                          REST API is always queried. The cache is updated
+                          with the new result.
+        :param limit: The number of objects to request in each page, uses the
+                      REST API default when None.
+        :param stream: When True the objects are decoded while each page is
+                       received, instead of after the whole page was
+                       received, see stream_page().
+        :return: The result of applying result_handler to the objects
+                 returned by the REST API for the filter query. All pages
+                 are read (when needed) by following meta.next
+        """
+        if limit is not None:
+            filter_dict = dict(filter_dict, limit=limit)
+
+        if result_handler == ITER_RESULTS:
+            # Generators can't be cached
+            return self._multi_filter_resource_impl(resource_name,
+                                                    filter_dict,
+                                                    result_handler,
+                                                    stream=stream)
+
+        cache_key = get_cache_key(resource_name, filter_dict, result_handler)
+        load = lambda: self._multi_filter_resource_impl(resource_name,
+                                                        filter_dict,
+                                                        result_handler,
+                                                        stream=stream)
+
+        if not use_cache:
+            result = load()
+            self.cache.set(cache_key, result)
+            return result
+
+        return self.cache.get_or_load(cache_key, load)
+
+    def _multi_filter_resource_impl(self, resource_name, filter_dict,
+                                    result_handler, stream=False):
+        if result_handler == LATEST_RESULT:
+            latest = self._get_latest_resource(resource_name, filter_dict)
+            if latest is not False:
+                return latest
+
         url = self.build_full_url('/%s/?%s' % (resource_name,
                                                urllib.urlencode(filter_dict)))
+
+        if stream:
+            objects = iter_objects_from_streamed_pages(url, self.stream_page)
+        else:
+            objects = iter_objects_from_pages(url, self.get_page)
+
+        return RESULT_HANDLERS[result_handler](resource_name,
+                                               filter_dict, objects)
+
+    def _get_latest_resource(self, resource_name, filter_dict):
+        """
+        Ask the REST API to sort the resources by descending id, so we only
+        need to read the first one instead of all the pages.
+
+        Two objects are requested to detect servers which ignore the order_by
+        parameter.
+
+        :return: The latest resource, None if there are no resources, or False
+                 if the REST API doesn't support ordering and the caller
+                 needs to read all the pages.
+        """
+        if self.supports_order_by is False:
+            return False
+
+        filter_dict = dict(filter_dict, order_by='-id', limit=2)
+        url = self.build_full_url('/%s/?%s' % (resource_name,
+                                               urllib.urlencode(filter_dict)))
+
+        try:
+            objects = get_objects_from_json(self.get_page(url))
+        except TagCubeAPIException, tae:
+            # {"error": "No matching 'id' field for ordering on."}
+            api_logger.debug('Ordering is not supported: "%s"' % tae)
+            self.supports_order_by = False
+            return False
+
+        if not is_latest_first(objects):
+            api_logger.debug('Ordering is not supported, order_by ignored')
+            self.supports_order_by = False
+            return False
+
+        if len(objects) > 1:
+            # Less than two objects are always sorted
+            self.supports_order_by = True
+
+        if not objects:
+            return None
+
+        return Resource(objects[0])
+
+    def iter_resources(self, resource_name, filter_dict=None, limit=None,
+                       stream=False, model=None):
+        """
+        Iterate over all the resources which match filter_dict, the pages are
+        retrieved from the REST API as the resources are consumed, so memory
+        usage doesn't depend on the number of resources.
+
+        :param limit: The number of resources to request in each page
+        :param stream: Decode the resources while each page is received, so
+                       memory usage doesn't depend on the page size either
+                       and the first resource is returned sooner.
+        :param model: A Model subclass (Scan, Domain, ...) to yield instead
+                      of Resource objects, uses less memory when the caller
+                      keeps many resources
+        :return: A generator yielding Resource objects
+        """
+        resources = self.multi_filter_resource(resource_name,
+                                               filter_dict or {},
+                                               result_handler=ITER_RESULTS,
+                                               limit=limit, stream=stream)
+        if model is None:
+            return resources
+
+        return (model(resource) for resource in resources)
+
+    def get_page(self, url):
+        """
+        :param url: The full URL for a listing, or the path to the next page
+                    as found in meta.next (/1.0/scans/?offset=20&limit=20)
+        :return: The decoded JSON for the page
+        """
+        if not url.startswith(('http://', 'https://')):
+            url = '%s%s' % (self.root_url.rstrip('/'), url)
+
         code, _json = self.send_request(url)
 
         if isinstance(_json, dict) and 'error' in _json:
@@ -270,23 +607,47 @@ class TagCubeClient(object):
             #            (mismatched type)."}
             raise TagCubeAPIException(_json['error'])
 
-        return RESULT_HANDLERS[result_handler](resource_name,
-                                               filter_dict, _json)
+        return _json
+
+    def stream_page(self, url):
+        """
+        Same as get_page() but the response body is not read here, the
+        objects are decoded while iterating over the returned StreamedPage.
+
+        :param url: The full URL for a listing, or the path to the next page
+        :return: A StreamedPage
+        """
+        if not url.startswith(('http://', 'https://')):
+            url = '%s%s' % (self.root_url.rstrip('/'), url)
+
+        response = self._send_with_retries(url, None, 'GET', stream=True)
+
+        if response.status_code != 200:
+            # Errors are small, read and handle them as usual
+            self.handle_response(url, response)
+
+            msg = 'Unexpected %s status code for %s listing'
+            raise TagCubeAPIException(msg % (response.status_code, url))
+
+        api_logger.debug('Streaming the %s listing' % url)
+        return StreamedPage(response, loads=self.json_codec.loads)
 
     def filter_resource(self, resource_name, field_name, field_value,
-                        result_handler=ONE_RESULT):
+                        result_handler=ONE_RESULT, use_cache=True):
         """
         :return: The resource (as json), or None
         """
         return self.multi_filter_resource(resource_name,
                                           {field_name: field_value},
-                                          result_handler=result_handler)
+                                          result_handler=result_handler,
+                                          use_cache=use_cache)
 
-    def get_email_notification(self, notif_email):
+    def get_email_notification(self, notif_email, use_cache=True):
         """
         :return: The email notification resource for notif_email, or None
         """
-        return self.filter_resource('notifications/email', 'email', notif_email)
+        return self.filter_resource('notifications/email', 'email', notif_email,
+                                    use_cache=use_cache)
 
     def email_notification_add(self, notif_email, first_name='None',
                                last_name='None', description=DESCRIPTION):
@@ -305,7 +666,13 @@ class TagCubeClient(object):
                 "last_name": last_name,
                 "description": description}
         url = self.build_full_url('/notifications/email/')
-        return self.create_resource(url, data)
+        email_notification_resource = self.create_resource(url, data)
+
+        cache_key = get_cache_key('notifications/email', {'email': notif_email},
+                                  ONE_RESULT)
+        self.cache.set(cache_key, email_notification_resource)
+
+        return email_notification_resource
 
     def can_scan(self, verification_resource):
         """
@@ -337,12 +704,13 @@ class TagCubeClient(object):
         """
         return verification_resource.success
 
-    def get_domain(self, domain):
+    def get_domain(self, domain, use_cache=True):
         """
         :param domain: The domain to query
         :return: The domain resource (as json), or None
         """
-        return self.filter_resource('domains', 'domain', domain)
+        return self.filter_resource('domains', 'domain', domain,
+                                    use_cache=use_cache)
 
     def domain_add(self, domain, description=DESCRIPTION):
         """
@@ -357,7 +725,12 @@ class TagCubeClient(object):
         data = {"domain": domain,
                 "description": description}
         url = self.build_full_url(self.DOMAINS)
-        return self.create_resource(url, data)
+        domain_resource = self.create_resource(url, data)
+
+        cache_key = get_cache_key('domains', {'domain': domain}, ONE_RESULT)
+        self.cache.set(cache_key, domain_resource)
+
+        return domain_resource
 
     def get_scan(self, scan_id):
         """
@@ -368,6 +741,235 @@ class TagCubeClient(object):
         _, json_data = self.send_request(url)
         return Resource(json_data)
 
+    def get_scans(self, scan_ids, concurrency=DEFAULT_BULK_CONCURRENCY,
+                  chunk_size=DEFAULT_BULK_CHUNK_SIZE, model=None):
+        """
+        Retrieve many scans using as few requests as possible. The scans are
+        queried in chunks using the id__in filter, if the REST API doesn't
+        support it we fall back to sending one get_scan() request for each
+        scan, using `concurrency` threads.
+
+        :param scan_ids: The IDs of the scans to retrieve
+        :param concurrency: The max number of requests to send in parallel
+                            when id__in is not supported
+        :param chunk_size: The max number of IDs in each id__in query
+        :param model: A Model subclass (usually Scan) to store instead of
+                      Resource objects, uses less memory for large batches
+        :return: A ResourceDict with the scan ids as keys and the scans as
+                 values. The scans which could not be retrieved are not in
+                 the dict, the error for each one is in the `errors` dict.
+        """
+        unique_ids = []
+        seen = set()
+
+        for scan_id in scan_ids:
+            if str(scan_id) not in seen:
+                seen.add(str(scan_id))
+                unique_ids.append(scan_id)
+
+        results = ResourceDict()
+        pending = unique_ids
+
+        if self.supports_id_in is not False:
+            pending = self._get_scans_id_in(unique_ids, chunk_size, results,
+                                            model)
+
+        if pending:
+            self._get_scans_concurrently(pending, concurrency, results, model)
+
+        return results
+
+    def _get_scans_id_in(self, scan_ids, chunk_size, results, model=None):
+        """
+        Query the scans using the id__in filter, store the scans (and not
+        found errors) in results.
+
+        :return: The scan ids which need to be retrieved one by one because
+                 id__in is not supported
+        """
+        for start in xrange(0, len(scan_ids), chunk_size):
+            chunk = scan_ids[start:start + chunk_size]
+            keys = dict((str(scan_id), scan_id) for scan_id in chunk)
+            found = {}
+
+            filter_dict = {'id__in': ','.join(str(i) for i in chunk)}
+
+            try:
+                for scan_resource in self.iter_resources('scans', filter_dict,
+                                                         limit=len(chunk),
+                                                         model=model):
+                    scan_key = str(scan_resource.get('id'))
+
+                    if scan_key not in keys:
+                        # The filter was ignored and we're receiving all the
+                        # scans, stop before downloading all the pages
+                        raise TagCubeClientException('Unexpected scan id')
+
+                    found[keys[scan_key]] = scan_resource
+
+            except (TagCubeAPIException, TagCubeClientException), e:
+                msg = 'The REST API does not support id__in queries (%s)'
+                api_logger.debug(msg % e)
+                self.supports_id_in = False
+                return scan_ids[start:]
+
+            self.supports_id_in = True
+
+            for scan_id in chunk:
+                if scan_id in found:
+                    results[scan_id] = found[scan_id]
+                else:
+                    msg = 'TagCube REST API scan not found: %s' % scan_id
+                    results.errors[scan_id] = TagCubeNotFoundException(msg)
+
+        return []
+
+    def _get_scans_concurrently(self, scan_ids, concurrency, results,
+                                model=None):
+        """
+        Retrieve the scans using one request for each, store the scans and the
+        errors in results.
+        """
+        def get_scan(scan_id):
+            url = self.build_full_url('%s%s' % (self.SCANS, scan_id))
+
+            try:
+                _, json_data = self.send_request(url, raise_not_found=True)
+            except (RequestException, TagCubeAPIException), e:
+                return scan_id, None, e
+
+            model_type = Resource if model is None else model
+            return scan_id, model_type(json_data), None
+
+        pool = ThreadPool(max(1, min(concurrency, len(scan_ids))))
+
+        try:
+            for scan_id, scan_resource, error in pool.imap(get_scan, scan_ids):
+                if error is None:
+                    results[scan_id] = scan_resource
+                else:
+                    results.errors[scan_id] = error
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def get_scan_if_modified(self, scan_id, etag=None):
+        """
+        Conditional version of get_scan(), the If-None-Match header is sent
+        when we have the ETag for the previous response, so the REST API
+        only sends the scan when it changed.
+
+        :param scan_id: The scan ID
+        :param etag: The ETag header sent in the previous response, or None
+        :return: A tuple containing the scan (None if it was not modified)
+                 and the new ETag
+        """
+        url = self.build_full_url('%s%s' % (self.SCANS, scan_id))
+        headers = None if etag is None else {'If-None-Match': etag}
+
+        response = self._send_with_retries(url, None, 'GET', headers=headers)
+
+        if response.status_code == 304:
+            return None, etag
+
+        _, json_data = self.handle_response(url, response,
+                                            raise_not_found=True)
+        return Resource(json_data), response.headers.get('ETag')
+
+    def is_scan_finished(self, scan_resource):
+        status = scan_resource.get(self.SCAN_STATUS_FIELD)
+        return status in self.SCAN_FINISHED_STATUSES
+
+    def get_scan_progress(self, scan_resource):
+        """
+        :return: The scan progress in %, None if unknown
+        """
+        try:
+            return float(scan_resource[self.SCAN_PROGRESS_FIELD])
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def wait_for_scans(self, scan_ids, timeout=None,
+                       min_interval=DEFAULT_POLL_MIN_INTERVAL,
+                       max_interval=DEFAULT_POLL_MAX_INTERVAL,
+                       callback=None, clock=time.time, sleep=time.sleep):
+        """
+        Poll the scans until all of them finished or the timeout expires.
+
+        All the scans are polled from this thread, using the client's session
+        and conditional requests. Each scan has its own PollInterval: scans
+        which don't change are polled less often and scans which are close to
+        completion are polled more often.
+
+        :param scan_ids: The IDs of the scans to wait for
+        :param timeout: Max number of seconds to wait, None waits forever
+        :param callback: Called with (scan_id, scan_resource) every time one
+                         of the scans changes
+        :return: A ResourceDict with the scan ids as keys and the latest scan
+                 resources as values. Use is_scan_finished() to know which
+                 scans did not finish before the timeout. The scans which
+                 could not be retrieved (unknown IDs, connection errors, ...)
+                 are no longer polled and their errors are stored in the
+                 `errors` attribute.
+        """
+        start = clock()
+        pending = {}
+
+        for scan_id in scan_ids:
+            interval = PollInterval(min_interval, max_interval)
+            pending[scan_id] = PollState(interval, start)
+
+        results = ResourceDict()
+
+        while pending:
+            for scan_id in sorted(pending):
+                state = pending[scan_id]
+
+                if state.due > clock():
+                    continue
+
+                try:
+                    scan_resource, state.etag = self.get_scan_if_modified(
+                        scan_id, state.etag)
+                except (RequestException, TagCubeAPIException), e:
+                    msg = 'Stopped polling scan %s: %s'
+                    api_logger.debug(msg % (scan_id, e))
+
+                    results.pop(scan_id, None)
+                    results.errors[scan_id] = e
+                    del pending[scan_id]
+                    continue
+
+                changed = (scan_resource is not None and
+                           scan_resource != state.resource)
+
+                if changed:
+                    state.resource = results[scan_id] = scan_resource
+
+                    if callback is not None:
+                        callback(scan_id, scan_resource)
+
+                    if self.is_scan_finished(scan_resource):
+                        del pending[scan_id]
+                        continue
+
+                progress = self.get_scan_progress(state.resource)
+                state.due = clock() + state.interval.update(changed, progress)
+
+            if not pending:
+                break
+
+            next_due = min(state.due for state in pending.itervalues())
+
+            if timeout is not None and next_due - start > timeout:
+                msg = 'Timeout waiting for %s scans to finish'
+                api_logger.debug(msg % len(pending))
+                break
+
+            sleep(max(0, next_due - clock()))
+
+        return results
+
     def create_resource(self, url, data):
         """
         Shortcut for creating a new resource
@@ -411,14 +1013,47 @@ class TagCubeClient(object):
 
         http_client.HTTPConnection.debuglevel = 1 if verbose else 0
 
-    def configure_requests(self):
+        # httplib prints the requests, including the Authorization header, to
+        # stdout. Only sanitize stdout while that output is enabled.
+        if verbose:
+            install_stdout_sanitizer()
+        else:
+            uninstall_stdout_sanitizer()
+
+    def configure_requests(self, pool_connections=DEFAULT_POOL_CONNECTIONS,
+                           pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                           timeout=DEFAULT_TIMEOUT, keep_alive=True):
+        """
+        :param pool_connections: The number of hosts to keep connection pools
+                                 for
+        :param pool_maxsize: The max number of connections to keep open for
+                             each host, use at least the number of threads
+                             which send requests concurrently.
+        :param timeout: A (connect, read) tuple or a number of seconds used for
+                        both. None waits forever.
+        :param keep_alive: When True the connections are kept open (and TCP
+                           keep-alive probes are sent) to reuse them in the
+                           following requests, when False a new connection
+                           (and TLS handshake) is used for each request.
+        """
         self.session = requests.Session()
         self.session.auth = (self.email, self.api_key)
+        self.timeout = timeout
 
         headers = {'Content-Type': 'application/json',
                    'User-Agent': 'TagCubeClient %s' % __VERSION__}
+
+        if not keep_alive:
+            headers['Connection'] = 'close'
+
         self.session.headers.update(headers)
 
+        adapter = TagCubeHTTPAdapter(tcp_keepalive=keep_alive,
+                                     pool_connections=pool_connections,
+                                     pool_maxsize=pool_maxsize)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
     def handle_api_errors(self, status_code, json_data):
         """
         This method parses all the HTTP responses sent by the REST API and
@@ -438,57 +1073,183 @@ class TagCubeClient(object):
                 }
             }
 
-        And raise TagCubeAPIException with the correct message.
+        And raise TagCubeAPIException with the correct message. When the
+        fields with errors are hrefs to other resources (verification_href,
+        profile_href, etc.) TagCubeInvalidHrefException is raised.
 
         :param status_code: The HTTP response code
         :param json_data: The HTTP response body decoded as JSON
         """
         error_list = []
+        href_fields = []
 
         if 'error' in json_data and len(json_data) == 1 \
         and isinstance(json_data, dict) and isinstance(json_data['error'], list):
             error_list = json_data['error']
 
+        elif 'error' in json_data and len(json_data) == 1 \
+        and isinstance(json_data, dict) and status_code == 400:
+            # Errors for invalid filters look like:
+            # {"error": "The 'foo' field does not allow filtering."}
+            error_list = [json_data['error']]
+
         elif status_code == 400:
             for main_error_key in json_data:
                 for sub_error_key in json_data[main_error_key]:
                     error_list.extend(json_data[main_error_key][sub_error_key])
 
+                    if sub_error_key.endswith('_href'):
+                        href_fields.append(sub_error_key)
+
         # Only raise an exception if we had any errors
         if error_list:
             error_string = u' '.join(error_list)
+
+            if href_fields:
+                raise TagCubeInvalidHrefException(error_string, href_fields)
+
             raise TagCubeAPIException(error_string)
 
-    def send_request(self, url, json_data=None, method='GET'):
+    def send_request(self, url, json_data=None, method='GET',
+                     raise_not_found=False):
+        """
+        :param raise_not_found: Raise TagCubeNotFoundException for 404
+                                responses, by default they are handled as
+                                any other response
+        :return: A tuple containing the status code and the decoded JSON
+        """
         if method == 'GET':
-            response = self.session.get(url, verify=self.verify)
+            data = None
 
         elif method == 'POST':
-            data = json.dumps(json_data)
-            response = self.session.post(url, data=data, verify=self.verify)
+            data = self.json_codec.dumps(json_data)
 
         else:
             raise ValueError('Invalid HTTP method: "%s"' % method)
 
+        http_cache = self.http_cache if method == 'GET' else None
+        cache_entry = None
+        headers = None
+
+        if http_cache is not None:
+            cache_entry = http_cache.get(url)
+
+            if cache_entry is not None:
+                headers = http_cache.get_conditional_headers(cache_entry)
+
+        response = self._send_with_retries(url, data, method, headers=headers)
+
+        if response.status_code == 304 and cache_entry is not None:
+            # Decoding the cached body gives each caller its own JSON, which
+            # can be modified without changing the cache
+            msg = 'Not modified, using the cached response for %s'
+            api_logger.debug(msg % url)
+            http_cache.record_hit()
+            return (cache_entry['status_code'],
+                    self.json_codec.loads(cache_entry['body']))
+
+        status_code, json_data = self.handle_response(url, response,
+                                                      raise_not_found)
+
+        if http_cache is not None:
+            http_cache.record_miss()
+            http_cache.set(url, response)
+
+        return status_code, json_data
+
+    def handle_response(self, url, response, raise_not_found=False):
+        """
+        Decode the REST API response and raise exceptions for errors
+
+        :param raise_not_found: See send_request()
+        :return: A tuple containing the status code and the decoded JSON
+        """
         if response.status_code == 401:
             raise IncorrectAPICredentials('Invalid TagCube API credentials')
 
+        if response.status_code == 404 and raise_not_found:
+            msg = 'TagCube REST API resource not found: %s'
+            raise TagCubeNotFoundException(msg % url)
+
         try:
-            json_data = response.json()
+            json_data = self.json_codec.loads(response.content)
         except ValueError:
             msg = ('TagCube REST API did not return JSON, if this issue'
                    ' persists please contact support@tagcube.io')
             raise TagCubeAPIException(msg)
 
-        pretty_json = json.dumps(json_data, indent=4)
-        msg = 'Received %s HTTP response from the wire:\n%s'
-        api_logger.debug(msg % (response.status_code, pretty_json))
+        # Pretty printing large responses is expensive, only do it when the
+        # debug output is enabled
+        if api_logger.isEnabledFor(logging.DEBUG):
+            msg = 'Received %s HTTP response from the wire:\n%s'
+            args = (response.status_code, self.format_debug_body(json_data))
+            api_logger.debug(msg % args)
 
         # Error handling
         self.handle_api_errors(response.status_code, json_data)
 
         return response.status_code, json_data
 
+    def format_debug_body(self, json_data):
+        """
+        :return: The decoded JSON pretty printed for the debug output, with
+                 at most debug_body_limit characters
+        """
+        pretty_json = json.dumps(json_data, indent=4)
+        limit = self.debug_body_limit
+
+        if limit is None or len(pretty_json) <= limit:
+            return pretty_json
+
+        truncated = len(pretty_json) - limit
+        return '%s\n... (%s characters truncated)' % (pretty_json[:limit],
+                                                      truncated)
+
+    def _send_with_retries(self, url, data, method, headers=None,
+                           stream=False):
+        """
+        Send the HTTP request, retrying it as configured in retry_policy when
+        there are connection errors or the REST API is temporarily
+        unavailable.
+
+        :return: The HTTP response
+        """
+        policy = self.retry_policy
+        attempt = 1
+
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+
+            try:
+                response = self.session.request(method, url, data=data,
+                                                headers=headers,
+                                                stream=stream,
+                                                verify=self.verify,
+                                                timeout=self.timeout)
+            except (ConnectionError, Timeout), e:
+                if not policy.can_retry(method, attempt):
+                    raise
+
+                backoff = policy.get_backoff(attempt)
+                error = '"%s"' % e
+            else:
+                if not policy.is_retry_status(response.status_code):
+                    return response
+
+                if not policy.can_retry(method, attempt):
+                    return response
+
+                retry_after = response.headers.get('Retry-After')
+                backoff = policy.get_backoff(attempt, retry_after=retry_after)
+                error = 'HTTP status code %s' % response.status_code
+
+            msg = '%s %s failed with %s, retrying in %.1f seconds (attempt %s)'
+            api_logger.debug(msg % (method, url, error, backoff, attempt))
+
+            policy.sleep(backoff)
+            attempt += 1
+
     def build_full_url(self, last_part):
         return '%s%s%s' % (self.root_url, self.API_VERSION, last_part)
 
@@ -0,0 +1,89 @@
+from multiprocessing.pool import ThreadPool
+
+from tagcube.client.api import TagCubeClient
+
+
+def _async_method(name):
+    """
+    :return: A method which runs TagCubeClient.<name> in the thread pool and
+             returns the AsyncResult
+    """
+    def method(self, *args, **kwargs):
+        callback = kwargs.pop('callback', None)
+        func = getattr(self.client, name)
+        return self.pool.apply_async(func, args, kwargs, callback)
+
+    method.__name__ = name
+    method.__doc__ = ('Asynchronous version of TagCubeClient.%s(), receives'
+                      ' the same parameters plus an optional callback and'
+                      ' returns an AsyncResult' % name)
+    return method
+
+
+class AsyncTagCubeClient(object):
+    """
+    A TagCubeClient which doesn't block the caller. Every method receives the
+    same parameters as the one in TagCubeClient, plus an optional `callback`
+    which is called with the result, and returns an AsyncResult:
+
+        client = AsyncTagCubeClient(email, api_key, workers=64)
+        results = [client.quick_scan(url) for url in target_urls]
+        scan_ids = [r.get().id for r in results]
+
+    AsyncResult.get() raises the same exceptions as TagCubeClient, such as
+    IncorrectAPICredentials and TagCubeAPIException.
+
+    Python 2 has no asyncio, so the requests are sent by a pool of `workers`
+    threads which share one TagCubeClient, and one requests session with a
+    connection pool large enough for all of them. Up to `workers` requests
+    are in-flight at any time, the rest wait in the pool's queue.
+    """
+    DEFAULT_WORKERS = 32
+
+    test_auth_credentials = _async_method('test_auth_credentials')
+    get_current_user = _async_method('get_current_user')
+    quick_scan = _async_method('quick_scan')
+    low_level_scan = _async_method('low_level_scan')
+    get_scan = _async_method('get_scan')
+    get_scans = _async_method('get_scans')
+    get_scan_if_modified = _async_method('get_scan_if_modified')
+    wait_for_scans = _async_method('wait_for_scans')
+    get_scan_profile = _async_method('get_scan_profile')
+    get_domain = _async_method('get_domain')
+    domain_add = _async_method('domain_add')
+    get_latest_verification = _async_method('get_latest_verification')
+    verification_add = _async_method('verification_add')
+    get_email_notification = _async_method('get_email_notification')
+    email_notification_add = _async_method('email_notification_add')
+    filter_resource = _async_method('filter_resource')
+    multi_filter_resource = _async_method('multi_filter_resource')
+    create_resource = _async_method('create_resource')
+    send_request = _async_method('send_request')
+
+    def __init__(self, email, api_key, workers=DEFAULT_WORKERS, **kwargs):
+        """
+        :param workers: The max number of concurrent requests
+        :param kwargs: Passed to TagCubeClient
+        """
+        # One connection for each worker, plus the ones used by the client's
+        # shared quick_scan() lookup threads
+        kwargs.setdefault('pool_maxsize',
+                          workers + TagCubeClient.LOOKUP_THREADS)
+
+        self.client = TagCubeClient(email, api_key, **kwargs)
+        self.workers = workers
+        self.pool = ThreadPool(workers)
+
+    def close(self):
+        """
+        Wait for all the pending requests to finish and stop the threads
+        """
+        self.pool.close()
+        self.pool.join()
+        self.client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -1,8 +1,21 @@
 import unittest
 import httpretty
 import json
+import socket
+import sys
+import threading
+
+from mock import patch, Mock
 
 from tagcube.client.api import TagCubeClient
+from tagcube.utils.cache import get_cache_key
+from tagcube.utils.exceptions import (TagCubeNotFoundException,
+                                      TagCubeInvalidHrefException,
+                                      TagCubeAPIException)
+from tagcube.utils.resource import Resource, Scan
+from tagcube.utils.result_handlers import ONE_RESULT
+from tagcube.utils.retry import RetryPolicy
+from tagcube.utils.sanitize import CleanUpWrapper
 
 EMPTY_REST_API_RESPONSE = '''\
 {
@@ -29,6 +42,37 @@ REST_API_RESPONSE_FMT = '''\
 }'''
 
 
+def paginated_callback(objects, supports_ordering=True):
+    """
+    :return: A function which can be used as httpretty body to simulate the
+             REST API pagination (and ordering) of `objects`
+    """
+    def callback(request, uri, headers):
+        offset = int(request.querystring.get('offset', ['0'])[0])
+        limit = int(request.querystring.get('limit', ['20'])[0])
+        order_by = request.querystring.get('order_by', [None])[0]
+        path = request.path.split('?')[0]
+
+        ordered = objects
+        if supports_ordering and order_by == '-id':
+            ordered = sorted(objects, key=lambda o: o['id'], reverse=True)
+
+        page = ordered[offset:offset + limit]
+        next_page = None
+        if offset + limit < len(objects):
+            next_page = '%s?limit=%s&offset=%s' % (path, limit, offset + limit)
+
+        body = {'meta': {'limit': limit,
+                         'next': next_page,
+                         'offset': offset,
+                         'previous': None,
+                         'total_count': len(objects)},
+                'objects': page}
+        return 200, headers, json.dumps(body)
+
+    return callback
+
+
 class TestTagCubeClient(unittest.TestCase):
 
     ROOT_URL = TagCubeClient.DEFAULT_ROOT_URL
@@ -88,15 +132,158 @@ class TestTagCubeClient(unittest.TestCase):
         self.assertEqual(scan_profile_resource, None)
 
     @httpretty.activate
-    def test_quick_scan_invalid_profile(self):
+    def test_get_scan_profile_cache(self):
         url = "%s%s/profiles/" % (self.ROOT_URL, self.API_VERSION)
+        expected_json = '{"href": "/1.0/profiles/1","name": "full_audit"}'
+        body = REST_API_RESPONSE_FMT % expected_json
+        httpretty.register_uri(httpretty.GET, url, body=body,
+                               content_type="application/json")
 
-        httpretty.register_uri(httpretty.GET, url, body=EMPTY_REST_API_RESPONSE,
+        for _ in xrange(3):
+            self.client.get_scan_profile('full_audit')
+
+        self.assertEqual(len(httpretty.HTTPretty.latest_requests), 1)
+
+        self.client.get_scan_profile('full_audit', use_cache=False)
+        self.assertEqual(len(httpretty.HTTPretty.latest_requests), 2)
+
+    @httpretty.activate
+    def test_quick_scan_stale_cache_retry(self):
+        resources = {
+            'profiles': '{"href": "/1.0/profiles/1", "id": 1}',
+            'domains': '{"href": "/1.0/domains/2", "id": 2,'
+                       ' "domain": "target.com"}',
+            'verifications': '{"href": "/1.0/verifications/3", "id": 3,'
+                             ' "success": true}',
+            'notifications/email': '{"href": "/1.0/notifications/email/4",'
+                                   ' "id": 4}'}
+
+        for resource, _json in resources.iteritems():
+            url = "%s%s/%s/" % (self.ROOT_URL, self.API_VERSION, resource)
+            httpretty.register_uri(httpretty.GET, url,
+                                   body=REST_API_RESPONSE_FMT % _json,
+                                   content_type="application/json")
+
+        def create_scan(request, uri, headers):
+            if json.loads(request.body)['profile_href'] == '/1.0/profiles/9':
+                error = {'scans': {'profile_href': ['Invalid hyperlink -'
+                                                    ' Object does not exist.']}}
+                return 400, headers, json.dumps(error)
+
+            return 201, headers, '{"id": 5, "href": "/1.0/scans/5"}'
+
+        url = "%s%s/scans/" % (self.ROOT_URL, self.API_VERSION)
+        httpretty.register_uri(httpretty.POST, url, body=create_scan,
+                               content_type="application/json")
+
+        # The profile was removed after it was cached
+        cache_key = get_cache_key('profiles', {'name': 'full_audit'},
+                                  ONE_RESULT)
+        self.client.cache.set(cache_key, Resource({'href': '/1.0/profiles/9',
+                                                   'id': 9}))
+
+        scan_resource = self.client.quick_scan('http://target.com/')
+        self.assertEqual(scan_resource.id, 5)
+
+        posts = [r for r in httpretty.HTTPretty.latest_requests
+                 if r.method == 'POST']
+        self.assertEqual(len(posts), 2)
+        self.assertEqual(json.loads(posts[1].body)['profile_href'],
+                         '/1.0/profiles/1')
+
+    @httpretty.activate
+    def test_handle_api_errors_invalid_href(self):
+        url = "%s%s/verifications/" % (self.ROOT_URL, self.API_VERSION)
+        error = {'verifications': {'domain_href': ['Invalid hyperlink']}}
+        httpretty.register_uri(httpretty.POST, url, status=400,
+                               body=json.dumps(error),
                                content_type="application/json")
 
+        try:
+            self.client.verification_add(2, 80, False)
+        except TagCubeInvalidHrefException, tihe:
+            self.assertEqual(tihe.fields, ['domain_href'])
+        else:
+            self.fail('TagCubeInvalidHrefException not raised')
+
+    def test_quick_scan_lookup_pool(self):
+        threads = []
+
+        def get_scan_profile(scan_profile, use_cache=True):
+            threads.append(threading.current_thread())
+            return Resource({'href': '/1.0/profiles/1'})
+
+        client = self.client
+        client.get_scan_profile = get_scan_profile
+        client.get_email_notification = Mock()
+        client._get_domain_and_verification = Mock(return_value=(Mock(),
+                                                                 Mock()))
+        client.low_level_scan = Mock()
+
+        for _ in xrange(10):
+            client.quick_scan(self.ROOT_URL)
+
+        # The lookups run in the same few threads, not in new ones
+        self.assertEqual(len(threads), 10)
+        self.assertLessEqual(len(set(threads)), client.LOOKUP_THREADS)
+        self.assertNotIn(threading.current_thread(), threads)
+
+        client.close()
+        self.assertIsNone(client._lookup_pool)
+
+    @httpretty.activate
+    def test_quick_scan_invalid_profile(self):
+        for resource in ('profiles', 'domains', 'notifications/email'):
+            url = "%s%s/%s/" % (self.ROOT_URL, self.API_VERSION, resource)
+            httpretty.register_uri(httpretty.GET, url,
+                                   body=EMPTY_REST_API_RESPONSE,
+                                   content_type="application/json")
+
         self.assertRaises(ValueError, self.client.quick_scan, self.ROOT_URL,
                           scan_profile='not_exists')
 
+        # No resources are created when the profile doesn't exist
+        methods = [r.method for r in httpretty.HTTPretty.latest_requests]
+        self.assertEqual(methods, ['GET'] * 3)
+
+    @httpretty.activate
+    def test_quick_scan_existing_resources(self):
+        resources = {
+            'profiles': '{"href": "/1.0/profiles/1", "id": 1}',
+            'domains': '{"href": "/1.0/domains/2", "id": 2,'
+                       ' "domain": "target.com"}',
+            'verifications': '{"href": "/1.0/verifications/3", "id": 3,'
+                             ' "success": true}',
+            'notifications/email': '{"href": "/1.0/notifications/email/4",'
+                                   ' "id": 4}'}
+
+        for resource, _json in resources.iteritems():
+            url = "%s%s/%s/" % (self.ROOT_URL, self.API_VERSION, resource)
+            httpretty.register_uri(httpretty.GET, url,
+                                   body=REST_API_RESPONSE_FMT % _json,
+                                   content_type="application/json")
+
+        url = "%s%s/scans/" % (self.ROOT_URL, self.API_VERSION)
+        httpretty.register_uri(httpretty.POST, url, status=201,
+                               body='{"id": 5, "href": "/1.0/scans/5"}',
+                               content_type="application/json")
+
+        scan_resource = self.client.quick_scan('http://target.com/')
+
+        # pylint: disable=E1101
+        self.assertEqual(scan_resource.id, 5)
+        # pylint: enable=E1101
+
+        request = httpretty.last_request()
+        self.assertEqual(request.path, '/1.0/scans/')
+        self.assertEqual(json.loads(request.body),
+                         {"verification_href": "/1.0/verifications/3",
+                          "profile_href": "/1.0/profiles/1",
+                          "start_time": "now",
+                          "email_notifications_href": [
+                              "/1.0/notifications/email/4"],
+                          "path_list": ["/"]})
+
     @httpretty.activate
     def test_domain_add(self):
         url = "%s%s/domains/" % (self.ROOT_URL, self.API_VERSION)
@@ -113,6 +300,8 @@ class TestTagCubeClient(unittest.TestCase):
 
         domain_resource = self.client.domain_add(self.TARGET_DOMAIN,
                                                  'A description')
+        self.assertEqual(self.client.get_domain(self.TARGET_DOMAIN),
+                         domain_resource)
 
         # pylint: disable=E1101
         self.assertEqual(domain_resource.id, 2)
@@ -229,3 +418,403 @@ class TestTagCubeClient(unittest.TestCase):
         domain_resource = self.client.get_domain('www.fogfu.com')
 
         self.assertEqual(domain_resource, None)
+
+    @httpretty.activate
+    def test_get_latest_verification_ordered(self):
+        url = "%s%s/verifications/" % (self.ROOT_URL, self.API_VERSION)
+        objects = [{'id': i, 'href': '/1.0/verifications/%s' % i}
+                   for i in xrange(1, 46)]
+        httpretty.register_uri(httpretty.GET, url,
+                               body=paginated_callback(objects),
+                               content_type="application/json")
+
+        verification = self.client.get_latest_verification('target.com', 80,
+                                                           False)
+
+        # pylint: disable=E1101
+        self.assertEqual(verification.id, 45)
+        # pylint: enable=E1101
+        self.assertEqual(len(httpretty.HTTPretty.latest_requests), 1)
+
+        query = httpretty.last_request().querystring
+        self.assertEqual(query['order_by'], [u'-id'])
+        self.assertEqual(query['limit'], [u'2'])
+        self.assertTrue(self.client.supports_order_by)
+
+    @httpretty.activate
+    def test_get_latest_verification_pagination(self):
+        url = "%s%s/verifications/" % (self.ROOT_URL, self.API_VERSION)
+        objects = [{'id': i, 'href': '/1.0/verifications/%s' % i}
+                   for i in xrange(1, 46)]
+        httpretty.register_uri(httpretty.GET, url,
+                               body=paginated_callback(objects,
+                                                       supports_ordering=False),
+                               content_type="application/json")
+
+        verification = self.client.get_latest_verification('target.com', 80,
+                                                           False)
+
+        # pylint: disable=E1101
+        self.assertEqual(verification.id, 45)
+        # pylint: enable=E1101
+
+        # The ordered request and then the three pages
+        self.assertEqual(len(httpretty.HTTPretty.latest_requests), 4)
+        self.assertFalse(self.client.supports_order_by)
+
+        # The client remembers that order_by is not supported
+        self.client.get_latest_verification('other.com', 80, False)
+
+        self.assertEqual(len(httpretty.HTTPretty.latest_requests), 7)
+        self.assertNotIn('order_by', httpretty.last_request().querystring)
+
+    @httpretty.activate
+    def test_iter_resources(self):
+        url = "%s%s/scans/" % (self.ROOT_URL, self.API_VERSION)
+        objects = [{'id': i} for i in xrange(25)]
+        httpretty.register_uri(httpretty.GET, url,
+                               body=paginated_callback(objects),
+                               content_type="application/json")
+
+        resources = self.client.iter_resources('scans', limit=10)
+
+        # Pages are only retrieved when needed
+        self.assertEqual(next(resources).id, 0)
+        self.assertEqual(len(httpretty.HTTPretty.latest_requests), 1)
+        self.assertEqual(httpretty.last_request().querystring,
+                         {u'limit': [u'10']})
+
+        self.assertEqual([r.id for r in resources], range(1, 25))
+        self.assertEqual(len(httpretty.HTTPretty.latest_requests), 3)
+
+    @httpretty.activate
+    def test_get_scans_id_in(self):
+        url = "%s%s/scans/" % (self.ROOT_URL, self.API_VERSION)
+        objects = [{'id': i, 'status': 'running'} for i in xrange(1, 5)]
+
+        def callback(request, uri, headers):
+            ids = request.querystring['id__in'][0].split(',')
+            selected = [o for o in objects if str(o['id']) in ids]
+            return paginated_callback(selected)(request, uri, headers)
+
+        httpretty.register_uri(httpretty.GET, url, body=callback,
+                               content_type="application/json")
+
+        scans = self.client.get_scans(['1', 3, 99, '1'], chunk_size=2)
+
+        self.assertEqual(sorted(scans.keys()), [3, '1'])
+        self.assertEqual(scans[3].status, 'running')
+        self.assertEqual(scans.errors.keys(), [99])
+        self.assertIsInstance(scans.errors[99], TagCubeNotFoundException)
+        self.assertEqual(len(httpretty.HTTPretty.latest_requests), 2)
+        self.assertTrue(self.client.supports_id_in)
+
+    @httpretty.activate
+    def test_get_scans_fallback(self):
+        url = "%s%s/scans/" % (self.ROOT_URL, self.API_VERSION)
+        objects = [{'id': i} for i in xrange(50, 0, -1)]
+
+        # The filter is ignored and all the scans are returned
+        httpretty.register_uri(httpretty.GET, url,
+                               body=paginated_callback(objects),
+                               content_type="application/json")
+
+        for scan_id in (1, 2):
+            httpretty.register_uri(httpretty.GET, '%s%s' % (url, scan_id),
+                                   body='{"id": %s}' % scan_id,
+                                   content_type="application/json")
+
+        httpretty.register_uri(httpretty.GET, '%s99' % url, status=404,
+                               body='{}', content_type="application/json")
+
+        scans = self.client.get_scans([1, 2, 99], concurrency=2)
+
+        self.assertEqual(sorted(scans.keys()), [1, 2])
+        self.assertIsInstance(scans.errors[99], TagCubeNotFoundException)
+        self.assertFalse(self.client.supports_id_in)
+
+        # Only the first page of the list was retrieved
+        self.assertEqual(len(httpretty.HTTPretty.latest_requests), 4)
+
+        scans = self.client.get_scans([1])
+        self.assertEqual(scans[1].id, 1)
+        self.assertEqual(httpretty.last_request().path, '/1.0/scans/1')
+
+    @httpretty.activate
+    def test_get_scans_model(self):
+        url = "%s%s/scans/" % (self.ROOT_URL, self.API_VERSION)
+        objects = [{'id': 1, 'status': 'running', 'new_field': 'x'}]
+        httpretty.register_uri(httpretty.GET, url,
+                               body=paginated_callback(objects),
+                               content_type="application/json")
+        httpretty.register_uri(httpretty.GET, '%s2' % url,
+                               body='{"id": 2, "status": "finished"}',
+                               content_type="application/json")
+
+        scans = self.client.get_scans([1], model=Scan)
+
+        self.assertIsInstance(scans[1], Scan)
+        self.assertEqual(scans[1].status, 'running')
+        self.assertEqual(scans[1]['new_field'], 'x')
+
+        self.client.supports_id_in = False
+        scans = self.client.get_scans([2], model=Scan)
+
+        self.assertIsInstance(scans[2], Scan)
+        self.assertEqual(scans[2].to_dict(), {'id': 2, 'status': 'finished'})
+
+    @httpretty.activate
+    def test_wait_for_scans(self):
+        # Scan 1 changes after two polls, scan 2 is already finished
+        states = {'1': [('a', {'status': 'running', 'progress': 10}),
+                        ('a', None),
+                        ('a', None),
+                        ('b', {'status': 'finished', 'progress': 100})],
+                  '2': [('c', {'status': 'finished', 'progress': 100})]}
+        conditional = []
+
+        def callback(request, uri, headers):
+            scan_id = uri.rstrip('/').split('/')[-1]
+            etag, scan = states[scan_id].pop(0)
+
+            if_none_match = request.headers.get('If-None-Match')
+            conditional.append(if_none_match)
+
+            if scan is None:
+                self.assertEqual(if_none_match, etag)
+                return 304, headers, ''
+
+            headers['ETag'] = etag
+            return 200, headers, json.dumps(dict(scan, id=int(scan_id)))
+
+        for scan_id in states:
+            url = '%s%s/scans/%s' % (self.ROOT_URL, self.API_VERSION, scan_id)
+            httpretty.register_uri(httpretty.GET, url, body=callback,
+                                   content_type='application/json')
+
+        clock = [0]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            clock[0] += seconds
+
+        changes = []
+        results = self.client.wait_for_scans(['1', '2'], min_interval=5,
+                                             max_interval=60,
+                                             callback=lambda i, s: changes.append(i),
+                                             clock=lambda: clock[0],
+                                             sleep=sleep)
+
+        self.assertEqual(results['1'].status, 'finished')
+        self.assertEqual(results['2'].status, 'finished')
+        self.assertEqual(changes, ['1', '2', '1'])
+        self.assertEqual(conditional, [None, None, 'a', 'a', 'a'])
+
+        # The interval grows while the scan doesn't change
+        self.assertEqual(sleeps, [5, 7.5, 11.25])
+
+    @httpretty.activate
+    def test_wait_for_scans_timeout(self):
+        url = '%s%s/scans/1' % (self.ROOT_URL, self.API_VERSION)
+        httpretty.register_uri(httpretty.GET, url,
+                               body='{"id": 1, "status": "running"}',
+                               content_type='application/json')
+
+        clock = [0]
+
+        def sleep(seconds):
+            clock[0] += seconds
+
+        results = self.client.wait_for_scans(['1'], timeout=30,
+                                             clock=lambda: clock[0],
+                                             sleep=sleep)
+
+        self.assertFalse(self.client.is_scan_finished(results['1']))
+        self.assertLessEqual(clock[0], 30)
+
+    @httpretty.activate
+    def test_wait_for_scans_unknown_id(self):
+        url = '%s%s/scans/1' % (self.ROOT_URL, self.API_VERSION)
+        responses = [httpretty.Response('{"id": 1, "status": "running"}'),
+                     httpretty.Response('{"id": 1, "status": "finished"}')]
+        httpretty.register_uri(httpretty.GET, url, responses=responses,
+                               content_type='application/json')
+
+        url = '%s%s/scans/2' % (self.ROOT_URL, self.API_VERSION)
+        httpretty.register_uri(httpretty.GET, url, status=404,
+                               body='{"error": "Not found"}',
+                               content_type='application/json')
+
+        clock = [0]
+
+        def sleep(seconds):
+            clock[0] += seconds
+
+        results = self.client.wait_for_scans(['1', '2'],
+                                             clock=lambda: clock[0],
+                                             sleep=sleep)
+
+        # The unknown scan is only requested once, the other one is polled
+        # until it finishes
+        self.assertEqual(results['1'].status, 'finished')
+        self.assertNotIn('2', results)
+        self.assertIsInstance(results.errors['2'], TagCubeNotFoundException)
+
+        paths = [r.path for r in httpretty.HTTPretty.latest_requests]
+        self.assertEqual(paths.count('/%s/scans/2' % self.API_VERSION), 1)
+
+    @httpretty.activate
+    def test_conditional_get_copies(self):
+        url = "%s%s/users/~" % (self.ROOT_URL, self.API_VERSION)
+        body = '{"id": 1, "email": "x@y.com", "roles": ["admin"]}'
+        responses = [httpretty.Response(body, adding_headers={'ETag': '"v1"'}),
+                     httpretty.Response('', status=304),
+                     httpretty.Response('', status=304)]
+        httpretty.register_uri(httpretty.GET, url, responses=responses,
+                               content_type="application/json")
+
+        # Changing the results doesn't change the cached response
+        for _ in xrange(2):
+            user = self.client.get_current_user()
+            self.assertEqual(user['email'], 'x@y.com')
+            self.assertEqual(user['roles'], ['admin'])
+
+            user['email'] = 'changed@y.com'
+            user['roles'].append('changed')
+
+        user = self.client.get_current_user()
+        self.assertEqual(user['email'], 'x@y.com')
+        self.assertEqual(user['roles'], ['admin'])
+        self.assertEqual(self.client.http_cache.hits, 2)
+
+    @httpretty.activate
+    def test_conditional_get(self):
+        url = "%s%s/users/~" % (self.ROOT_URL, self.API_VERSION)
+        body = '{"id": 1, "email": "x@y.com"}'
+        responses = [httpretty.Response(body, adding_headers={'ETag': '"v1"'}),
+                     httpretty.Response('', status=304)]
+        httpretty.register_uri(httpretty.GET, url, responses=responses,
+                               content_type="application/json")
+
+        self.assertEqual(self.client.get_current_user()['email'], 'x@y.com')
+        self.assertNotIn('If-None-Match', httpretty.last_request().headers)
+
+        self.assertEqual(self.client.get_current_user()['email'], 'x@y.com')
+        self.assertEqual(httpretty.last_request().headers['If-None-Match'],
+                         '"v1"')
+
+        self.assertEqual(self.client.http_cache.hits, 1)
+        self.assertEqual(self.client.http_cache.misses, 1)
+
+    def test_format_debug_body(self):
+        json_data = {'objects': range(100)}
+
+        self.assertEqual(self.client.format_debug_body(json_data),
+                         json.dumps(json_data, indent=4))
+
+        self.client.debug_body_limit = 20
+        formatted = self.client.format_debug_body(json_data)
+
+        self.assertTrue(formatted.startswith(json.dumps(json_data,
+                                                        indent=4)[:20]))
+        self.assertTrue(formatted.endswith('characters truncated)'))
+
+    @httpretty.activate
+    def test_debug_body_not_formatted(self):
+        url = "%s%s/users/~" % (self.ROOT_URL, self.API_VERSION)
+        httpretty.register_uri(httpretty.GET, url, body='{"id": 1}',
+                               content_type="application/json")
+
+        self.client.set_verbose(False)
+
+        with patch.object(self.client, 'format_debug_body') as format_mock:
+            self.client.get_current_user()
+            self.assertEqual(format_mock.call_count, 0)
+
+    def test_verbose_sanitizes_stdout(self):
+        stdout = sys.stdout
+        self.assertNotIsInstance(stdout, CleanUpWrapper)
+
+        try:
+            self.client.set_verbose(True)
+            self.assertIsInstance(sys.stdout, CleanUpWrapper)
+        finally:
+            self.client.set_verbose(False)
+
+        self.assertIs(sys.stdout, stdout)
+
+    @httpretty.activate
+    def test_iter_resources_stream(self):
+        url = "%s%s/scans/" % (self.ROOT_URL, self.API_VERSION)
+        objects = [{'id': i, 'href': '/1.0/scans/%s' % i} for i in xrange(25)]
+        httpretty.register_uri(httpretty.GET, url,
+                               body=paginated_callback(objects),
+                               content_type="application/json")
+
+        resources = self.client.iter_resources('scans', limit=10, stream=True)
+
+        self.assertEqual(next(resources).href, '/1.0/scans/0')
+        self.assertEqual([r.id for r in resources], range(1, 25))
+        self.assertEqual(len(httpretty.HTTPretty.latest_requests), 3)
+
+    @httpretty.activate
+    def test_retry_get(self):
+        url = "%s%s/profiles/" % (self.ROOT_URL, self.API_VERSION)
+        responses = [httpretty.Response('{}', status=503),
+                     httpretty.Response('{}', status=429,
+                                        adding_headers={'Retry-After': '3'}),
+                     httpretty.Response(EMPTY_REST_API_RESPONSE)]
+        httpretty.register_uri(httpretty.GET, url, responses=responses,
+                               content_type="application/json")
+
+        sleeps = []
+        self.client.retry_policy = RetryPolicy(sleep=sleeps.append,
+                                               jitter=False)
+
+        self.assertIsNone(self.client.get_scan_profile('fast_scan'))
+        self.assertEqual(len(httpretty.HTTPretty.latest_requests), 3)
+        self.assertEqual(sleeps, [0.5, 3])
+
+    @httpretty.activate
+    def test_no_retry_post(self):
+        url = "%s%s/domains/" % (self.ROOT_URL, self.API_VERSION)
+        httpretty.register_uri(httpretty.POST, url, body='{}', status=503,
+                               content_type="application/json")
+
+        self.client.retry_policy = RetryPolicy(sleep=lambda _: None)
+
+        self.assertRaises(TagCubeAPIException, self.client.domain_add,
+                          self.TARGET_DOMAIN)
+        self.assertEqual(len(httpretty.HTTPretty.latest_requests), 1)
+
+    @httpretty.activate
+    def test_rate_limiter(self):
+        url = "%s%s/profiles/" % (self.ROOT_URL, self.API_VERSION)
+        responses = [httpretty.Response('{}', status=503),
+                     httpretty.Response(EMPTY_REST_API_RESPONSE)]
+        httpretty.register_uri(httpretty.GET, url, responses=responses,
+                               content_type="application/json")
+
+        self.client.retry_policy = RetryPolicy(sleep=lambda _: None)
+        self.client.rate_limiter = Mock()
+
+        self.client.get_scan_profile('fast_scan')
+
+        # One token for each attempt
+        self.assertEqual(self.client.rate_limiter.acquire.call_count, 2)
+
+    def test_configure_requests(self):
+        client = TagCubeClient(self.EMAIL, self.API_KEY, pool_maxsize=50,
+                               timeout=(1, 2), keep_alive=False)
+
+        adapter = client.session.get_adapter(self.ROOT_URL)
+        self.assertEqual(adapter.poolmanager.connection_pool_kw['maxsize'], 50)
+        self.assertEqual(client.timeout, (1, 2))
+        self.assertEqual(client.session.headers['Connection'], 'close')
+
+        client = TagCubeClient(self.EMAIL, self.API_KEY)
+        adapter = client.session.get_adapter(self.ROOT_URL)
+        socket_options = adapter.poolmanager.connection_pool_kw['socket_options']
+        self.assertIn((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+                      socket_options)
@@ -0,0 +1,55 @@
+import unittest
+import httpretty
+
+from tagcube.client.api import TagCubeClient
+from tagcube.client.async_api import AsyncTagCubeClient
+from tagcube.client.tests.test_api import REST_API_RESPONSE_FMT
+from tagcube.utils.exceptions import IncorrectAPICredentials
+
+
+class TestAsyncTagCubeClient(unittest.TestCase):
+
+    ROOT_URL = TagCubeClient.DEFAULT_ROOT_URL
+    API_VERSION = TagCubeClient.API_VERSION
+    EMAIL = 'foo@bar.com'
+    API_KEY = 'f364b098-0fb3-4178-a45b-883f389ad294'
+
+    def setUp(self):
+        super(TestAsyncTagCubeClient, self).setUp()
+        self.client = AsyncTagCubeClient(self.EMAIL, self.API_KEY, workers=4)
+
+    def tearDown(self):
+        super(TestAsyncTagCubeClient, self).tearDown()
+        self.client.close()
+
+    def test_wrapped_methods(self):
+        for name, value in vars(AsyncTagCubeClient).items():
+            doc = getattr(value, '__doc__', None) or ''
+            if doc.startswith('Asynchronous version'):
+                self.assertTrue(callable(getattr(TagCubeClient, name)))
+
+        self.assertEqual(self.client.client.session.adapters['https://']
+                         ._pool_maxsize, 4 + TagCubeClient.LOOKUP_THREADS)
+
+    @httpretty.activate
+    def test_many_requests(self):
+        url = "%s%s/scans/1" % (self.ROOT_URL, self.API_VERSION)
+        httpretty.register_uri(httpretty.GET, url, body='{"id": 1}',
+                               content_type="application/json")
+
+        callback_results = []
+        results = [self.client.get_scan(1, callback=callback_results.append)
+                   for _ in xrange(10)]
+
+        self.assertEqual([r.get(5).id for r in results], [1] * 10)
+        self.assertEqual(len(callback_results), 10)
+
+    @httpretty.activate
+    def test_error_mapping(self):
+        url = "%s%s/profiles/" % (self.ROOT_URL, self.API_VERSION)
+        body = REST_API_RESPONSE_FMT % '{"href": "/1.0/profiles/1"}'
+        httpretty.register_uri(httpretty.GET, url, body=body, status=401,
+                               content_type="application/json")
+
+        result = self.client.get_scan_profile('fast_scan')
+        self.assertRaises(IncorrectAPICredentials, result.get, 5)
@@ -0,0 +1,263 @@
+import os
+import time
+import json
+import fcntl
+import urllib
+import hashlib
+import tempfile
+import threading
+
+from contextlib import contextmanager
+from collections import OrderedDict
+
+from tagcube.utils.resource import Resource
+
+# Returned by ResourceCache.get() when the key is not in the cache, we can't
+# use None because "no resource matches the filter" is also cached
+CACHE_MISS = object()
+
+
+def get_cache_key(resource_name, filter_dict, result_handler):
+    """
+    :return: A string which uniquely identifies a filter query, the
+             filter_dict items are sorted to make sure that the key is the
+             same for equal dicts.
+    """
+    query_string = urllib.urlencode(sorted(filter_dict.items()))
+    return '%s?%s#%s' % (resource_name, query_string, result_handler)
+
+
+def get_disk_cache_filename(cache_dir, email, api_key, root_url,
+                            suffix=''):
+    """
+    :param suffix: Added to the filename to store different caches for the
+                   same credentials and root_url
+    :return: The filename where the cache for the credentials and REST API
+             root_url is stored. Credentials and URLs are hashed, we don't
+             want to store them in plain text.
+    """
+    credentials_hash = hashlib.sha1('%s:%s' % (email, api_key)).hexdigest()
+    root_url_hash = hashlib.sha1(root_url).hexdigest()
+
+    return os.path.join(os.path.expanduser(cache_dir),
+                        credentials_hash[:16],
+                        '%s%s.json' % (root_url_hash[:16], suffix))
+
+
+class ResourceCache(object):
+    """
+    A thread-safe, in-process cache for the results of resource lookups.
+
+    Entries expire `ttl` seconds after they were stored and the least recently
+    used entry is evicted when more than `max_size` entries are stored. A
+    `ttl` of zero disables the cache.
+
+    When a `store` (see DiskStore) is configured it is consulted after a
+    memory miss and updated on every set(), this allows the cache to be
+    shared with other processes.
+    """
+    def __init__(self, ttl=300, max_size=1024, clock=time.time, store=None):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.clock = clock
+        self.store = store
+
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def get(self, key):
+        """
+        :return: The cached value for key, or CACHE_MISS
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+
+        if entry is None and self.store is not None and self.ttl > 0:
+            entry = self.store.get(key)
+
+        if entry is None or entry[0] < self.clock():
+            self.misses += 1
+            return CACHE_MISS
+
+        with self._lock:
+            # (Re-)insert to mark the key as the most recently used
+            self._set_entry(key, entry)
+            self.hits += 1
+
+        return entry[1]
+
+    def set(self, key, value):
+        if self.ttl <= 0:
+            return
+
+        expires = self.clock() + self.ttl
+
+        with self._lock:
+            self._set_entry(key, (expires, value))
+
+        if self.store is not None:
+            self.store.set(key, expires, value)
+
+    def _set_entry(self, key, entry):
+        self._entries.pop(key, None)
+        self._entries[key] = entry
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get_or_load(self, key, loader):
+        """
+        Get the value for key from the cache, or call loader() to get it and
+        store it. Concurrent calls for the same key will only call loader()
+        once, the rest wait for the result.
+
+        :return: The cached or loaded value
+        """
+        value = self.get(key)
+        if value is not CACHE_MISS:
+            return value
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        try:
+            with key_lock:
+                value = self.get(key)
+                if value is CACHE_MISS:
+                    value = loader()
+                    self.set(key, value)
+        finally:
+            with self._lock:
+                self._key_locks.pop(key, None)
+
+        return value
+
+    def invalidate(self, resource_name=None):
+        """
+        Remove all the entries for resource_name, or all entries if
+        resource_name is None.
+        """
+        with self._lock:
+            if resource_name is None:
+                self._entries.clear()
+            else:
+                prefix = '%s?' % resource_name
+                for key in self._entries.keys():
+                    if key.startswith(prefix):
+                        del self._entries[key]
+
+        if self.store is not None:
+            self.store.invalidate(resource_name)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DiskStore(object):
+    """
+    Stores cache entries in a JSON file which can be shared by many processes.
+
+    Writes are serialized using an exclusive flock() on a lock file, the new
+    contents are written to a temporary file which is then renamed, so readers
+    never see a partially written file and don't need to lock.
+    """
+    def __init__(self, filename, max_size=1024, clock=time.time):
+        self.filename = filename
+        self.lock_filename = '%s.lock' % filename
+        self.max_size = max_size
+        self.clock = clock
+
+        dirname = os.path.dirname(filename)
+        if not os.path.isdir(dirname):
+            try:
+                os.makedirs(dirname, 0700)
+            except OSError:
+                # Another process might have created it
+                if not os.path.isdir(dirname):
+                    raise
+
+    def get(self, key):
+        """
+        :return: An (expires, value) tuple, or None when the key is not stored
+        """
+        entry = self._read().get(key)
+        if entry is None:
+            return None
+
+        expires, value = entry
+        return expires, to_resource(value)
+
+    def set(self, key, expires, value):
+        with self._write_lock():
+            entries = self._read()
+            entries[key] = (expires, value)
+            self._write(self._prune(entries))
+
+    def invalidate(self, resource_name=None):
+        with self._write_lock():
+            if resource_name is None:
+                entries = {}
+            else:
+                prefix = '%s?' % resource_name
+                entries = dict((k, v) for k, v in self._read().iteritems()
+                               if not k.startswith(prefix))
+
+            self._write(entries)
+
+    def _prune(self, entries):
+        """
+        Remove expired entries, and the ones which expire sooner if there are
+        more than max_size
+        """
+        now = self.clock()
+        alive = [(v[0], k) for k, v in entries.iteritems() if v[0] >= now]
+        alive.sort(reverse=True)
+
+        return dict((k, entries[k]) for _, k in alive[:self.max_size])
+
+    @contextmanager
+    def _write_lock(self):
+        with open(self.lock_filename, 'a') as lock_fd:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_fd, fcntl.LOCK_UN)
+
+    def _read(self):
+        try:
+            with open(self.filename) as cache_fd:
+                return json.load(cache_fd)
+        except (IOError, ValueError):
+            # The file doesn't exist yet or is corrupt, start from scratch
+            return {}
+
+    def _write(self, entries):
+        dirname = os.path.dirname(self.filename)
+        tmp_fd, tmp_filename = tempfile.mkstemp(dir=dirname, prefix='.tmp-')
+
+        try:
+            with os.fdopen(tmp_fd, 'w') as cache_fd:
+                json.dump(entries, cache_fd)
+            os.rename(tmp_filename, self.filename)
+        except:
+            os.unlink(tmp_filename)
+            raise
+
+
+def to_resource(value):
+    """
+    Values read from the disk are plain dicts, convert them back to the types
+    returned by the result handlers.
+    """
+    if isinstance(value, dict):
+        return Resource(value)
+
+    if isinstance(value, list):
+        return [to_resource(v) for v in value]
+
+    return value
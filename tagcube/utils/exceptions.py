@@ -2,6 +2,21 @@ class TagCubeAPIException(Exception):
     pass
 
 
+class TagCubeNotFoundException(TagCubeAPIException):
+    pass
+
+
+class TagCubeInvalidHrefException(TagCubeAPIException):
+    """
+    The REST API rejected the href of a related resource (verification_href,
+    profile_href, etc.) sent to create a new resource, usually because that
+    resource was removed. `fields` has the names of the rejected fields.
+    """
+    def __init__(self, message, fields=()):
+        super(TagCubeInvalidHrefException, self).__init__(message)
+        self.fields = fields
+
+
 class IncorrectAPICredentials(Exception):
     pass
 
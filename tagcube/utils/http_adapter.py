@@ -0,0 +1,49 @@
+import socket
+
+from requests.adapters import HTTPAdapter
+
+# socket_options and default_socket_options need the urllib3 bundled with
+# requests >= 2.4.0
+# pylint: disable=E0401
+from requests.packages.urllib3.connection import HTTPConnection
+# pylint: enable=E0401
+
+
+def get_tcp_keepalive_options(idle=60, interval=20, count=5):
+    """
+    :return: The socket options to enable TCP keep-alive, idle connections in
+             the pool are probed so they are not silently dropped by NAT
+             gateways and load balancers.
+    """
+    options = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+
+    # These are only available in Linux
+    for name, value in (('TCP_KEEPIDLE', idle),
+                        ('TCP_KEEPINTVL', interval),
+                        ('TCP_KEEPCNT', count)):
+        if hasattr(socket, name):
+            options.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+
+    return options
+
+
+class TagCubeHTTPAdapter(HTTPAdapter):
+    """
+    A requests HTTPAdapter which (optionally) enables TCP keep-alive in the
+    pooled connections.
+    """
+    __attrs__ = HTTPAdapter.__attrs__ + ['socket_options']
+
+    def __init__(self, tcp_keepalive=True, **kwargs):
+        # Needs to be set before calling HTTPAdapter.__init__ which calls
+        # init_poolmanager
+        self.socket_options = list(HTTPConnection.default_socket_options)
+
+        if tcp_keepalive:
+            self.socket_options.extend(get_tcp_keepalive_options())
+
+        super(TagCubeHTTPAdapter, self).__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = self.socket_options
+        super(TagCubeHTTPAdapter, self).init_poolmanager(*args, **kwargs)
@@ -0,0 +1,148 @@
+import time
+import threading
+
+from collections import OrderedDict
+
+
+class HTTPCache(object):
+    """
+    Stores the body of GET responses which have an ETag or Last-Modified
+    header, so the next request for the same URL can be sent with
+    If-None-Match / If-Modified-Since and a 304 response is answered from
+    the cache, without downloading the body again.
+
+    The raw body is stored instead of the decoded JSON: bytes are immutable,
+    so they don't need to be copied when stored, and decoding them again on
+    each 304 gives every caller its own objects, faster than deep-copying
+    the decoded JSON.
+
+    Entries don't expire (they are validated by the REST API on each
+    request), the least recently used entry is evicted when more than
+    `max_size` entries are stored.
+
+    When a `store` (see DiskStore) is configured it is consulted after a
+    memory miss and updated when a response with a body of up to
+    `store_max_body_size` bytes is set(), entries in the store are removed
+    when they are not used for `store_max_age` seconds. The store rewrites
+    the whole file on each update, only small resources (users, profiles,
+    domains, ...) are worth sharing with other processes; pages of results
+    are only kept in memory.
+
+    `hits` counts the responses which were answered from the cache (304) and
+    `misses` the ones which were downloaded.
+    """
+    def __init__(self, max_size=256, store=None, store_max_age=7 * 24 * 3600,
+                 store_max_body_size=4096, clock=time.time):
+        self.max_size = max_size
+        self.store = store
+        self.store_max_age = store_max_age
+        self.store_max_body_size = store_max_body_size
+        self.clock = clock
+
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        """
+        :return: The cache entry for url (a dict with the validators, status
+                 code and body), or None
+        """
+        with self._lock:
+            entry = self._entries.pop(url, None)
+
+            if entry is not None:
+                self._entries[url] = entry
+                return entry
+
+        if self.store is None:
+            return None
+
+        stored = self.store.get(url)
+        if stored is None or stored[0] < self.clock():
+            return None
+
+        entry = stored[1]
+        if not isinstance(entry.get('body'), basestring):
+            # Stored by a previous version, which kept the decoded JSON
+            return None
+
+        # The store decodes the body as unicode
+        entry['body'] = entry['body'].encode('utf-8')
+
+        with self._lock:
+            self._set_entry(url, entry)
+
+        return entry
+
+    def get_conditional_headers(self, entry):
+        """
+        :return: The headers to send to validate the cached entry
+        """
+        headers = {}
+
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+        return headers
+
+    def set(self, url, response):
+        """
+        Store the response body if it has validators
+        """
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+
+        if response.status_code != 200 or not (etag or last_modified):
+            return
+
+        body = response.content
+
+        entry = {'etag': etag,
+                 'last_modified': last_modified,
+                 'status_code': response.status_code,
+                 'body': body}
+
+        with self._lock:
+            self._set_entry(url, entry)
+
+        if self.store is None or len(body) > self.store_max_body_size:
+            return
+
+        try:
+            body.decode('utf-8')
+        except UnicodeDecodeError:
+            # Can't be stored in the JSON file
+            return
+
+        self.store.set(url, self.clock() + self.store_max_age, entry)
+
+    def _set_entry(self, url, entry):
+        self._entries.pop(url, None)
+        self._entries[url] = entry
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def record_hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+        if self.store is not None:
+            self.store.invalidate()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,56 @@
+import json
+import importlib
+
+# The optional, faster, JSON libraries we try to use for decoding, in order
+# of preference. The standard library is always available.
+JSON_BACKENDS = ('orjson', 'simplejson', 'ujson', 'json')
+
+
+class JSONCodec(object):
+    """
+    The functions used by TagCubeClient to encode the request bodies and
+    decode the response bodies.
+
+    loads() receives the response body as bytes, all the supported backends
+    decode UTF-8 bytes directly, there is no need to decode them to text
+    first (like requests' response.json() does). The decoded strings are not
+    normalized: simplejson returns str instead of unicode for the ASCII-only
+    strings. Both compare, hash and encode the same way, but code which
+    checks isinstance(value, unicode) has to accept basestring.
+
+    dumps() is always json.dumps from the standard library for the built-in
+    codecs: the faster libraries use different separators and escaping, and
+    we want the request bodies to be the same regardless of which libraries
+    are installed.
+    """
+    __slots__ = ('name', 'loads', 'dumps')
+
+    def __init__(self, name, loads, dumps=json.dumps):
+        self.name = name
+        self.loads = loads
+        self.dumps = dumps
+
+    def __repr__(self):
+        return '<JSONCodec %s>' % self.name
+
+
+def get_json_codec(backend=None):
+    """
+    :param backend: One of JSON_BACKENDS, or None to use the fastest one
+                    which is installed
+    :return: A JSONCodec
+    """
+    if backend is not None:
+        if backend not in JSON_BACKENDS:
+            msg = 'Invalid JSON backend "%s", use one of: %s'
+            raise ValueError(msg % (backend, ', '.join(JSON_BACKENDS)))
+
+        return JSONCodec(backend, importlib.import_module(backend).loads)
+
+    for backend in JSON_BACKENDS:
+        try:
+            module = importlib.import_module(backend)
+        except ImportError:
+            continue
+
+        return JSONCodec(backend, module.loads)
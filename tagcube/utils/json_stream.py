@@ -0,0 +1,234 @@
+import re
+import json
+
+from tagcube.utils.exceptions import TagCubeAPIException
+
+# Outside strings we only care about these characters, everything else
+# (whitespace, numbers, true, false, null) is part of a value we capture
+STRUCTURE_RE = re.compile(r'["{}\[\],:]')
+
+# Inside strings we only care about the end of the string and escapes
+STRING_RE = re.compile(r'["\\]')
+
+NOT_JSON = ('TagCube REST API did not return JSON, if this issue persists'
+            ' please contact support@tagcube.io')
+
+
+class ListingParser(object):
+    """
+    Incremental parser for the REST API listings:
+
+        {"meta": {"next": ..., ...}, "objects": [{...}, {...}, ...]}
+
+    The body is fed in chunks as it is received, and each item in the
+    `objects` array is decoded (using `loads`) and returned as soon as it is
+    complete. The buffer only keeps the bytes of the item being received, so
+    memory usage depends on the size of the largest item, not the page.
+
+    The rest of the top level fields (meta, error, ...) are decoded and
+    stored in `fields`. The old listing format, a top level array with the
+    objects, is also supported.
+    """
+    OBJECTS_KEY = 'objects'
+
+    def __init__(self, loads=json.loads):
+        self.loads = loads
+        self.fields = {}
+
+        self._buffer = ''
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._done = False
+
+        # The depth of the array we yield items from, None when we're not in
+        # that array
+        self._array_depth = None
+
+        # Top level key handling
+        self._expect_key = False
+        self._key = None
+        self._key_start = None
+        self._value_start = None
+
+        self._item_start = None
+
+    def feed(self, chunk):
+        """
+        :param chunk: The next bytes in the response body
+        :return: A list with the objects which were completed by this chunk
+        """
+        self._buffer += chunk
+        items = []
+
+        buf = self._buffer
+        pos = self._pos
+
+        while True:
+            if self._in_string:
+                match = STRING_RE.search(buf, pos)
+                if match is None:
+                    pos = len(buf)
+                    break
+
+                i = match.start()
+
+                if match.group() == '\\':
+                    if i + 1 >= len(buf):
+                        # The escaped character is in the next chunk
+                        pos = i
+                        break
+
+                    pos = i + 2
+                    continue
+
+                self._in_string = False
+                pos = i + 1
+
+                if self._key_start is not None:
+                    self._key = self.loads(buf[self._key_start:pos])
+                    self._key_start = None
+                continue
+
+            match = STRUCTURE_RE.search(buf, pos)
+            end = len(buf) if match is None else match.start()
+
+            if self._depth == 0 and buf[pos:end].strip():
+                raise ValueError('Expected a JSON object or array')
+
+            if match is None:
+                pos = len(buf)
+                break
+
+            char = match.group()
+            i = match.start()
+            pos = i + 1
+
+            if self._depth == 0 and (self._done or char not in '{['):
+                raise ValueError('Expected a JSON object or array')
+
+            if char == '"':
+                self._in_string = True
+
+                if self._depth == 1 and self._expect_key:
+                    self._key_start = i
+
+            elif char == '{' or char == '[':
+                self._depth += 1
+
+                if self._depth == 1:
+                    if char == '{':
+                        self._expect_key = True
+                    else:
+                        # Old format, the top level array has the objects
+                        self._start_array(pos)
+
+                elif (self._depth == 2 and char == '[' and
+                      self._key == self.OBJECTS_KEY):
+                    self._value_start = None
+                    self._start_array(pos)
+
+            elif char == ':':
+                if self._depth == 1:
+                    self._expect_key = False
+                    self._value_start = pos
+
+            elif char == ',':
+                if self._depth == self._array_depth:
+                    self._add_item(items, buf[self._item_start:i])
+                    self._item_start = pos
+
+                elif self._depth == 1:
+                    self._end_value(buf, i)
+                    self._expect_key = True
+
+            else:
+                # } or ]
+                if self._depth == self._array_depth:
+                    self._add_item(items, buf[self._item_start:i])
+                    self._array_depth = None
+                    self._item_start = None
+
+                if self._depth == 1 and char == '}':
+                    self._end_value(buf, i)
+
+                self._depth -= 1
+                self._done = self._depth == 0
+
+        self._trim(pos)
+        return items
+
+    def close(self):
+        """
+        Verify that the whole body was received
+        """
+        if not self._done:
+            raise ValueError('Incomplete JSON document')
+
+    def _start_array(self, pos):
+        self._array_depth = self._depth
+        self._item_start = pos
+
+    def _add_item(self, items, data):
+        data = data.strip()
+
+        # Empty arrays have no items
+        if data:
+            items.append(self.loads(data))
+
+    def _end_value(self, buf, end):
+        if self._value_start is not None:
+            self.fields[self._key] = self.loads(buf[self._value_start:end])
+            self._value_start = None
+
+        self._key = None
+
+    def _trim(self, pos):
+        """
+        Remove the bytes we don't need anymore from the buffer
+        """
+        starts = [s for s in (self._item_start, self._value_start,
+                              self._key_start) if s is not None]
+        keep_from = min(starts + [pos])
+
+        self._buffer = self._buffer[keep_from:]
+        self._pos = pos - keep_from
+
+        if self._item_start is not None:
+            self._item_start -= keep_from
+
+        if self._value_start is not None:
+            self._value_start -= keep_from
+
+        if self._key_start is not None:
+            self._key_start -= keep_from
+
+
+class StreamedPage(object):
+    """
+    Iterate over the objects in a listing response while it is received, the
+    rest of the top level fields are available in `fields` after the
+    iteration finished.
+    """
+    def __init__(self, response, loads=json.loads, chunk_size=8192):
+        self.response = response
+        self.parser = ListingParser(loads=loads)
+        self.chunk_size = chunk_size
+
+    @property
+    def fields(self):
+        return self.parser.fields
+
+    def __iter__(self):
+        try:
+            for chunk in self.response.iter_content(self.chunk_size):
+                for rjson in self.parser.feed(chunk):
+                    yield rjson
+
+            self.parser.close()
+        except ValueError:
+            raise TagCubeAPIException(NOT_JSON)
+        finally:
+            # Release the connection if the caller stops iterating before
+            # the end of the response
+            self.response.close()
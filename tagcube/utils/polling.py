@@ -0,0 +1,46 @@
+class PollInterval(object):
+    """
+    The time to wait before polling a resource again, it grows while the
+    resource doesn't change (long running scans) and is reset to the minimum
+    when the resource is close to completion.
+    """
+    __slots__ = ('min_interval', 'max_interval', 'factor', 'current')
+
+    # Progress (in %) from which we poll using the minimum interval
+    NEAR_COMPLETION = 90
+
+    def __init__(self, min_interval, max_interval, factor=1.5):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.factor = factor
+        self.current = min_interval
+
+    def update(self, changed, progress=None):
+        """
+        :param changed: True if the resource changed since the last poll
+        :param progress: The resource's progress in %, if known
+        :return: The number of seconds to wait before the next poll
+        """
+        if progress is not None and progress >= self.NEAR_COMPLETION:
+            self.current = self.min_interval
+
+        elif changed:
+            self.current = max(self.min_interval, self.current / self.factor)
+
+        else:
+            self.current = min(self.max_interval, self.current * self.factor)
+
+        return self.current
+
+
+class PollState(object):
+    """
+    What we know about one of the resources being polled
+    """
+    __slots__ = ('resource', 'etag', 'due', 'interval')
+
+    def __init__(self, interval, due):
+        self.resource = None
+        self.etag = None
+        self.due = due
+        self.interval = interval
@@ -0,0 +1,96 @@
+import os
+import time
+import fcntl
+import threading
+
+
+class TokenBucket(object):
+    """
+    A thread-safe token bucket rate limiter: the bucket holds up to `burst`
+    tokens and is refilled at `rate` tokens per second. Each call to acquire()
+    takes one token, blocking until it is available.
+
+    Tokens are reserved before sleeping, so concurrent callers are served in
+    order and the throughput never goes above the configured rate.
+    """
+    def __init__(self, rate, burst=None, clock=time.time, sleep=time.sleep):
+        """
+        :param rate: The number of requests per second
+        :param burst: The number of requests which can be sent without waiting
+                      after a period of inactivity, defaults to `rate`
+        """
+        self.rate = float(rate)
+        self.burst = float(burst or max(1, rate))
+        self.clock = clock
+        self.sleep = sleep
+
+        self._tokens = self.burst
+        self._last = self.clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Take one token from the bucket, wait until it is available.
+        """
+        with self._lock:
+            wait = self._reserve()
+
+        if wait > 0:
+            self.sleep(wait)
+
+    def _reserve(self):
+        """
+        :return: The number of seconds to wait until the token we reserved is
+                 available
+        """
+        self._tokens, self._last = self._refill(self._tokens, self._last)
+        self._tokens -= 1
+        return max(0, -self._tokens / self.rate)
+
+    def _refill(self, tokens, last):
+        now = self.clock()
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        return tokens, now
+
+
+class FileTokenBucket(TokenBucket):
+    """
+    A token bucket which stores its state in a file, all the processes (and
+    threads) which use the same file share the rate limit. The file is
+    locked using flock() while the state is updated.
+    """
+    def __init__(self, filename, rate, burst=None, clock=time.time,
+                 sleep=time.sleep):
+        super(FileTokenBucket, self).__init__(rate, burst=burst, clock=clock,
+                                              sleep=sleep)
+        self.filename = os.path.expanduser(filename)
+
+    def _reserve(self):
+        with open(self.filename, 'a+') as state_fd:
+            fcntl.flock(state_fd, fcntl.LOCK_EX)
+
+            try:
+                state_fd.seek(0)
+                tokens, last = self._parse_state(state_fd.read())
+                tokens, last = self._refill(tokens, last)
+                tokens -= 1
+
+                state_fd.seek(0)
+                state_fd.truncate()
+                state_fd.write('%r %r' % (tokens, last))
+                state_fd.flush()
+            finally:
+                fcntl.flock(state_fd, fcntl.LOCK_UN)
+
+        return max(0, -tokens / self.rate)
+
+    def _parse_state(self, state):
+        """
+        :return: The tokens and last refill time stored in the file, a full
+                 bucket if the file is new or corrupt.
+        """
+        try:
+            tokens, last = state.split()
+            return float(tokens), float(last)
+        except ValueError:
+            return self.burst, self.clock()
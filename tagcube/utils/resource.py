@@ -1,4 +1,232 @@
 class Resource(dict):
+    """
+    A dict with the decoded JSON for a REST API resource, the keys can also
+    be read and written as attributes (resource.href == resource['href']).
+
+    Attribute access is implemented with __getattr__ instead of pointing
+    __dict__ to the instance, which created a reference cycle for each
+    resource: they were only released when the cyclic GC ran. With empty
+    __slots__ the instances don't have a __dict__ and are released as soon
+    as the last reference goes away.
+    """
+    __slots__ = ()
+
+    def __getattr__(self, name):
+        # Never look up the special methods (__getstate__, __deepcopy__, ...)
+        # in the dict, copy and pickle use their absence
+        if name.startswith('__'):
+            raise AttributeError(name)
+
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+    def __delattr__(self, name):
+        try:
+            del self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+class Model(object):
+    """
+    Compact alternative to Resource for code which keeps many resources of
+    the same type in memory: the known FIELDS are stored in slots and the
+    rest of the keys (if any) in a dict.
+
+    Models support the same attribute and mapping access as Resource
+    (scan.status, scan['status'], scan.get('status'), 'status' in scan),
+    the fields which were not in the JSON raise AttributeError / KeyError.
+    They are not dict instances, use to_dict() when one is needed.
+    """
+    __slots__ = ('_extra',)
+
+    FIELDS = ()
+
+    def __init__(self, data=None, **kwargs):
+        object.__setattr__(self, '_extra', None)
+        self.update(data, **kwargs)
+
+    def update(self, data=None, **kwargs):
+        if data is None:
+            data = ()
+        elif hasattr(data, 'keys'):
+            data = data.iteritems()
+
+        fields = self.FIELDS
+        set_slot = object.__setattr__
+
+        for key, value in data:
+            if key in fields:
+                set_slot(self, key, value)
+            else:
+                self[key] = value
+
+        for key, value in kwargs.iteritems():
+            self[key] = value
+
+    def __getattr__(self, name):
+        # Only called for unset slots and unknown names
+        if name in self.FIELDS or name.startswith('__') or name == '_extra':
+            raise AttributeError(name)
+
+        extra = self._extra
+
+        if extra is None or name not in extra:
+            raise AttributeError(name)
+
+        return extra[name]
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+    def __delattr__(self, name):
+        try:
+            del self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __getitem__(self, key):
+        if key in self.FIELDS:
+            try:
+                return object.__getattribute__(self, key)
+            except AttributeError:
+                raise KeyError(key)
+
+        if self._extra is None:
+            raise KeyError(key)
+
+        return self._extra[key]
+
+    def __setitem__(self, key, value):
+        if key in self.FIELDS:
+            object.__setattr__(self, key, value)
+            return
+
+        if self._extra is None:
+            object.__setattr__(self, '_extra', {})
+
+        self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in self.FIELDS:
+            try:
+                object.__delattr__(self, key)
+            except AttributeError:
+                raise KeyError(key)
+            return
+
+        if self._extra is None:
+            raise KeyError(key)
+
+        del self._extra[key]
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    has_key = __contains__
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def iteritems(self):
+        for field in self.FIELDS:
+            try:
+                yield field, object.__getattribute__(self, field)
+            except AttributeError:
+                pass
+
+        if self._extra is not None:
+            for item in self._extra.iteritems():
+                yield item
+
+    def iterkeys(self):
+        return (key for key, _ in self.iteritems())
+
+    def itervalues(self):
+        return (value for _, value in self.iteritems())
+
+    __iter__ = iterkeys
+
+    def items(self):
+        return list(self.iteritems())
+
+    def keys(self):
+        return list(self.iterkeys())
+
+    def values(self):
+        return list(self.itervalues())
+
+    def __len__(self):
+        return sum(1 for _ in self.iteritems())
+
+    def to_dict(self):
+        return dict(self.iteritems())
+
+    def __eq__(self, other):
+        if isinstance(other, (Model, dict)):
+            return self.to_dict() == dict(other.iteritems())
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+
+    # Mutable, like dict
+    __hash__ = None
+
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, state):
+        object.__setattr__(self, '_extra', None)
+        self.update(state)
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self.to_dict())
+
+
+class Scan(Model):
+    FIELDS = ('id', 'href', 'status', 'progress', 'verification_href',
+              'profile_href', 'email_notifications_href')
+    __slots__ = FIELDS
+
+
+class Domain(Model):
+    FIELDS = ('id', 'href', 'domain', 'description')
+    __slots__ = FIELDS
+
+
+class Verification(Model):
+    FIELDS = ('id', 'href', 'domain', 'port', 'ssl', 'success',
+              'verification_message')
+    __slots__ = FIELDS
+
+
+class Profile(Model):
+    FIELDS = ('id', 'href', 'name', 'description')
+    __slots__ = FIELDS
+
+
+class ResourceDict(dict):
+    """
+    A dict with the Resources returned by bulk queries, the resources which
+    could not be retrieved are not in the dict and the exception raised for
+    each one is stored in `errors` using the same key.
+    """
     def __init__(self, *args, **kwargs):
-        super(Resource, self).__init__(*args, **kwargs)
-        self.__dict__ = self
+        super(ResourceDict, self).__init__(*args, **kwargs)
+        self.errors = {}
@@ -1,12 +1,16 @@
+import itertools
+
 from tagcube.utils.resource import Resource
-from tagcube.utils.exceptions import TagCubeClientException
+from tagcube.utils.exceptions import (TagCubeClientException,
+                                      TagCubeAPIException)
 
 ONE_RESULT = 1
 LATEST_RESULT = 2
 ALL_RESULTS = 3
+ITER_RESULTS = 4
 
 
-def _get_objects_from_json(_json):
+def get_objects_from_json(_json):
     """
     After enabling pagination in our API we receive results like this:
         {
@@ -41,35 +45,107 @@ def _get_objects_from_json(_json):
     return _json['objects']
 
 
-def get_one_resource_after_filter(resource_name, filter_dict, _json):
-    _json = _get_objects_from_json(_json)
+def _get_next_from_json(_json):
+    """
+    :return: The path to the next page (as found in meta.next), or None if
+             this is the last page.
+    """
+    return _json.get('meta', {}).get('next', None)
+
+
+def iter_objects_from_pages(first_page_url, get_page):
+    """
+    Follow the meta.next links and yield the objects from each page. Pages are
+    only retrieved when the objects from the previous one were consumed.
+
+    :param first_page_url: The URL for the first page
+    :param get_page: A function which receives a URL (or the path from
+                     meta.next) and returns the decoded JSON page
+    :return: A generator which yields the JSON objects in all pages
+    """
+    url = first_page_url
+
+    while url is not None:
+        _json = get_page(url)
+
+        for rjson in get_objects_from_json(_json):
+            yield rjson
+
+        url = _get_next_from_json(_json)
+
+
+def iter_objects_from_streamed_pages(first_page_url, stream_page):
+    """
+    Same as iter_objects_from_pages() but the objects in each page are decoded
+    while the page is received.
+
+    :param stream_page: A function which receives a URL (or the path from
+                        meta.next) and returns a StreamedPage
+    :return: A generator which yields the JSON objects in all pages
+    """
+    url = first_page_url
+
+    while url is not None:
+        page = stream_page(url)
+
+        for rjson in page:
+            yield rjson
+
+        if 'error' in page.fields:
+            raise TagCubeAPIException(page.fields['error'])
 
-    if len(_json) == 0:
+        url = _get_next_from_json(page.fields)
+
+
+def is_latest_first(objects):
+    """
+    :return: True if the objects are sorted by descending id, which is what we
+             expect when sending order_by=-id to the REST API.
+    """
+    ids = [rjson.get('id') for rjson in objects]
+
+    if None in ids:
+        return False
+
+    return ids == sorted(ids, reverse=True)
+
+
+def get_one_resource_after_filter(resource_name, filter_dict, objects):
+    # Reading two objects is enough to know if there is more than one
+    objects = list(itertools.islice(objects, 2))
+
+    if len(objects) == 0:
         return None
 
-    if len(_json) == 1:
-        return Resource(_json[0])
+    if len(objects) == 1:
+        return Resource(objects[0])
 
     else:
         msg = 'Filter %r on resource "%s" returned more than one result.'
         raise TagCubeClientException(msg % (filter_dict, resource_name))
 
 
-def get_latest_resource_after_filter(resource_name, filter_dict, _json):
-    _json = _get_objects_from_json(_json)
+def get_latest_resource_after_filter(resource_name, filter_dict, objects):
+    latest = None
+
+    for latest in objects:
+        pass
 
-    if len(_json) == 0:
+    if latest is None:
         return None
 
-    return Resource(_json[-1])
+    return Resource(latest)
+
 
+def get_all_resources_after_filter(resource_name, filter_dict, objects):
+    return [Resource(rjson) for rjson in objects]
 
-def get_all_resources_after_filter(resource_name, filter_dict, _json):
-    _json = _get_objects_from_json(_json)
 
-    return [Resource(rjson) for rjson in _json]
+def iter_resources_after_filter(resource_name, filter_dict, objects):
+    return (Resource(rjson) for rjson in objects)
 
 
 RESULT_HANDLERS = {ONE_RESULT: get_one_resource_after_filter,
                    LATEST_RESULT: get_latest_resource_after_filter,
-                   ALL_RESULTS: get_all_resources_after_filter}
\ No newline at end of file
+                   ALL_RESULTS: get_all_resources_after_filter,
+                   ITER_RESULTS: iter_resources_after_filter}
\ No newline at end of file
@@ -0,0 +1,104 @@
+import time
+import random
+import email.utils
+
+
+class RetryPolicy(object):
+    """
+    Decides which failed requests to the REST API are retried and how long we
+    wait before each retry.
+
+    Requests are retried when the connection fails or the response status code
+    is in `status_codes`. Only idempotent (GET) requests are retried, unless
+    `retry_post` is set. The wait time grows exponentially with each attempt:
+
+        backoff_factor * 2 ** (attempt - 1)
+
+    and is capped to `max_backoff`. When `jitter` is set a random wait time
+    between zero and that value is used, this prevents many clients from
+    retrying at the same time. Retry-After headers sent by the REST API
+    take precedence over the calculated backoff.
+    """
+    RETRY_STATUS_CODES = (429, 502, 503, 504)
+    IDEMPOTENT_METHODS = ('GET',)
+
+    def __init__(self, max_attempts=3, backoff_factor=0.5, max_backoff=30,
+                 jitter=True, retry_post=False,
+                 status_codes=RETRY_STATUS_CODES, max_retry_after=120,
+                 sleep=time.sleep):
+        """
+        :param max_attempts: The max number of times a request is sent, one
+                             disables retries.
+        :param max_retry_after: Max seconds to wait when the REST API sends
+                                a Retry-After header.
+        :param sleep: The function used to wait between attempts
+        """
+        self.max_attempts = max_attempts
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_post = retry_post
+        self.status_codes = status_codes
+        self.max_retry_after = max_retry_after
+        self.sleep = sleep
+
+    def can_retry(self, method, attempt):
+        """
+        :param method: The HTTP method for the failed request
+        :param attempt: The number of attempts sent so far (starts at 1)
+        :return: True if we can send the request again
+        """
+        if attempt >= self.max_attempts:
+            return False
+
+        return method in self.IDEMPOTENT_METHODS or self.retry_post
+
+    def is_retry_status(self, status_code):
+        return status_code in self.status_codes
+
+    def get_backoff(self, attempt, retry_after=None):
+        """
+        :param attempt: The number of attempts sent so far (starts at 1)
+        :param retry_after: The value of the Retry-After header, if any
+        :return: The number of seconds to wait before the next attempt
+        """
+        retry_after = parse_retry_after(retry_after)
+        if retry_after is not None:
+            return min(retry_after, self.max_retry_after)
+
+        backoff = self.backoff_factor * 2 ** (attempt - 1)
+        backoff = min(backoff, self.max_backoff)
+
+        if self.jitter:
+            backoff = random.uniform(0, backoff)
+
+        return backoff
+
+
+def parse_retry_after(retry_after):
+    """
+    Retry-After can be a number of seconds or an HTTP date:
+
+        Retry-After: 120
+        Retry-After: Fri, 31 Dec 1999 23:59:59 GMT
+
+    :return: The number of seconds to wait, or None if the header is missing
+             or invalid.
+    """
+    if not retry_after:
+        return None
+
+    try:
+        return max(0, int(retry_after))
+    except ValueError:
+        pass
+
+    parsed_date = email.utils.parsedate_tz(retry_after)
+    if parsed_date is None:
+        return None
+
+    return max(0, email.utils.mktime_tz(parsed_date) - time.time())
+
+
+# Use this policy to send each request only once
+NO_RETRIES = RetryPolicy(max_attempts=1)
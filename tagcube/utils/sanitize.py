@@ -0,0 +1,59 @@
+import re
+import sys
+
+# httplib prints the repr() of the request it sends, the header lines end with
+# a literal \r\n (backslash, r). Raw CR / LF are also handled in case the
+# headers are printed as they are sent.
+AUTHORIZATION_RE = re.compile(r'Authorization: [^\\\r\n]*')
+SANITIZED = 'Authorization: <sanitized>'
+
+
+def sanitize(data):
+    """
+    :return: data without the value of the Authorization headers
+    """
+    if 'Authorization' not in data:
+        return data
+
+    return AUTHORIZATION_RE.sub(SANITIZED, data)
+
+
+class CleanUpWrapper(object):
+    """
+    This is a simple cleaner that will remove the user authentication
+    credentials from the output, so it's safe for them to send me their verbose
+    logs without sending the basic auth b64 encoded string.
+
+    Only installed as sys.stdout while the httplib debug output is enabled,
+    see install_stdout_sanitizer().
+    """
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, data):
+        self.stream.write(sanitize(data))
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def __getattr__(self, name):
+        # flush(), fileno(), isatty(), encoding, etc.
+        return getattr(self.stream, name)
+
+
+def install_stdout_sanitizer():
+    """
+    Replace sys.stdout with a CleanUpWrapper, does nothing if it is already
+    installed.
+    """
+    if not isinstance(sys.stdout, CleanUpWrapper):
+        sys.stdout = CleanUpWrapper(sys.stdout)
+
+
+def uninstall_stdout_sanitizer():
+    """
+    Restore the sys.stdout which was wrapped by install_stdout_sanitizer()
+    """
+    if isinstance(sys.stdout, CleanUpWrapper):
+        sys.stdout = sys.stdout.stream
@@ -0,0 +1,124 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from tagcube.utils.resource import Resource
+from tagcube.utils.cache import (ResourceCache, DiskStore, get_cache_key,
+                                 get_disk_cache_filename, CACHE_MISS)
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestResourceCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = ResourceCache(ttl=10, max_size=2, clock=self.clock)
+
+    def test_get_set(self):
+        self.assertIs(self.cache.get('a'), CACHE_MISS)
+
+        self.cache.set('a', None)
+        self.assertIs(self.cache.get('a'), None)
+
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_ttl(self):
+        self.cache.set('a', 1)
+
+        self.clock.now += 9
+        self.assertEqual(self.cache.get('a'), 1)
+
+        self.clock.now += 2
+        self.assertIs(self.cache.get('a'), CACHE_MISS)
+
+    def test_lru_eviction(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+
+        # Touch "a", so "b" is the least recently used
+        self.cache.get('a')
+        self.cache.set('c', 3)
+
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertIs(self.cache.get('b'), CACHE_MISS)
+        self.assertEqual(self.cache.get('c'), 3)
+
+    def test_invalidate_resource(self):
+        self.cache.set(get_cache_key('domains', {'domain': 'a.com'}, 1), 1)
+        self.cache.set(get_cache_key('profiles', {'name': 'fast'}, 1), 2)
+
+        self.cache.invalidate('domains')
+
+        self.assertEqual(len(self.cache), 1)
+        self.assertEqual(self.cache.get(get_cache_key('profiles',
+                                                      {'name': 'fast'}, 1)), 2)
+
+    def test_get_or_load(self):
+        calls = []
+        loader = lambda: calls.append(1) or 'value'
+
+        self.assertEqual(self.cache.get_or_load('a', loader), 'value')
+        self.assertEqual(self.cache.get_or_load('a', loader), 'value')
+        self.assertEqual(len(calls), 1)
+
+    def test_cache_key_order(self):
+        self.assertEqual(get_cache_key('v', {'a': 1, 'b': 2}, 1),
+                         get_cache_key('v', {'b': 2, 'a': 1}, 1))
+
+
+class TestDiskStore(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.filename = get_disk_cache_filename(self.cache_dir, 'a@b.com',
+                                                'key', 'https://api/')
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_filename_per_credentials(self):
+        other = get_disk_cache_filename(self.cache_dir, 'a@b.com', 'key2',
+                                        'https://api/')
+        self.assertNotEqual(os.path.dirname(self.filename),
+                            os.path.dirname(other))
+        self.assertNotIn('a@b.com', self.filename)
+
+    def test_shared_between_caches(self):
+        writer = ResourceCache(store=DiskStore(self.filename))
+        reader = ResourceCache(store=DiskStore(self.filename))
+
+        writer.set('domains?domain=a.com#1', Resource({'href': '/1.0/domains/1'}))
+        writer.set('profiles?name=x#1', None)
+
+        resource = reader.get('domains?domain=a.com#1')
+        self.assertEqual(resource['href'], '/1.0/domains/1')
+        self.assertIs(reader.get('profiles?name=x#1'), None)
+
+        writer.invalidate('domains')
+        self.assertIs(ResourceCache(store=DiskStore(self.filename)).get(
+            'domains?domain=a.com#1'), CACHE_MISS)
+
+    def test_expired_entries_pruned(self):
+        clock = FakeClock()
+        store = DiskStore(self.filename, clock=clock)
+
+        store.set('a', clock.now + 10, 1)
+        clock.now += 20
+        store.set('b', clock.now + 10, 2)
+
+        self.assertIsNone(store.get('a'))
+        self.assertEqual(store.get('b'), (clock.now + 10, 2))
+
+    def test_corrupt_file(self):
+        store = DiskStore(self.filename)
+        file(self.filename, 'w').write('{not json')
+
+        self.assertIsNone(store.get('a'))
+        store.set('a', 1e12, 1)
+        self.assertEqual(store.get('a'), (1e12, 1))
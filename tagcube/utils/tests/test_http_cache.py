@@ -0,0 +1,88 @@
+import json
+import shutil
+import tempfile
+import unittest
+
+from mock import Mock
+
+from tagcube.utils.cache import DiskStore
+from tagcube.utils.http_cache import HTTPCache
+
+
+def get_response(status_code=200, content='{}', **headers):
+    return Mock(status_code=status_code, headers=headers, content=content)
+
+
+class TestHTTPCache(unittest.TestCase):
+    def test_only_responses_with_validators(self):
+        cache = HTTPCache()
+
+        cache.set('/a', get_response(content='{"a": 1}'))
+        cache.set('/b', get_response(404, ETag='"b"'))
+        self.assertEqual(len(cache), 0)
+
+        cache.set('/a', get_response(content='{"a": 1}', ETag='"a"'))
+        entry = cache.get('/a')
+
+        self.assertEqual(entry['body'], '{"a": 1}')
+        self.assertEqual(cache.get_conditional_headers(entry),
+                         {'If-None-Match': '"a"'})
+
+        last_modified = 'Wed, 21 Oct 2015 07:28:00 GMT'
+        cache.set('/c', get_response(**{'Last-Modified': last_modified}))
+        self.assertEqual(cache.get_conditional_headers(cache.get('/c')),
+                         {'If-Modified-Since': last_modified})
+
+    def test_lru_eviction(self):
+        cache = HTTPCache(max_size=2)
+
+        cache.set('/a', get_response(content='1', ETag='a'))
+        cache.set('/b', get_response(content='2', ETag='b'))
+        cache.get('/a')
+        cache.set('/c', get_response(content='3', ETag='c'))
+
+        self.assertIsNone(cache.get('/b'))
+        self.assertEqual(cache.get('/a')['body'], '1')
+        self.assertEqual(cache.get('/c')['body'], '3')
+
+    def test_disk_store(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        filename = '%s/http.json' % cache_dir
+
+        cache = HTTPCache(store=DiskStore(filename))
+        cache.set('/a', get_response(content='{"objects": ["\xc3\xa9"]}',
+                                     ETag='a'))
+
+        other_process_cache = HTTPCache(store=DiskStore(filename))
+        entry = other_process_cache.get('/a')
+
+        self.assertEqual(entry['etag'], 'a')
+        self.assertEqual(entry['body'], '{"objects": ["\xc3\xa9"]}')
+        self.assertIsInstance(entry['body'], str)
+
+    def test_disk_store_only_small_bodies(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        filename = '%s/http.json' % cache_dir
+
+        cache = HTTPCache(store=DiskStore(filename), store_max_body_size=10)
+        cache.set('/small', get_response(content='[1, 2]', ETag='a'))
+        cache.set('/large', get_response(content='[1, 2, 3, 4]', ETag='b'))
+
+        # Both are kept in memory
+        self.assertEqual(cache.get('/large')['body'], '[1, 2, 3, 4]')
+
+        other_process_cache = HTTPCache(store=DiskStore(filename))
+        self.assertEqual(other_process_cache.get('/small')['body'], '[1, 2]')
+        self.assertIsNone(other_process_cache.get('/large'))
+
+    def test_disk_store_previous_format(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        filename = '%s/http.json' % cache_dir
+
+        store = DiskStore(filename)
+        store.set('/a', 2 ** 31, {'etag': 'a', 'json': {'objects': []}})
+
+        self.assertIsNone(HTTPCache(store=store).get('/a'))
@@ -0,0 +1,38 @@
+import json
+import unittest
+
+from mock import patch
+
+from tagcube.utils.json_codec import get_json_codec, JSON_BACKENDS
+
+
+class TestJSONCodec(unittest.TestCase):
+    def test_fallback_to_stdlib(self):
+        not_installed = dict((b, None) for b in JSON_BACKENDS if b != 'json')
+
+        with patch.dict('sys.modules', not_installed):
+            codec = get_json_codec()
+
+        self.assertEqual(codec.name, 'json')
+        self.assertEqual(codec.loads('{"a": [1]}'), {'a': [1]})
+
+    def test_invalid_backend(self):
+        self.assertRaises(ValueError, get_json_codec, 'pickle')
+
+    def test_decoded_values_encode_like_stdlib(self):
+        # The installed backends may return str instead of unicode, the
+        # request bodies built from the decoded values must not change
+        body = '{"href": "/1.0/scans/1", "path_list": ["/a/b", "/\xc3\xa9"]}'
+        expected = json.dumps(json.loads(body), sort_keys=True)
+
+        for backend in JSON_BACKENDS:
+            try:
+                codec = get_json_codec(backend)
+            except ImportError:
+                continue
+
+            data = codec.loads(body)
+            self.assertEqual(codec.dumps(data, sort_keys=True), expected)
+
+    def test_invalid_json(self):
+        self.assertRaises(ValueError, get_json_codec().loads, '<html>')
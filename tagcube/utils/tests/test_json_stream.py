@@ -0,0 +1,76 @@
+import json
+import unittest
+
+from mock import Mock
+
+from tagcube.utils.exceptions import TagCubeAPIException
+from tagcube.utils.json_stream import ListingParser, StreamedPage
+
+
+def feed_in_chunks(body, chunk_size):
+    parser = ListingParser()
+    items = []
+
+    for i in xrange(0, len(body), chunk_size):
+        items.extend(parser.feed(body[i:i + chunk_size]))
+
+    parser.close()
+    return items, parser.fields
+
+
+class TestListingParser(unittest.TestCase):
+    LISTING = {'meta': {'next': '/1.0/scans/?offset=2', 'total_count': 3},
+               'objects': [{'id': 1, 'name': 'a "quoted" [name] {x}, \\ y'},
+                           {'id': 2, 'paths': ['/a', '/b'], 'sub': {'c': []}},
+                           {'id': 3, 'name': u'\xe9\\u00e9', 'empty': None}],
+               'extra': 1.5}
+
+    def test_all_chunk_sizes(self):
+        body = json.dumps(self.LISTING, indent=2)
+
+        for chunk_size in (1, 2, 3, 7, 64, len(body)):
+            items, fields = feed_in_chunks(body, chunk_size)
+
+            self.assertEqual(items, self.LISTING['objects'])
+            self.assertEqual(fields, {'meta': self.LISTING['meta'],
+                                      'extra': 1.5})
+
+    def test_objects_before_meta(self):
+        body = '{"objects": [{"id": 1}], "meta": {"next": null}}'
+        items, fields = feed_in_chunks(body, 5)
+
+        self.assertEqual(items, [{'id': 1}])
+        self.assertEqual(fields, {'meta': {'next': None}})
+
+    def test_old_format_and_empty(self):
+        self.assertEqual(feed_in_chunks('[{"id": 1}, 2, "x"]', 4)[0],
+                         [{'id': 1}, 2, 'x'])
+        self.assertEqual(feed_in_chunks('{"objects": []}', 4),
+                         ([], {}))
+        self.assertEqual(feed_in_chunks('{"error": "Invalid"}', 4),
+                         ([], {'error': 'Invalid'}))
+
+    def test_items_returned_as_received(self):
+        parser = ListingParser()
+
+        self.assertEqual(parser.feed('{"meta": {}, "objects": [{"id": 1}'),
+                         [])
+        self.assertEqual(parser.feed(', {"id"'), [{'id': 1}])
+
+        # Only the incomplete object is kept in memory
+        self.assertEqual(parser._buffer.strip(), '{"id"')
+
+    def test_incomplete(self):
+        parser = ListingParser()
+        parser.feed('{"objects": [{"id": 1}')
+        self.assertRaises(ValueError, parser.close)
+
+
+class TestStreamedPage(unittest.TestCase):
+    def test_not_json(self):
+        response = Mock()
+        response.iter_content.return_value = iter(['<html>', '</html>'])
+
+        page = StreamedPage(response)
+        self.assertRaises(TagCubeAPIException, list, page)
+        self.assertEqual(response.close.call_count, 1)
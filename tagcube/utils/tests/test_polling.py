@@ -0,0 +1,19 @@
+import unittest
+
+from tagcube.utils.polling import PollInterval
+
+
+class TestPollInterval(unittest.TestCase):
+    def test_back_off_while_unchanged(self):
+        interval = PollInterval(5, 20, factor=2)
+
+        self.assertEqual([interval.update(False) for _ in xrange(4)],
+                         [10, 20, 20, 20])
+        self.assertEqual(interval.update(True), 10)
+
+    def test_near_completion(self):
+        interval = PollInterval(5, 120)
+        interval.current = 120
+
+        self.assertEqual(interval.update(False, progress=50), 120)
+        self.assertEqual(interval.update(False, progress=95), 5)
@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+
+from tagcube.utils.ratelimit import TokenBucket, FileTokenBucket
+
+
+class FakeTime(object):
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_burst_then_rate(self):
+        fake_time = FakeTime()
+        bucket = TokenBucket(2, burst=3, clock=fake_time.clock,
+                             sleep=fake_time.sleep)
+
+        for _ in xrange(3):
+            bucket.acquire()
+        self.assertEqual(fake_time.sleeps, [])
+
+        bucket.acquire()
+        bucket.acquire()
+        self.assertEqual(fake_time.sleeps, [0.5, 0.5])
+
+    def test_refill(self):
+        fake_time = FakeTime()
+        bucket = TokenBucket(1, burst=2, clock=fake_time.clock,
+                             sleep=fake_time.sleep)
+
+        bucket.acquire()
+        bucket.acquire()
+
+        # After a long wait the bucket is full, but never above burst
+        fake_time.now += 60
+        for _ in xrange(3):
+            bucket.acquire()
+
+        self.assertEqual(fake_time.sleeps, [1.0])
+
+
+class TestFileTokenBucket(unittest.TestCase):
+    def test_shared_between_buckets(self):
+        fh = tempfile.NamedTemporaryFile(delete=False)
+        fh.close()
+
+        fake_time = FakeTime()
+        kwargs = dict(burst=2, clock=fake_time.clock, sleep=fake_time.sleep)
+        bucket_a = FileTokenBucket(fh.name, 1, **kwargs)
+        bucket_b = FileTokenBucket(fh.name, 1, **kwargs)
+
+        bucket_a.acquire()
+        bucket_b.acquire()
+        self.assertEqual(fake_time.sleeps, [])
+
+        bucket_a.acquire()
+        self.assertEqual(fake_time.sleeps, [1.0])
+
+        os.unlink(fh.name)
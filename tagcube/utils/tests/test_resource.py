@@ -0,0 +1,93 @@
+import gc
+import copy
+import pickle
+import unittest
+
+from tagcube.utils.resource import Resource, Scan, Domain
+
+
+class TestResource(unittest.TestCase):
+    def test_attribute_and_mapping_access(self):
+        resource = Resource({'href': '/1.0/scans/1', 'id': 1})
+
+        self.assertEqual(resource.href, '/1.0/scans/1')
+        self.assertEqual(resource['href'], '/1.0/scans/1')
+        self.assertIsInstance(resource, dict)
+
+        resource.status = 'running'
+        self.assertEqual(resource['status'], 'running')
+
+        del resource.status
+        self.assertNotIn('status', resource)
+
+        self.assertRaises(AttributeError, getattr, resource, 'missing')
+        self.assertFalse(hasattr(resource, 'missing'))
+
+    def test_no_reference_cycle(self):
+        gc.collect()
+        gc.disable()
+
+        try:
+            resources = [Resource({'id': i}) for i in xrange(100)]
+            del resources
+            self.assertEqual(gc.collect(), 0)
+        finally:
+            gc.enable()
+
+    def test_copy_and_pickle(self):
+        resource = Resource({'id': 1, 'paths': ['/']})
+
+        for protocol in (0, 2):
+            loaded = pickle.loads(pickle.dumps(resource, protocol))
+            self.assertIsInstance(loaded, Resource)
+            self.assertEqual(loaded, resource)
+
+        copied = copy.deepcopy(resource)
+        self.assertEqual(copied.paths, ['/'])
+        self.assertIsNot(copied.paths, resource.paths)
+
+
+class TestModel(unittest.TestCase):
+    def test_access(self):
+        scan = Scan({'id': 1, 'status': 'running', 'unknown': 'x'})
+
+        self.assertEqual(scan.id, 1)
+        self.assertEqual(scan['status'], 'running')
+        self.assertEqual(scan.unknown, 'x')
+        self.assertEqual(scan.get('href'), None)
+        self.assertIn('unknown', scan)
+        self.assertNotIn('href', scan)
+
+        self.assertRaises(KeyError, lambda: scan['href'])
+        self.assertRaises(AttributeError, getattr, scan, 'href')
+
+        scan.progress = 50
+        scan['other'] = 'y'
+
+        self.assertEqual(scan.to_dict(), {'id': 1, 'status': 'running',
+                                          'progress': 50, 'unknown': 'x',
+                                          'other': 'y'})
+        self.assertEqual(len(scan), 5)
+        self.assertEqual(scan, Resource(scan.to_dict()))
+
+        del scan['unknown']
+        del scan.progress
+        self.assertEqual(sorted(scan.keys()), ['id', 'other', 'status'])
+
+    def test_no_dict(self):
+        domain = Domain(domain='a.com')
+
+        self.assertFalse(hasattr(domain, '__dict__'))
+        self.assertIsNone(domain._extra)
+
+    def test_copy_and_pickle(self):
+        scan = Scan({'id': 1, 'unknown': ['x']})
+
+        for protocol in (0, 2):
+            loaded = pickle.loads(pickle.dumps(scan, protocol))
+            self.assertIsInstance(loaded, Scan)
+            self.assertEqual(loaded, scan)
+
+        copied = copy.deepcopy(scan)
+        self.assertEqual(copied, scan)
+        self.assertIsNot(copied.unknown, scan.unknown)
@@ -0,0 +1,44 @@
+import time
+import unittest
+import email.utils
+
+from tagcube.utils.retry import RetryPolicy, parse_retry_after
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_can_retry(self):
+        policy = RetryPolicy(max_attempts=3)
+
+        self.assertTrue(policy.can_retry('GET', 1))
+        self.assertTrue(policy.can_retry('GET', 2))
+        self.assertFalse(policy.can_retry('GET', 3))
+        self.assertFalse(policy.can_retry('POST', 1))
+
+        policy = RetryPolicy(max_attempts=3, retry_post=True)
+        self.assertTrue(policy.can_retry('POST', 1))
+
+    def test_exponential_backoff(self):
+        policy = RetryPolicy(backoff_factor=1, max_backoff=5, jitter=False)
+
+        self.assertEqual([policy.get_backoff(i) for i in xrange(1, 6)],
+                         [1, 2, 4, 5, 5])
+
+    def test_jitter(self):
+        policy = RetryPolicy(backoff_factor=1, jitter=True)
+
+        for _ in xrange(100):
+            self.assertTrue(0 <= policy.get_backoff(3) <= 4)
+
+    def test_retry_after(self):
+        policy = RetryPolicy(max_retry_after=60)
+
+        self.assertEqual(policy.get_backoff(1, retry_after='7'), 7)
+        self.assertEqual(policy.get_backoff(1, retry_after='3600'), 60)
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after(None), None)
+        self.assertEqual(parse_retry_after('invalid'), None)
+        self.assertEqual(parse_retry_after('10'), 10)
+
+        http_date = email.utils.formatdate(time.time() + 30, usegmt=True)
+        self.assertTrue(25 < parse_retry_after(http_date) <= 30)
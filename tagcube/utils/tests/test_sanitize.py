@@ -0,0 +1,57 @@
+import sys
+import unittest
+
+from StringIO import StringIO
+
+from tagcube.utils.sanitize import (sanitize, CleanUpWrapper,
+                                    install_stdout_sanitizer,
+                                    uninstall_stdout_sanitizer)
+
+
+class TestSanitize(unittest.TestCase):
+    def test_httplib_repr(self):
+        data = ("'GET /1.0/users/~ HTTP/1.1\\r\\nHost: api.tagcube.io\\r\\n"
+                "Authorization: Basic dXNlcjpwYXNz\\r\\n\\r\\n'")
+
+        self.assertEqual(sanitize(data),
+                         "'GET /1.0/users/~ HTTP/1.1\\r\\nHost: api.tagcube.io"
+                         "\\r\\nAuthorization: <sanitized>\\r\\n\\r\\n'")
+
+    def test_raw_headers(self):
+        data = 'Authorization: Basic dXNlcjpwYXNz\r\nAccept: */*\r\n'
+        self.assertEqual(sanitize(data),
+                         'Authorization: <sanitized>\r\nAccept: */*\r\n')
+
+        self.assertEqual(sanitize('Authorization: Basic dXNlcjpwYXNz'),
+                         'Authorization: <sanitized>')
+
+    def test_no_credentials(self):
+        data = 'Launched scan with id #1\n'
+        self.assertIs(sanitize(data), data)
+
+
+class TestCleanUpWrapper(unittest.TestCase):
+    def setUp(self):
+        self.stdout = sys.stdout
+        self.output = StringIO()
+        sys.stdout = self.output
+
+    def tearDown(self):
+        sys.stdout = self.stdout
+
+    def test_install(self):
+        install_stdout_sanitizer()
+        install_stdout_sanitizer()
+
+        self.assertIsInstance(sys.stdout, CleanUpWrapper)
+        self.assertIs(sys.stdout.stream, self.output)
+
+        sys.stdout.write('Authorization: Basic dXNlcjpwYXNz\\r\\n')
+        sys.stdout.flush()
+        self.assertEqual(self.output.getvalue(),
+                         'Authorization: <sanitized>\\r\\n')
+
+        uninstall_stdout_sanitizer()
+        uninstall_stdout_sanitizer()
+
+        self.assertIs(sys.stdout, self.output)
@@ -1,6 +1,7 @@
 import unittest
 
-from tagcube.utils.urlparsing import get_port_from_url, get_domain_from_url
+from tagcube.utils.urlparsing import (get_port_from_url, get_domain_from_url,
+                                      parse_url, format_netloc)
 
 
 class TestURLParsing(unittest.TestCase):
@@ -13,3 +14,36 @@ class TestURLParsing(unittest.TestCase):
         self.assertEqual(get_port_from_url('https://www.tagcube.io:22/'), '22')
         self.assertEqual(get_domain_from_url('https://www.tagcube.io/'),
                          'www.tagcube.io')
+
+
+class TestParseURL(unittest.TestCase):
+    def test_defaults(self):
+        self.assertEqual(parse_url('http://www.tagcube.io'),
+                         ('http', 'www.tagcube.io', 80, '/'))
+        self.assertEqual(parse_url('HTTPS://WWW.TagCube.io/Foo?a=1'),
+                         ('https', 'www.tagcube.io', 443, '/Foo?a=1'))
+
+    def test_query_without_path(self):
+        self.assertEqual(parse_url('http://a.com?x=1').path, '/?x=1')
+
+    def test_userinfo_is_ignored(self):
+        self.assertEqual(parse_url('http://user:p@ss@a.com:8080/x'),
+                         ('http', 'a.com', 8080, '/x'))
+
+    def test_ipv6(self):
+        self.assertEqual(parse_url('http://[2001:DB8::1]:8080/x'),
+                         ('http', '2001:db8::1', 8080, '/x'))
+        self.assertEqual(parse_url('https://[::1]/').port, 443)
+        self.assertEqual(format_netloc('::1', 443), '[::1]:443')
+        self.assertEqual(format_netloc('a.com', 80), 'a.com:80')
+
+    def test_idna(self):
+        self.assertEqual(parse_url(u'http://b\xfccher.de/').host,
+                         'xn--bcher-kva.de')
+        self.assertEqual(parse_url('http://b\xc3\xbccher.de/').host,
+                         'xn--bcher-kva.de')
+
+    def test_invalid(self):
+        for url in ('www.tagcube.io', 'http://', 'http://a.com:abc/',
+                    'http://a.com:70000/', 'http://[::1/'):
+            self.assertRaises(ValueError, parse_url, url)
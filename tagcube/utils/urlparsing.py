@@ -1,25 +1,99 @@
-import urlparse
+import re
 
+from collections import namedtuple
 
-def get_domain_from_url(url):
-    return urlparse.urlparse(url).netloc.split(':')[0]
+DEFAULT_PORTS = {'http': 80,
+                 'https': 443}
 
+# Single pass URL decomposition, userinfo (user:pass@) is matched and ignored,
+# IPv6 literals must be enclosed in brackets (http://[::1]:8080/)
+URL_RE = re.compile('^(?P<scheme>[a-zA-Z][a-zA-Z0-9+.-]*)://'
+                    '(?:[^/?#]*@)?'
+                    '(?P<host>\\[[0-9a-fA-F:.]+\\]|[^:/?#\\[\\]]*)'
+                    '(?::(?P<port>[^/?#]*))?'
+                    '(?P<path>[/?#].*)?$')
 
-def get_port_from_url(url):
-    if url.lower().startswith('http://'):
-        default = '80'
-    elif url.lower().startswith('https://'):
-        default = '443'
+ParsedURL = namedtuple('ParsedURL', ('scheme', 'host', 'port', 'path'))
+
+
+def parse_url(url):
+    """
+    Split a URL into the parts we need to start a scan.
+
+        * The scheme and host are lower-cased, IPv6 brackets are removed and
+          internationalized domain names are encoded using IDNA
+
+        * The port is an integer, defaults to 80 and 443 for http and https,
+          None for other schemes without an explicit port
+
+        * The path includes the query string, defaults to "/"
+
+    :param url: The URL to parse
+    :return: A ParsedURL (scheme, host, port, path) named tuple
+    """
+    match = URL_RE.match(url)
+    if match is None:
+        raise ValueError('Invalid URL: %s' % url)
+
+    scheme, host, port, path = match.group('scheme', 'host', 'port', 'path')
+
+    scheme = scheme.lower()
+    host = normalize_host(host)
+
+    if not host:
+        raise ValueError('Invalid URL: %s' % url)
+
+    if port:
+        if not port.isdigit() or not 0 < int(port) < 65536:
+            raise ValueError('Invalid port: "%s"' % port)
+        port = int(port)
     else:
-        default = '80'
+        port = DEFAULT_PORTS.get(scheme)
+
+    if not path:
+        path = '/'
+    elif path[0] != '/':
+        # http://host?query
+        path = '/' + path
+
+    return ParsedURL(scheme, host, port, path)
+
+
+def normalize_host(host):
+    """
+    :return: The host in lower case, without IPv6 brackets and IDNA encoded
+    """
+    if host.startswith('['):
+        return host[1:-1].lower()
 
     try:
-        port = urlparse.urlparse(url).netloc.split(':')[1]
-    except IndexError:
-        return default
-    else:
-        return port
+        host.encode('ascii')
+    except UnicodeError:
+        if isinstance(host, str):
+            host = host.decode('utf-8')
+        host = host.encode('idna')
+
+    return host.lower()
+
+
+def format_netloc(host, port):
+    """
+    :return: The host:port string to use in a URL, adding brackets for IPv6
+    """
+    if ':' in host:
+        return '[%s]:%s' % (host, port)
+
+    return '%s:%s' % (host, port)
+
+
+def get_domain_from_url(url):
+    return parse_url(url).host
+
+
+def get_port_from_url(url):
+    port = parse_url(url).port
+    return '80' if port is None else str(port)
 
 
 def use_ssl(url):
-    return url.lower().startswith('https://')
\ No newline at end of file
+    return url.lower().startswith('https://')
@@ -1,18 +1,26 @@
 import argparse
 import logging
 
-from requests.exceptions import ConnectionError
+from requests.exceptions import ConnectionError, Timeout
 
 from tagcube.client.api import TagCubeClient
+from tagcube.utils.retry import RetryPolicy
+from tagcube.utils.ratelimit import TokenBucket, FileTokenBucket
 from tagcube.utils.exceptions import TagCubeAPIException
 from tagcube_cli.logger import cli_logger
 from tagcube_cli.subcommands.auth import do_auth_test
 from tagcube_cli.subcommands.scan import do_scan_start
 from tagcube_cli.subcommands.batch import do_batch_scan
+from tagcube_cli.subcommands.watch import do_watch
 from tagcube_cli.subcommands.version import do_version
 from tagcube_cli.utils import (parse_config_file, get_config_from_env,
                                argparse_url_type, argparse_path_list_type,
-                               argparse_email_type, argparse_uuid_type)
+                               argparse_email_type, argparse_uuid_type,
+                               argparse_positive_int_type,
+                               argparse_non_negative_int_type,
+                               argparse_positive_float_type,
+                               argparse_urls_file_type,
+                               argparse_readable_file_type)
 
 
 DESCRIPTION = 'TagCube client - %s' % TagCubeClient.DEFAULT_ROOT_URL
@@ -38,7 +46,7 @@ class TagCubeCLI(object):
         * Creates and configures a TagCubeClient instance
         * Launches a scan
     """
-    API_SUBCOMMAND = {'auth', 'scan', 'batch'}
+    API_SUBCOMMAND = {'auth', 'scan', 'batch', 'watch'}
 
     def __init__(self, cmd_args):
         self.cmd_args = cmd_args
@@ -57,19 +65,29 @@ class TagCubeCLI(object):
         """
         client = None
 
-        if self.cmd_args.subcommand in self.API_SUBCOMMAND:
+        if self.needs_client():
             email, api_key = TagCubeCLI.get_credentials(self.cmd_args)
-            client = TagCubeClient(email, api_key, verbose=self.cmd_args.verbose)
+            retry_policy = RetryPolicy(max_attempts=self.cmd_args.retries + 1)
+            client = TagCubeClient(email, api_key,
+                                   verbose=self.cmd_args.verbose,
+                                   cache_dir=self.cmd_args.cache_dir,
+                                   retry_policy=retry_policy,
+                                   rate_limiter=self.get_rate_limiter(),
+                                   pool_maxsize=self.get_pool_size(),
+                                   timeout=(self.cmd_args.connect_timeout,
+                                            self.cmd_args.read_timeout))
 
         subcommands = {'auth': do_auth_test,
                        'scan': do_scan_start,
                        'batch': do_batch_scan,
+                       'watch': do_watch,
                        'version': do_version}
 
         try:
-            subcommands.get(self.cmd_args.subcommand)(client, self.cmd_args)
+            subcommand = subcommands.get(self.cmd_args.subcommand)
+            exit_code = subcommand(client, self.cmd_args)
 
-        except ConnectionError, ce:
+        except (ConnectionError, Timeout), ce:
             msg = 'Failed to connect to TagCube REST API: "%s"'
             cli_logger.error(msg % ce)
             return 3
@@ -78,7 +96,46 @@ class TagCubeCLI(object):
             cli_logger.error('%s' % tae)
             return 4
 
-        return 0
+        # Most subcommands don't return anything, only batch uses this to
+        # report partial failures
+        return 0 if exit_code is None else exit_code
+
+    def needs_client(self):
+        """
+        :return: True if the subcommand sends requests to the REST API, batch
+                 --plan groups the URLs without sending any requests
+        """
+        if self.cmd_args.subcommand not in self.API_SUBCOMMAND:
+            return False
+
+        return getattr(self.cmd_args, 'plan', None) is None
+
+    def get_pool_size(self):
+        """
+        :return: The HTTP connection pool size, if the user didn't configure
+                 it we make sure it is large enough for all the batch workers
+                 and the client's shared quick_scan lookup threads
+        """
+        if self.cmd_args.pool_size is not None:
+            return self.cmd_args.pool_size
+
+        concurrency = getattr(self.cmd_args, 'concurrency', 1)
+        return max(TagCubeClient.DEFAULT_POOL_MAXSIZE,
+                   concurrency + TagCubeClient.LOOKUP_THREADS)
+
+    def get_rate_limiter(self):
+        """
+        :return: The rate limiter configured by the user, or None
+        """
+        rate = self.cmd_args.rate_limit
+        if rate is None:
+            return None
+
+        if self.cmd_args.rate_limit_file is not None:
+            return FileTokenBucket(self.cmd_args.rate_limit_file, rate,
+                                   burst=self.cmd_args.rate_burst)
+
+        return TokenBucket(rate, burst=self.cmd_args.rate_burst)
 
     @staticmethod
     def parse_args(args=None):
@@ -118,6 +175,77 @@ class TagCubeCLI(object):
                                    action='store_true',
                                    help='Enables verbose output')
 
+        common_parser.add_argument('--cache-dir',
+                                   required=False,
+                                   dest='cache_dir',
+                                   nargs='?',
+                                   const=TagCubeClient.DEFAULT_CACHE_DIR,
+                                   help='Cache the REST API resource lookups'
+                                        ' (scan profiles, domains, etc.) in'
+                                        ' this directory to share them between'
+                                        ' runs. Uses %s when no directory is'
+                                        ' specified.'
+                                        % TagCubeClient.DEFAULT_CACHE_DIR)
+
+        common_parser.add_argument('--retries',
+                                   required=False,
+                                   dest='retries',
+                                   default=2,
+                                   type=argparse_non_negative_int_type,
+                                   help='Number of times to retry REST API'
+                                        ' queries which failed because of'
+                                        ' connection errors or temporary'
+                                        ' unavailability. Defaults to two.')
+
+        common_parser.add_argument('--rate-limit',
+                                   required=False,
+                                   dest='rate_limit',
+                                   type=argparse_positive_float_type,
+                                   help='Max number of REST API requests per'
+                                        ' second')
+
+        common_parser.add_argument('--rate-burst',
+                                   required=False,
+                                   dest='rate_burst',
+                                   type=argparse_positive_int_type,
+                                   help='Number of REST API requests which can'
+                                        ' be sent at once without waiting,'
+                                        ' defaults to the --rate-limit value')
+
+        common_parser.add_argument('--rate-limit-file',
+                                   required=False,
+                                   dest='rate_limit_file',
+                                   help='Share the --rate-limit with all the'
+                                        ' tagcube processes which use this'
+                                        ' file')
+
+        connect_timeout, read_timeout = TagCubeClient.DEFAULT_TIMEOUT
+
+        common_parser.add_argument('--connect-timeout',
+                                   required=False,
+                                   dest='connect_timeout',
+                                   default=connect_timeout,
+                                   type=argparse_positive_float_type,
+                                   help='Seconds to wait for the connection to'
+                                        ' the REST API. Defaults to %s.'
+                                        % connect_timeout)
+
+        common_parser.add_argument('--read-timeout',
+                                   required=False,
+                                   dest='read_timeout',
+                                   default=read_timeout,
+                                   type=argparse_positive_float_type,
+                                   help='Seconds to wait for the REST API'
+                                        ' response. Defaults to %s.'
+                                        % read_timeout)
+
+        common_parser.add_argument('--pool-size',
+                                   required=False,
+                                   dest='pool_size',
+                                   type=argparse_positive_int_type,
+                                   help='Max number of HTTP connections to'
+                                        ' keep open to the REST API')
+
         #
         #   Parser for common scan arguments
         #
@@ -192,11 +320,152 @@ class TagCubeCLI(object):
                                              parents=[common_parser,
                                                       scan_common])
 
-        batch_parser.add_argument('--urls-file',
-                                  required=True,
-                                  dest='urls_file',
-                                  type=argparse.FileType('r'),
-                                  help='Text file containing one URL per line')
+        batch_input = batch_parser.add_mutually_exclusive_group(required=True)
+
+        batch_input.add_argument('--urls-file',
+                                 dest='urls_file',
+                                 type=argparse_urls_file_type,
+                                 help='Text file containing one URL per line.'
+                                      ' Can be gzip or zstd compressed, use'
+                                      ' "-" to read the URLs from stdin.')
+
+        batch_input.add_argument('--from-plan',
+                                 dest='from_plan',
+                                 type=argparse_readable_file_type,
+                                 help='Launch the scans in a plan file'
+                                      ' created using --plan')
+
+        batch_parser.add_argument('--plan',
+                                  required=False,
+                                  dest='plan',
+                                  help='Write the scans which would be'
+                                       ' launched to this file (JSON lines)'
+                                       ' and exit, no requests are sent to'
+                                       ' the REST API')
+
+        grouping = batch_parser.add_mutually_exclusive_group()
+
+        grouping.add_argument('--sorted-input',
+                              required=False,
+                              dest='sorted_input',
+                              action='store_true',
+                              help='The URLs file is sorted, for example'
+                                   ' using "sort -u". Scans are launched while'
+                                   ' the file is read and only the paths for'
+                                   ' a few hosts are kept in memory.')
+
+        grouping.add_argument('--spill-partitions',
+                              required=False,
+                              dest='spill_partitions',
+                              type=argparse_positive_int_type,
+                              help='Group the URLs using this number of'
+                                   ' temporary files instead of memory, use'
+                                   ' it for URL files which are too large'
+                                   ' to fit in memory')
+
+        grouping.add_argument('--parse-workers',
+                              required=False,
+                              dest='parse_workers',
+                              type=argparse_positive_int_type,
+                              help='Parse and group the URLs using this'
+                                   ' number of processes, use it for very'
+                                   ' large URL files. The scans are the same'
+                                   ' regardless of the number of processes.')
+
+        batch_parser.add_argument('--max-paths',
+                                  required=False,
+                                  dest='max_paths',
+                                  type=argparse_positive_int_type,
+                                  help='Max number of paths to send in each'
+                                       ' scan, the rest are ignored unless'
+                                       ' --split-scans is set')
+
+        batch_parser.add_argument('--split-scans',
+                                  required=False,
+                                  dest='split_scans',
+                                  action='store_true',
+                                  help='Start more than one scan for domains'
+                                       ' with more than --max-paths paths')
+
+        batch_parser.add_argument('--collapse-ids',
+                                  required=False,
+                                  dest='collapse_ids',
+                                  action='store_true',
+                                  help='Send only one path for each path'
+                                       ' template, where numeric and UUID'
+                                       ' segments are IDs. For example'
+                                       ' /users/1 and /users/2 are the same'
+                                       ' template.')
+
+        batch_parser.add_argument('--concurrency',
+                                  required=False,
+                                  dest='concurrency',
+                                  default=1,
+                                  type=argparse_positive_int_type,
+                                  help='Number of scans to launch in parallel.'
+                                       ' Defaults to one.')
+
+        batch_parser.add_argument('--journal',
+                                  required=False,
+                                  dest='journal',
+                                  help='Append the result of each scan launch'
+                                       ' to this file, use it with --resume'
+                                       ' to continue an interrupted batch')
+
+        batch_parser.add_argument('--resume',
+                                  required=False,
+                                  dest='resume',
+                                  help='Skip the scans which were launched'
+                                       ' according to this journal file and'
+                                       ' append the new results to it (unless'
+                                       ' --journal is set)')
+
+        #
+        #   Watch subcommand
+        #
+        _help = ('Wait for scans to finish, showing their status when it'
+                 ' changes')
+        watch_parser = subparsers.add_parser('watch',
+                                             help=_help,
+                                             parents=[common_parser])
+
+        watch_parser.add_argument('scan_ids',
+                                  nargs='*',
+                                  metavar='SCAN_ID',
+                                  help='The IDs of the scans to watch')
+
+        watch_parser.add_argument('--journal',
+                                  required=False,
+                                  dest='journal',
+                                  type=argparse_readable_file_type,
+                                  help='Watch the scans launched by a batch'
+                                       ' which used this --journal file')
+
+        watch_parser.add_argument('--timeout',
+                                  required=False,
+                                  dest='timeout',
+                                  type=argparse_positive_float_type,
+                                  help='Max number of seconds to wait for'
+                                       ' the scans to finish, waits forever by'
+                                       ' default')
+
+        watch_parser.add_argument('--min-interval',
+                                  required=False,
+                                  dest='min_interval',
+                                  default=TagCubeClient.DEFAULT_POLL_MIN_INTERVAL,
+                                  type=argparse_positive_float_type,
+                                  help='Min number of seconds between two'
+                                       ' status queries for the same scan')
+
+        watch_parser.add_argument('--max-interval',
+                                  required=False,
+                                  dest='max_interval',
+                                  default=TagCubeClient.DEFAULT_POLL_MAX_INTERVAL,
+                                  type=argparse_positive_float_type,
+                                  help='Max number of seconds between two'
+                                       ' status queries for the same scan,'
+                                       ' used for scans which take long to'
+                                       ' finish')
 
         #
         #   Version subcommand
@@ -209,6 +478,7 @@ class TagCubeCLI(object):
         handlers = {'scan': TagCubeCLI.handle_scan_args,
                     'auth': TagCubeCLI.handle_auth_args,
                     'batch': TagCubeCLI.handle_batch_args,
+                    'watch': TagCubeCLI.handle_watch_args,
                     'version': TagCubeCLI.handle_version_args,}
 
         handler = handlers.get(cmd_args.subcommand)
@@ -223,6 +493,14 @@ class TagCubeCLI(object):
         if len([x for x in together if x is not None]) == 1:
             parser.error('--key and --email must be used together')
 
+        if cmd_args.rate_limit is None:
+            # Without a rate no limit is applied, don't silently ignore them
+            if cmd_args.rate_limit_file is not None:
+                parser.error('--rate-limit-file requires --rate-limit')
+
+            if cmd_args.rate_burst is not None:
+                parser.error('--rate-burst requires --rate-limit')
+
         #   Enable debugging if required by the user
         level = logging.DEBUG if cmd_args.verbose else logging.INFO
         cli_logger.setLevel(level=level)
@@ -248,6 +526,35 @@ class TagCubeCLI(object):
     @staticmethod
     def handle_batch_args(parser, cmd_args):
         TagCubeCLI.handle_global_args(parser, cmd_args)
+
+        if cmd_args.split_scans and cmd_args.max_paths is None:
+            parser.error('--split-scans requires --max-paths')
+
+        if cmd_args.plan is not None and (cmd_args.journal or cmd_args.resume):
+            parser.error('--plan can not be used with --journal or --resume')
+
+        if cmd_args.from_plan is not None:
+            grouping = (cmd_args.plan, cmd_args.sorted_input,
+                        cmd_args.spill_partitions, cmd_args.parse_workers,
+                        cmd_args.max_paths, cmd_args.collapse_ids)
+
+            if any(grouping):
+                parser.error('--from-plan can not be used with --plan or the'
+                             ' URL grouping arguments, the scans in the plan'
+                             ' are already grouped')
+
+        return cmd_args
+
+    @staticmethod
+    def handle_watch_args(parser, cmd_args):
+        TagCubeCLI.handle_global_args(parser, cmd_args)
+
+        if not cmd_args.scan_ids and cmd_args.journal is None:
+            parser.error('Specify the scan IDs to watch or a --journal file')
+
+        if cmd_args.min_interval > cmd_args.max_interval:
+            parser.error('--min-interval must be lower than --max-interval')
+
         return cmd_args
 
     @staticmethod
@@ -1,36 +1,498 @@
-from urlparse import urlparse
+import os
+import re
+import sys
+import json
+import Queue
+import shutil
+import logging
+import time
+import tempfile
+import itertools
+import threading
+import collections
+import multiprocessing
+
+from requests.exceptions import RequestException
+
+from tagcube.utils import urlparsing
+from tagcube.utils.exceptions import TagCubeAPIException
 from tagcube_cli.logger import cli_logger
 
+# Exit code used when at least one of the scans in the batch failed to launch
+PARTIAL_FAILURE_EXIT_CODE = 5
+
+# Errors which only affect the scan being launched, the rest of the batch is
+# launched anyways
+SCAN_LAUNCH_ERRORS = (RequestException, TagCubeAPIException, ValueError)
+
+# Number of lines sent to each worker process by create_scans_parallel()
+PARSE_CHUNK_SIZE = 50000
+
+# Number of hosts kept open by iter_sorted_scans()
+SORTED_INPUT_WINDOW = 16
+
+# Paths up to this length are interned by BatchScan, see its docstring
+INTERN_MAX_LENGTH = 16
+
+NON_ASCII_RE = re.compile('[\x80-\xff]')
+
 
 def do_batch_scan(client, cmd_args):
+    if cmd_args.plan is not None:
+        return do_batch_plan(cmd_args)
+
     if not client.test_auth_credentials():
         raise ValueError('Invalid TagCube REST API credentials.')
 
     cli_logger.debug('Authentication credentials are valid')
 
-    for scan in create_scans(cmd_args.urls_file):
-        scan_resource = client.quick_scan(scan.get_root_url(),
-                                          email_notify=cmd_args.email_notify,
-                                          scan_profile=cmd_args.scan_profile,
+    scans = get_scans(cmd_args)
+
+    if cmd_args.resume is not None:
+        completed = BatchJournal.read_completed(cmd_args.resume)
+        scans = iter_pending_scans(scans, completed)
+
+    journal = None
+    journal_filename = cmd_args.journal or cmd_args.resume
+
+    if journal_filename is not None:
+        journal = BatchJournal(journal_filename)
+
+    launcher = ScanLauncher(client,
+                            email_notify=cmd_args.email_notify,
+                            scan_profile=cmd_args.scan_profile,
+                            concurrency=cmd_args.concurrency,
+                            journal=journal)
+
+    try:
+        launcher.run(scans)
+    finally:
+        if journal is not None:
+            journal.close()
+
+    return launcher.log_summary()
+
+
+def iter_pending_scans(scans, completed):
+    """
+    :param completed: A set with the keys (see BatchJournal.get_key) of the
+                      scans which were launched in a previous run
+    :return: A generator yielding the scans which are not completed
+    """
+    skipped = 0
+
+    for scan in scans:
+        if BatchJournal.get_key(scan) in completed:
+            skipped += 1
+            continue
+
+        yield scan
+
+    msg = 'Skipped %s scans which were launched in a previous run'
+    cli_logger.info(msg % skipped)
+
+
+def do_batch_plan(cmd_args):
+    """
+    Group the URLs and write the scans which would be launched to the plan
+    file, without sending any requests to the REST API.
+    """
+    # Write to a temporary file and rename it, errors don't leave a partial
+    # plan which could be launched
+    plan_dir = os.path.dirname(os.path.abspath(cmd_args.plan))
+    tmp_fd, tmp_filename = tempfile.mkstemp(dir=plan_dir, prefix='.tmp-')
+
+    try:
+        with os.fdopen(tmp_fd, 'w') as plan_file:
+            summary = write_plan(get_scans(cmd_args), plan_file)
+        os.rename(tmp_filename, cmd_args.plan)
+    except:
+        os.unlink(tmp_filename)
+        raise
+
+    msg = ('Batch plan written to %s: %s scans, %s paths and between %s and'
+           ' %s REST API requests')
+    args = (cmd_args.plan, summary['scans'], summary['paths'],
+            summary['api_calls']['min'], summary['api_calls']['max'])
+    cli_logger.info(msg % args)
+
+
+class ScanLauncher(object):
+    """
+    Launches the scans in a batch using a bounded pool of worker threads. Each
+    worker calls client.quick_scan() for one BatchScan at the time, the
+    producer blocks when all the workers are busy and the queue is full, so
+    the number of scans waiting to be launched is never larger than
+    2 * concurrency.
+
+    Errors which only affect one scan (see SCAN_LAUNCH_ERRORS) are logged and
+    counted, any other exception stops the launcher and is re-raised in the
+    thread which called run().
+
+    quick_scan() creates the domain, verification and email notification
+    resources when they don't exist. The resources shared by all the scans
+    are looked up (or created) in prepare(), before the workers start, and
+    the scans for the same domain are launched one at the time, so the
+    workers never race to create the same resource.
+    """
+    def __init__(self, client, email_notify=None, scan_profile='full_audit',
+                 concurrency=1, journal=None):
+        self.client = client
+        self.email_notify = email_notify
+        self.scan_profile = scan_profile
+        self.concurrency = max(1, concurrency)
+        self.journal = journal
+
+        self.launched = []
+        self.failed = []
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._fatal_exc_info = None
+
+        # Domain name => [lock, number of threads using it]
+        self._domain_locks = {}
+
+    def prepare(self):
+        """
+        Look up the scan profile and look up (or create) the email
+        notification used by all the scans. The client caches them, so
+        quick_scan() finds them instead of creating them once per worker.
+
+        :return: None
+        """
+        if self.client.get_scan_profile(self.scan_profile) is None:
+            msg = 'The specified scan profile "%s" does not exist'
+            raise ValueError(msg % self.scan_profile)
+
+        notif_email = self.email_notify
+        if notif_email is None:
+            notif_email = self.client.email
+
+        if self.client.get_email_notification(notif_email) is None:
+            self.client.email_notification_add(notif_email)
+
+    def run(self, scans):
+        """
+        Launch all the scans
+
+        :param scans: An iterable with BatchScan instances
+        :return: None
+        """
+        self.prepare()
+
+        if self.concurrency == 1:
+            for scan in scans:
+                self.launch(scan)
+            return
+
+        queue = Queue.Queue(maxsize=self.concurrency * 2)
+        workers = []
+
+        for _ in xrange(self.concurrency):
+            worker = threading.Thread(target=self._worker, args=(queue,))
+            worker.daemon = True
+            worker.start()
+            workers.append(worker)
+
+        try:
+            for scan in scans:
+                if self._stop.is_set():
+                    break
+                queue.put(scan)
+        except:
+            self._stop.set()
+            raise
+        finally:
+            for _ in workers:
+                queue.put(None)
+
+            for worker in workers:
+                # Join with timeout to be able to receive KeyboardInterrupt
+                while worker.is_alive():
+                    worker.join(0.5)
+
+        if self._fatal_exc_info is not None:
+            exc_type, exc_value, exc_tb = self._fatal_exc_info
+            raise exc_type, exc_value, exc_tb
+
+    def _worker(self, queue):
+        while True:
+            scan = queue.get()
+
+            if scan is None:
+                break
+
+            if self._stop.is_set():
+                # Keep consuming to unblock the producer
+                continue
+
+            try:
+                self.launch(scan)
+            except:
+                self._fatal_exc_info = sys.exc_info()
+                self._stop.set()
+
+    def launch(self, scan):
+        """
+        Launch one scan, log and store the result.
+
+        :param scan: The BatchScan to launch
+        :return: None
+        """
+        root_url = scan.get_root_url()
+        name = scan.get_name()
+
+        try:
+            scan_resource = self._quick_scan(scan, root_url)
+        except SCAN_LAUNCH_ERRORS, sle:
+            msg = 'Failed to launch scan to %s: "%s"'
+            cli_logger.error(msg % (name, get_error_message(sle)))
+
+            with self._lock:
+                self.failed.append((name, sle))
+
+            if self.journal is not None:
+                self.journal.record(scan, error=sle)
+        else:
+            # pylint: disable=E1101
+            args = (scan_resource.id, name)
+            cli_logger.info('Launched scan #%s to %s' % args)
+
+            with self._lock:
+                self.launched.append((name, scan_resource.id))
+
+            if self.journal is not None:
+                self.journal.record(scan, scan_id=scan_resource.id)
+            # pylint: enable=E1101
+
+    def _quick_scan(self, scan, root_url):
+        domain_lock = self._acquire_domain_lock(scan.domain)
+
+        try:
+            return self.client.quick_scan(root_url,
+                                          email_notify=self.email_notify,
+                                          scan_profile=self.scan_profile,
                                           path_list=scan.get_paths())
+        finally:
+            self._release_domain_lock(scan.domain, domain_lock)
+
+    def _acquire_domain_lock(self, domain):
+        """
+        Wait until no other worker is launching a scan for domain, the scans
+        for different protocols, ports and parts of the same domain would
+        otherwise all try to create the domain (and verification).
+
+        :return: The lock entry to pass to _release_domain_lock()
+        """
+        with self._lock:
+            entry = self._domain_locks.get(domain)
+            if entry is None:
+                entry = self._domain_locks[domain] = [threading.Lock(), 0]
+            entry[1] += 1
+
+        entry[0].acquire()
+        return entry
+
+    def _release_domain_lock(self, domain, entry):
+        entry[0].release()
+
+        # Only keep the locks for the domains being launched
+        with self._lock:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._domain_locks[domain]
+
+    def log_summary(self):
+        """
+        Log the total launched and failed scans
+
+        :return: The exit code for the batch command
+        """
+        args = (len(self.launched), len(self.failed))
+        cli_logger.info('Batch finished: %s scans launched, %s failed' % args)
 
-        # pylint: disable=E1101
-        args = (scan_resource.id, scan.get_root_url())
-        cli_logger.info('Launched scan #%s to %s' % args)
-        # pylint: enable=E1101
+        for root_url, error in self.failed:
+            args = (root_url, get_error_message(error))
+            cli_logger.info('    Failed: %s (%s)' % args)
 
+        return PARTIAL_FAILURE_EXIT_CODE if self.failed else 0
 
-def create_scans(urls_file):
+
+class BatchJournal(object):
     """
-    This method is rather simple, it will group the urls to be scanner together
-    based on (protocol, domain and port).
+    Append-only log with the result of each scan launched by a batch, one
+    JSON object per line:
 
-    :param urls_file: The filename with all the URLs
-    :return: A list of scans to be run
+        {"protocol": "http", "domain": "a.com", "port": 80, "part": null,
+         "scan_id": 123, "error": null, "time": 1459000000.0}
+
+    Running the batch again using --resume skips the scans which were
+    launched, so failed and not yet launched scans are the only ones sent.
+
+    Each line is written to the OS when the scan is launched, so the journal
+    survives the process being killed. Calling fsync() after each line
+    would slow down the launch, so the file is synced every `fsync_every`
+    lines or `fsync_interval` seconds (whichever happens first), and when
+    the journal is closed.
     """
-    cli_logger.debug('Starting to process batch input file')
-    created_scans = []
+    def __init__(self, filename, fsync_every=100, fsync_interval=1.0,
+                 clock=time.time):
+        self.filename = filename
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.clock = clock
+
+        self._fd = open(filename, 'a+')
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._last_sync = clock()
+
+        # Start a new line if the last one was not completely written
+        self._fd.seek(0, os.SEEK_END)
+        if self._fd.tell():
+            self._fd.seek(-1, os.SEEK_END)
+            last_char = self._fd.read(1)
+            self._fd.seek(0, os.SEEK_END)
+
+            if last_char != '\n':
+                self._fd.write('\n')
+
+    @staticmethod
+    def get_key(scan):
+        """
+        :return: The key which identifies a scan between runs
+        """
+        return scan.protocol, scan.domain, scan.port, scan.part
+
+    def record(self, scan, scan_id=None, error=None):
+        """
+        Write the result of launching one scan to the journal
+        """
+        data = {'protocol': scan.protocol,
+                'domain': scan.domain,
+                'port': scan.port,
+                'part': scan.part,
+                'scan_id': scan_id,
+                'error': None if error is None else unicode(error),
+                'time': self.clock()}
+        line = json.dumps(data, sort_keys=True) + '\n'
+
+        with self._lock:
+            self._fd.write(line)
+            self._fd.flush()
+            self._pending += 1
+
+            if (self._pending >= self.fsync_every or
+                    self.clock() - self._last_sync >= self.fsync_interval):
+                self._sync()
+
+    def _sync(self):
+        os.fsync(self._fd.fileno())
+        self._pending = 0
+        self._last_sync = self.clock()
+
+    def close(self):
+        with self._lock:
+            if self._fd.closed:
+                return
+
+            if self._pending:
+                self._sync()
+
+            self._fd.close()
+
+    @classmethod
+    def read_completed(cls, filename):
+        """
+        :return: A set with the keys of the scans which were launched, a
+                 missing journal file means no scans were launched
+        """
+        completed = set()
+
+        for data in cls.iter_records(filename):
+            if data.get('scan_id') is None:
+                continue
+
+            completed.add((str(data['protocol']), str(data['domain']),
+                           data['port'], data['part']))
+
+        return completed
+
+    @staticmethod
+    def iter_records(filename):
+        """
+        :return: A generator yielding the dicts stored in the journal, in
+                 the order they were written
+        """
+        if not os.path.exists(filename):
+            return
+
+        with open(filename) as journal_fd:
+            for line_number, line in enumerate(journal_fd, 1):
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # The last line might be incomplete if the process was
+                    # killed while writing it
+                    msg = 'Ignoring invalid line %s in batch journal %s'
+                    cli_logger.warning(msg % (line_number, filename))
+
+
+def get_scans(cmd_args):
+    """
+    :return: An iterable with the BatchScans to launch, grouped using the
+             strategy selected by the user
+    """
+    policy = PathPolicy(max_paths=cmd_args.max_paths,
+                        collapse_ids=cmd_args.collapse_ids,
+                        split=cmd_args.split_scans)
+
+    if cmd_args.from_plan is not None:
+        # The plan already has the grouped and split scans
+        return iter_plan_scans(cmd_args.from_plan)
+
+    if cmd_args.sorted_input:
+        scans = iter_sorted_scans(cmd_args.urls_file, policy=policy)
+
+    elif cmd_args.spill_partitions is not None:
+        scans = iter_spilled_scans(cmd_args.urls_file,
+                                   cmd_args.spill_partitions,
+                                   policy=policy)
+
+    elif cmd_args.parse_workers is not None:
+        scans = create_scans_parallel(cmd_args.urls_file,
+                                      cmd_args.parse_workers,
+                                      policy=policy)
+
+    else:
+        scans = create_scans(cmd_args.urls_file, policy=policy)
+
+    return iter_policy_scans(scans)
+
+
+def iter_policy_scans(scans):
+    """
+    Split the scans with too many paths and log the ones which had paths
+    dropped because of PathPolicy.max_paths
+
+    :return: A generator yielding BatchScan instances
+    """
+    for scan in scans:
+        if scan.dropped_paths:
+            msg = '%s paths were not added to the %s scan (--max-paths)'
+            cli_logger.debug(msg % (scan.dropped_paths, scan.get_root_url()))
+
+        for scan_part in scan.split():
+            yield scan_part
+
 
+def iter_parsed_urls(urls_file):
+    """
+    :param urls_file: An iterable with the lines in the batch input file
+    :return: A generator yielding (protocol, domain, port, path) for each URL,
+             blank lines, comments and invalid URLs are skipped.
+    """
     for line in urls_file:
         line = line.strip()
 
@@ -41,26 +503,409 @@ def create_scans(urls_file):
             continue
 
         try:
-            protocol, domain, port, path = parse_url(line)
+            yield parse_url(line)
         except ValueError, ve:
             cli_logger.debug(str(ve))
-            continue
 
-        for scan in created_scans:
-            if scan.matches(protocol, domain, port):
-                scan.add_path(path)
+
+def create_scans(urls_file, policy=None):
+    """
+    This method is rather simple, it will group the urls to be scanner together
+    based on (protocol, domain and port).
+
+    :param urls_file: The filename with all the URLs
+    :param policy: The PathPolicy for the created scans
+    :return: A list of scans to be run
+    """
+    cli_logger.debug('Starting to process batch input file')
+    debug = cli_logger.isEnabledFor(logging.DEBUG)
+
+    # Index the scans by (protocol, domain, port) to find the scan for each
+    # URL in constant time, created_scans keeps the input order
+    scans_index = {}
+    created_scans = []
+
+    for protocol, domain, port, path in iter_parsed_urls(urls_file):
+        key = (protocol, domain, port)
+        scan = scans_index.get(key)
+
+        if scan is not None:
+            scan.add_path(path)
+
+            if debug:
                 args = (path, scan.get_root_url())
                 cli_logger.debug('Added %s to %s' % args)
-                break
         else:
-            scan = BatchScan(protocol, domain, port, path)
+            scan = BatchScan(protocol, domain, port, path, policy=policy)
+            scans_index[key] = scan
             created_scans.append(scan)
-            cli_logger.debug('Added a new scan to %s' % scan.get_root_url())
+
+            if debug:
+                cli_logger.debug('Added a new scan to %s' % scan.get_root_url())
 
     cli_logger.debug('Created a total of %s scans' % len(created_scans))
     return created_scans
 
 
+def create_scans_parallel(urls_file, workers, chunk_size=PARSE_CHUNK_SIZE,
+                          policy=None):
+    """
+    Same as create_scans() but the URLs are parsed and grouped by a pool of
+    `workers` processes. The input is read in chunks of `chunk_size` lines,
+    each chunk is grouped by one of the workers and the groups are merged in
+    input order, so the result is the same as create_scans() regardless of
+    the number of workers.
+
+    Only 2 * workers chunks are read ahead, the rest of the input is read as
+    the workers finish. The workers remove the duplicated paths, so only the
+    unique paths of each chunk are sent back to this process and added to
+    the scans.
+
+    :param urls_file: An iterable with the lines in the batch input file
+    :param workers: The number of processes to use
+    :param chunk_size: The number of lines sent to each worker
+    :param policy: The PathPolicy for the created scans
+    :return: A list of scans to be run
+    """
+    cli_logger.debug('Processing batch input file with %s workers' % workers)
+
+    scans_index = {}
+    created_scans = []
+
+    pool = multiprocessing.Pool(workers)
+
+    try:
+        pending = collections.deque()
+        chunks = iter_chunks(urls_file, chunk_size)
+
+        for chunk in chunks:
+            pending.append(pool.apply_async(group_chunk, (chunk,)))
+
+            if len(pending) < 2 * workers:
+                continue
+
+            merge_groups(get_async_result(pending.popleft()), scans_index,
+                         created_scans, policy)
+
+        while pending:
+            merge_groups(get_async_result(pending.popleft()), scans_index,
+                         created_scans, policy)
+    finally:
+        pool.terminate()
+        pool.join()
+
+    cli_logger.debug('Created a total of %s scans' % len(created_scans))
+    return created_scans
+
+
+def get_async_result(async_result, interval=0.5):
+    """
+    AsyncResult.get() without a timeout can't be interrupted with Ctrl-C in
+    Python 2, wait in short intervals instead.
+
+    :return: The result of the AsyncResult
+    """
+    while True:
+        try:
+            return async_result.get(interval)
+        except multiprocessing.TimeoutError:
+            continue
+
+
+def iter_chunks(urls_file, chunk_size):
+    """
+    :return: A generator yielding lists with up to chunk_size lines
+    """
+    urls_file = iter(urls_file)
+
+    while True:
+        chunk = list(itertools.islice(urls_file, chunk_size))
+        if not chunk:
+            return
+
+        yield chunk
+
+
+def group_chunk(lines):
+    """
+    Runs in the worker processes, parses the lines and groups them by
+    (protocol, domain, port). Each path is only returned once, in the order
+    it was first seen, so the merge applies the PathPolicy exactly as
+    create_scans() does.
+
+    :return: A list of ((protocol, domain, port), paths, repeated) tuples, in
+             the order each key was first seen. `repeated` maps the paths
+             which appear more than once to their number of extra
+             occurrences, they are needed to count the dropped paths.
+    """
+    groups_index = {}
+    groups = []
+
+    for protocol, domain, port, path in iter_parsed_urls(lines):
+        key = (protocol, domain, port)
+        group = groups_index.get(key)
+
+        if group is None:
+            group = groups_index[key] = (key, [], {})
+            groups.append(group)
+
+        occurrences = group[2]
+        if path in occurrences:
+            occurrences[path] += 1
+        else:
+            occurrences[path] = 0
+            group[1].append(path)
+
+    return [(key, paths, dict((p, n) for p, n in occurrences.iteritems() if n))
+            for key, paths, occurrences in groups]
+
+
+def merge_groups(groups, scans_index, created_scans, policy):
+    """
+    Add the groups returned by group_chunk() to the scans
+    """
+    for key, paths, repeated in groups:
+        scan = scans_index.get(key)
+
+        if scan is None:
+            protocol, domain, port = key
+            scan = BatchScan(protocol, domain, port, policy=policy)
+            scans_index[key] = scan
+            created_scans.append(scan)
+
+        if not repeated:
+            for path in paths:
+                scan.add_path(path)
+            continue
+
+        for path in paths:
+            dropped_paths = scan.dropped_paths
+            scan.add_path(path)
+
+            # The scan is full, create_scans() drops every occurrence
+            if scan.dropped_paths != dropped_paths:
+                scan.dropped_paths += repeated.get(path, 0)
+
+
+def iter_sorted_scans(urls_file, policy=None, window=SORTED_INPUT_WINDOW):
+    """
+    Group URLs from a sorted input, for example the output of `sort -u`.
+    Scans are yielded while the input is read, so they are launched before
+    the whole input is read.
+
+    URLs are grouped by the parsed (protocol, domain, port), but `sort`
+    compares the raw lines. For example http://a.com, http://a.com.b/ and
+    http://a.com/x are sorted in that order, and http://a.com:80/ comes after
+    http://a.com0.net/. The scans for the last `window` hosts are kept open
+    to group those URLs, and a scan is yielded when URLs for `window` other
+    hosts were read after its last URL.
+
+    URLs for the same host which are further apart create more than one scan
+    for the host, and a warning is logged. This happens when the input is
+    not sorted, or when the host name is written with different case
+    (http://A.com/ and http://a.com/).
+
+    Memory usage is the paths of the `window` open scans, plus the
+    (protocol, domain, port) of each host read, which are needed to detect
+    unsorted inputs.
+
+    :param urls_file: An iterable with the lines in the batch input file
+    :param policy: The PathPolicy for the created scans
+    :param window: The number of scans to keep open
+    :return: A generator yielding BatchScan instances
+    """
+    seen_keys = set()
+    open_scans = collections.OrderedDict()
+    last_key = None
+    last_scan = None
+
+    for protocol, domain, port, path in iter_parsed_urls(urls_file):
+        key = (protocol, domain, port)
+
+        if key == last_key:
+            last_scan.add_path(path)
+            continue
+
+        # Keep the most recently used scans at the end
+        scan = open_scans.pop(key, None)
+
+        if scan is None:
+            if key in seen_keys:
+                msg = ('The batch input file is not sorted, %s://%s/ will be'
+                       ' scanned more than once')
+                netloc = urlparsing.format_netloc(domain, port)
+                cli_logger.warning(msg % (protocol, netloc))
+
+            seen_keys.add(key)
+            scan = BatchScan(protocol, domain, port, path, policy=policy)
+
+            if len(open_scans) >= window:
+                yield open_scans.popitem(last=False)[1]
+        else:
+            scan.add_path(path)
+
+        open_scans[key] = scan
+        last_key, last_scan = key, scan
+
+    for scan in open_scans.itervalues():
+        yield scan
+
+
+def iter_spilled_scans(urls_file, partitions=64, tmp_dir=None,
+                       policy=None):
+    """
+    Group URLs from an unsorted input without keeping all of them in memory.
+    The input is read once and each URL is written to one of `partitions`
+    temporary files, all URLs for the same (protocol, domain, port) go to the
+    same file. Then each file is grouped in memory using create_scans(), so
+    memory usage is bounded by the largest partition instead of the input.
+
+    :param urls_file: An iterable with the lines in the batch input file
+    :param partitions: The number of temporary files to use
+    :param tmp_dir: Where to create the temporary files
+    :param policy: The PathPolicy for the created scans
+    :return: A generator yielding BatchScan instances
+    """
+    spill_dir = tempfile.mkdtemp(prefix='tagcube-batch-', dir=tmp_dir)
+
+    try:
+        filenames = [os.path.join(spill_dir, '%s.txt' % i)
+                     for i in xrange(partitions)]
+        partition_fds = [open(filename, 'w') for filename in filenames]
+
+        try:
+            for protocol, domain, port, path in iter_parsed_urls(urls_file):
+                key = (protocol, domain, port)
+                partition_fd = partition_fds[hash(key) % partitions]
+                netloc = urlparsing.format_netloc(domain, port)
+                partition_fd.write('%s://%s%s\n' % (protocol, netloc, path))
+        finally:
+            for partition_fd in partition_fds:
+                partition_fd.close()
+
+        msg = 'Batch input file split into %s partitions in %s'
+        cli_logger.debug(msg % (partitions, spill_dir))
+
+        for filename in filenames:
+            with open(filename) as partition_fd:
+                scans = create_scans(partition_fd, policy=policy)
+
+            os.unlink(filename)
+
+            for scan in scans:
+                yield scan
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+
+def write_plan(scans, plan_file):
+    """
+    Write the scans to the plan file, one JSON object per line. Each line
+    contains one scan (see BatchScan.to_dict) and the number of REST API
+    requests quick_scan() is expected to send for it, the last line is a
+    summary for the whole batch.
+
+    The number of requests depends on which domains, verifications and email
+    notifications already exist in the user's account, so we predict the min
+    and max assuming the resource cache is empty when the batch starts:
+
+        * Once per batch: test the credentials, get the scan profile and
+          email notification, and create the notification if missing
+
+        * Once per domain: get the domain, then it is cached
+
+        * Once per scan: get the latest verification (unless the domain was
+          just created) and create one if missing, create the domain if
+          missing and create the scan
+
+    :param scans: An iterable with BatchScan instances
+    :param plan_file: A file object opened for writing
+    :return: The summary dict
+    """
+    seen_domains = set()
+    summary = {'type': 'summary',
+               'scans': 0,
+               'paths': 0,
+               'api_calls': {'min': 3, 'max': 4}}
+
+    for scan in scans:
+        min_calls = max_calls = 0
+
+        if scan.domain not in seen_domains:
+            seen_domains.add(scan.domain)
+            min_calls += 1
+            max_calls += 1
+
+        # GET verification / POST domain, POST verification, POST scan
+        min_calls += 2
+        max_calls += 3
+
+        data = scan.to_dict()
+        data['api_calls'] = {'min': min_calls, 'max': max_calls}
+        plan_file.write(json.dumps(data, sort_keys=True) + '\n')
+
+        summary['scans'] += 1
+        summary['paths'] += data['path_count']
+        summary['api_calls']['min'] += min_calls
+        summary['api_calls']['max'] += max_calls
+
+    plan_file.write(json.dumps(summary, sort_keys=True) + '\n')
+    return summary
+
+
+def iter_plan_scans(filename):
+    """
+    Read a plan file created by write_plan()
+
+    :return: A generator yielding BatchScan instances
+    """
+    with open(filename) as plan_file:
+        for line_number, line in enumerate(plan_file, 1):
+            try:
+                data = json.loads(line)
+            except ValueError:
+                msg = 'Invalid batch plan file %s, line %s is not JSON'
+                raise ValueError(msg % (filename, line_number))
+
+            if data.get('type') != 'scan':
+                continue
+
+            yield BatchScan.from_dict(data)
+
+
+def get_error_message(error):
+    """
+    :return: The message for error as a UTF-8 encoded str. The REST API
+             error messages are unicode, str(error) raises
+             UnicodeEncodeError when they are not ASCII.
+    """
+    try:
+        return str(error)
+    except UnicodeEncodeError:
+        return unicode(error).encode('utf-8')
+
+
+def quote_non_utf8(path):
+    """
+    The paths are sent to the REST API (and written to the batch plan) as
+    JSON, which can only contain UTF-8 text. The non-ASCII bytes in paths
+    which are not valid UTF-8 are percent-encoded, which is the same URL.
+
+    :param path: The path as read from the batch input file
+    :return: A path which can be encoded as JSON
+    """
+    if not isinstance(path, str) or NON_ASCII_RE.search(path) is None:
+        return path
+
+    try:
+        path.decode('utf-8')
+    except UnicodeDecodeError:
+        return NON_ASCII_RE.sub(lambda match: '%%%02X' % ord(match.group()),
+                                path)
+
+    return path
+
+
 def parse_url(url):
     """
     Parse a URL into the parts I need for processing:
@@ -72,55 +917,146 @@ def parse_url(url):
     :param url: A string
     :return: A tuple containing the above
     """
-    split_url = url.split('/', 3)
-    if len(split_url) == 3:
-        # http://foo.com
-        path = '/'
-    elif len(split_url) == 4:
-        path = '/' + split_url[3]
-    else:
-        raise ValueError('Invalid URL: %s' % url)
-
-    try:
-        parse_result = urlparse(url)
-    except Exception:
-        raise ValueError('Invalid URL: %s' % url)
+    protocol, domain, port, path = urlparsing.parse_url(url)
 
-    protocol = parse_result.scheme
-    protocol = protocol.lower()
     if protocol not in ('http', 'https'):
         raise ValueError('Invalid URL protocol "%s"' % protocol)
 
-    split_netloc = parse_result.netloc.split(':')
-    domain = split_netloc[0]
-    domain = domain.lower()
+    return protocol, domain, port, path
 
-    if len(split_netloc) == 2:
-        try:
-            port = int(split_netloc[1])
-        except:
-            raise ValueError('Invalid port: "%s"' % split_netloc[1])
-    elif protocol == 'https':
-        port = 443
-    elif protocol == 'http':
-        port = 80
-    else:
-        raise ValueError('Invalid scheme: "%s"' % protocol)
 
-    return protocol, domain, port, path
+class PathPolicy(object):
+    """
+    Controls how many paths are sent in each scan:
+
+        * max_paths: The max number of paths to send in each scan, extra
+          paths are dropped unless split is set. None means no limit.
+
+        * collapse_ids: Numeric, UUID and long hex path segments (and numeric
+          query string values) are considered IDs, only the first path for
+          each template (/users/{id}/posts/{id}) is kept since the crawler
+          will find the same code paths in all of them.
+
+        * split: Instead of dropping the paths over max_paths, start more
+          than one scan for the same protocol, domain and port.
+    """
+    __slots__ = ('max_paths', 'collapse_ids', 'split')
+
+    ID_RE = re.compile('(?<=/)(?:[0-9]+|[0-9a-fA-F]{16,}|'
+                       '[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-'
+                       '[0-9a-fA-F]{4}-[0-9a-fA-F]{12})(?=/|\\?|$)'
+                       '|(?<==)[0-9]+(?=&|$)')
+
+    def __init__(self, max_paths=None, collapse_ids=False, split=False):
+        self.max_paths = max_paths
+        self.collapse_ids = collapse_ids
+        self.split = split
+
+    def get_path_key(self, path):
+        """
+        :return: The key used to de-duplicate paths, the template when
+                 collapsing IDs, else the path itself
+        """
+        if self.collapse_ids:
+            return self.ID_RE.sub('{id}', path)
+
+        return path
+
+    def is_full(self, path_count):
+        """
+        :return: True if no more paths can be added to a scan with path_count
+                 paths
+        """
+        if self.max_paths is None or self.split:
+            return False
+
+        return path_count >= self.max_paths
+
+
+DEFAULT_PATH_POLICY = PathPolicy()
 
 
 class BatchScan(object):
-    def __init__(self, protocol, domain, port, path):
+    """
+    All the paths to scan in one protocol, domain and port.
+
+    There might be hundreds of thousands of these in a batch, each with lots
+    of paths, so we use __slots__ and intern() the short paths: common ones
+    such as "/" or "/robots.txt" are stored only once for all the scans. Long
+    paths are usually unique, interning them would only grow the interned
+    strings table.
+
+    The paths are stored in a set, a dict which maps each path template to
+    the path is only needed when the policy collapses IDs.
+    """
+    __slots__ = ('protocol', 'domain', 'port', 'part', 'policy', 'paths',
+                 'dropped_paths')
+
+    def __init__(self, protocol, domain, port, path=None,
+                 policy=None):
         self.protocol = protocol
         self.domain = domain
         self.port = port
+        self.policy = policy or DEFAULT_PATH_POLICY
+
+        # Set when a scan is split in many parts
+        self.part = None
 
-        self.paths = set()
-        self.paths.add(path)
+        # The paths which will be sent, or a dict which maps the
+        # de-duplication key (see PathPolicy.get_path_key) to the path
+        self.paths = {} if self.policy.collapse_ids else set()
+        self.dropped_paths = 0
+
+        if path is not None:
+            self.add_path(path)
 
     def get_root_url(self):
-        return '%s://%s:%s/' % (self.protocol, self.domain, self.port)
+        netloc = urlparsing.format_netloc(self.domain, self.port)
+        return '%s://%s/' % (self.protocol, netloc)
+
+    def get_name(self):
+        """
+        :return: A human readable name for the scan, used in logs
+        """
+        if self.part is None:
+            return self.get_root_url()
+
+        return '%s (part %s)' % (self.get_root_url(), self.part)
+
+    def get_key(self):
+        return self.protocol, self.domain, self.port
+
+    def to_dict(self):
+        """
+        :return: The scan as a dict, as stored in the batch plan file
+        """
+        paths = self.get_paths()
+
+        return {'type': 'scan',
+                'root_url': self.get_root_url(),
+                'protocol': self.protocol,
+                'domain': self.domain,
+                'port': self.port,
+                'part': self.part,
+                'path_count': len(paths),
+                'dropped_paths': self.dropped_paths,
+                'paths': paths}
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        :return: The BatchScan for a dict created by to_dict(), the paths are
+                 added as they are, without applying any PathPolicy
+        """
+        scan = cls(str(data['protocol']), str(data['domain']),
+                   int(data['port']))
+        scan.part = data.get('part')
+        scan.dropped_paths = data.get('dropped_paths', 0)
+
+        for path in data['paths']:
+            scan.add_path(path.encode('utf-8'))
+
+        return scan
 
     def matches(self, protocol, domain, port):
         return (self.protocol == protocol and
@@ -128,7 +1064,55 @@ class BatchScan(object):
                 self.port == port)
 
     def add_path(self, path):
-        return self.paths.add(path)
+        path = quote_non_utf8(path)
+
+        if isinstance(path, str) and len(path) <= INTERN_MAX_LENGTH:
+            path = intern(path)
+
+        key = self.policy.get_path_key(path)
+        if key in self.paths:
+            return
+
+        if self.policy.is_full(len(self.paths)):
+            self.dropped_paths += 1
+            return
+
+        if self.policy.collapse_ids:
+            self.paths[key] = path
+        else:
+            self.paths.add(path)
 
     def get_paths(self):
-        return list(self.paths)
\ No newline at end of file
+        """
+        :return: The paths to send in the scan, sorted to make the scan
+                 configuration deterministic
+        """
+        if self.policy.collapse_ids:
+            return sorted(self.paths.itervalues())
+
+        return sorted(self.paths)
+
+    def split(self):
+        """
+        :return: A list of BatchScans with at most policy.max_paths paths, or
+                 [self] if there is no need to split this scan
+        """
+        max_paths = self.policy.max_paths
+
+        if max_paths is None or len(self.paths) <= max_paths:
+            return [self]
+
+        paths = self.get_paths()
+        scans = []
+
+        for part, start in enumerate(xrange(0, len(paths), max_paths), 1):
+            scan = BatchScan(self.protocol, self.domain, self.port,
+                             policy=self.policy)
+            scan.part = part
+
+            for path in paths[start:start + max_paths]:
+                scan.add_path(path)
+
+            scans.append(scan)
+
+        return scans
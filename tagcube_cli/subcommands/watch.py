@@ -0,0 +1,79 @@
+from tagcube_cli.logger import cli_logger
+from tagcube_cli.subcommands.batch import BatchJournal, get_error_message
+
+# Exit code used when the timeout expired before all the scans finished
+WATCH_TIMEOUT_EXIT_CODE = 6
+
+# Exit code used when at least one of the scans could not be retrieved
+WATCH_FAILED_EXIT_CODE = 7
+
+
+def do_watch(client, cmd_args):
+    """
+    Handle the case where the user runs "tagcube watch"
+    """
+    scan_ids = get_scan_ids(cmd_args)
+    if not scan_ids:
+        raise ValueError('There are no scans to watch')
+
+    cli_logger.info('Watching %s scans' % len(scan_ids))
+
+    def log_scan_change(scan_id, scan_resource):
+        status = scan_resource.get(client.SCAN_STATUS_FIELD, 'unknown')
+        progress = client.get_scan_progress(scan_resource)
+
+        if progress is None:
+            cli_logger.info('Scan #%s: %s' % (scan_id, status))
+        else:
+            args = (scan_id, status, progress)
+            cli_logger.info('Scan #%s: %s (%.0f%%)' % args)
+
+    results = client.wait_for_scans(scan_ids,
+                                    timeout=cmd_args.timeout,
+                                    min_interval=cmd_args.min_interval,
+                                    max_interval=cmd_args.max_interval,
+                                    callback=log_scan_change)
+
+    for scan_id in scan_ids:
+        if scan_id in results.errors:
+            error = get_error_message(results.errors[scan_id])
+            cli_logger.error('Scan #%s: %s' % (scan_id, error))
+
+    finished = [scan_id for scan_id in scan_ids
+                if scan_id in results
+                and client.is_scan_finished(results[scan_id])]
+
+    failed = len(results.errors)
+    running = len(scan_ids) - len(finished) - failed
+
+    args = (len(finished), running, failed)
+    msg = 'Watch finished: %s scans finished, %s running, %s failed'
+    cli_logger.info(msg % args)
+
+    if failed:
+        return WATCH_FAILED_EXIT_CODE
+
+    return WATCH_TIMEOUT_EXIT_CODE if running else 0
+
+
+def get_scan_ids(cmd_args):
+    """
+    :return: The scan ids from the command line and the batch journal, in the
+             same order and without duplicates
+    """
+    scan_ids = list(cmd_args.scan_ids)
+
+    if cmd_args.journal is not None:
+        for data in BatchJournal.iter_records(cmd_args.journal):
+            if data.get('scan_id') is not None:
+                scan_ids.append(str(data['scan_id']))
+
+    seen = set()
+    unique_scan_ids = []
+
+    for scan_id in scan_ids:
+        if scan_id not in seen:
+            seen.add(scan_id)
+            unique_scan_ids.append(scan_id)
+
+    return unique_scan_ids
@@ -0,0 +1,455 @@
+import os
+import json
+import tempfile
+import unittest
+import threading
+
+from StringIO import StringIO
+
+from mock import Mock, patch
+
+from tagcube.utils.exceptions import TagCubeAPIException
+from tagcube.utils.resource import Resource
+from tagcube_cli.subcommands.batch import (ScanLauncher, BatchScan,
+                                           do_batch_plan,
+                                           PathPolicy, create_scans,
+                                           iter_sorted_scans,
+                                           iter_spilled_scans, parse_url,
+                                           create_scans_parallel,
+                                           group_chunk,
+                                           write_plan, iter_plan_scans,
+                                           BatchJournal, iter_pending_scans,
+                                           PARTIAL_FAILURE_EXIT_CODE)
+
+
+def get_grouping(scans):
+    return sorted((s.get_root_url(), sorted(s.get_paths())) for s in scans)
+
+
+class TestCreateScans(unittest.TestCase):
+    def test_group_by_protocol_domain_port(self):
+        urls = ['http://a.com/foo',
+                'http://a.com/bar',
+                'https://a.com/foo',
+                'http://a.com:8080/',
+                '# comment',
+                '',
+                'ftp://a.com/invalid']
+
+        scans = create_scans(urls)
+
+        self.assertEqual([s.get_root_url() for s in scans],
+                         ['http://a.com:80/',
+                          'https://a.com:443/',
+                          'http://a.com:8080/'])
+        self.assertEqual(sorted(scans[0].get_paths()), ['/bar', '/foo'])
+
+    def test_sorted_input(self):
+        urls = ['http://a.com/1',
+                'http://a.com/2',
+                'http://b.com/1',
+                'https://b.com/1',
+                'https://b.com/2']
+
+        scans = iter_sorted_scans(urls)
+
+        # Scans are yielded while the input is read
+        self.assertEqual(sorted(next(scans).get_paths()), ['/1', '/2'])
+        self.assertEqual(get_grouping(scans),
+                         [('http://b.com:80/', ['/1']),
+                          ('https://b.com:443/', ['/1', '/2'])])
+
+    def test_sorted_input_window(self):
+        # The order "sort -u" uses for these URLs
+        urls = ['http://a.com',
+                'http://a.com.b/1',
+                'http://a.com/2',
+                'http://a.com0.net/',
+                'http://a.com:80/3']
+
+        with patch('tagcube_cli.subcommands.batch.cli_logger') as logger:
+            self.assertEqual(get_grouping(iter_sorted_scans(urls)),
+                             [('http://a.com.b:80/', ['/1']),
+                              ('http://a.com0.net:80/', ['/']),
+                              ('http://a.com:80/', ['/', '/2', '/3'])])
+            self.assertEqual(logger.warning.call_count, 0)
+
+            # A scan is yielded when `window` other hosts were read
+            urls = ['http://a.com/', 'http://b.com/', 'http://c.com/',
+                    'http://a.com/x']
+            scans = list(iter_sorted_scans(urls, window=2))
+
+            self.assertEqual([s.get_root_url() for s in scans],
+                             ['http://a.com:80/', 'http://b.com:80/',
+                              'http://c.com:80/', 'http://a.com:80/'])
+            self.assertEqual(logger.warning.call_count, 1)
+
+    def test_spilled_grouping(self):
+        urls = ['http://host-%s.com/%s' % (i % 7, i) for i in xrange(100)]
+        urls.append('https://host-1.com:8443/')
+
+        self.assertEqual(get_grouping(iter_spilled_scans(urls, partitions=3)),
+                         get_grouping(create_scans(urls)))
+
+    def test_parallel_grouping(self):
+        urls = ['http://host-%s.com/p%s' % (i % 7, i % 13) for i in xrange(200)]
+        urls.extend(['invalid', '', 'https://host-1.com:8443/'])
+
+        for policy in (PathPolicy(max_paths=5),
+                       PathPolicy(max_paths=3, collapse_ids=True)):
+            expected = [(s.get_root_url(), s.get_paths(), s.dropped_paths)
+                        for s in create_scans(urls, policy=policy)]
+
+            for workers in (1, 3):
+                scans = create_scans_parallel(urls, workers, chunk_size=17,
+                                              policy=policy)
+                self.assertEqual([(s.get_root_url(), s.get_paths(),
+                                   s.dropped_paths) for s in scans], expected)
+
+    def test_group_chunk_unique_paths(self):
+        lines = ['http://a.com/1', 'http://b.com/', 'http://a.com/2',
+                 'http://a.com/1', 'http://a.com/1']
+
+        self.assertEqual(group_chunk(lines),
+                         [(('http', 'a.com', 80), ['/1', '/2'], {'/1': 2}),
+                          (('http', 'b.com', 80), ['/'], {})])
+
+    def test_ipv6_hosts(self):
+        urls = ['http://[::1]:8080/a', 'http://[::1]:8080/b', 'http://[::1]/']
+
+        self.assertEqual(get_grouping(iter_spilled_scans(urls, partitions=2)),
+                         [('http://[::1]:80/', ['/']),
+                          ('http://[::1]:8080/', ['/a', '/b'])])
+
+    def test_parse_url(self):
+        self.assertEqual(parse_url('https://User@A.com:8443'),
+                         ('https', 'a.com', 8443, '/'))
+        self.assertRaises(ValueError, parse_url, 'ftp://a.com/')
+        self.assertRaises(ValueError, parse_url, 'http://a.com:x/')
+
+
+class TestBatchScan(unittest.TestCase):
+    def test_paths_sorted_and_unique(self):
+        scan = BatchScan('http', 'a.com', 80, '/b')
+        scan.add_path('/a')
+        scan.add_path('/b')
+
+        self.assertEqual(scan.get_paths(), ['/a', '/b'])
+
+    def test_path_storage(self):
+        long_path = '/%s' % ('x' * 100)
+        scan = BatchScan('http', 'a.com', 80, ''.join(['/', 'robots.txt']))
+        scan.add_path(''.join(['/', long_path[1:]]))
+
+        # Only the collapsing policy needs to map templates to paths
+        self.assertIsInstance(scan.paths, set)
+
+        short, long_ = sorted(scan.paths, key=len)
+        self.assertIs(short, intern('/robots.txt'))
+        self.assertIsNot(long_, intern(long_path))
+
+        scan = BatchScan('http', 'a.com', 80, '/users/1',
+                         policy=PathPolicy(collapse_ids=True))
+        scan.add_path('/users/2')
+
+        self.assertEqual(scan.paths, {'/users/{id}': '/users/1'})
+
+    def test_max_paths(self):
+        scan = BatchScan('http', 'a.com', 80, policy=PathPolicy(max_paths=2))
+
+        for i in xrange(5):
+            scan.add_path('/%s' % i)
+
+        self.assertEqual(scan.get_paths(), ['/0', '/1'])
+        self.assertEqual(scan.dropped_paths, 3)
+        self.assertEqual(scan.split(), [scan])
+
+    def test_split(self):
+        policy = PathPolicy(max_paths=2, split=True)
+        scan = BatchScan('http', 'a.com', 80, policy=policy)
+
+        for i in xrange(5):
+            scan.add_path('/%s' % i)
+
+        parts = scan.split()
+
+        self.assertEqual([p.get_paths() for p in parts],
+                         [['/0', '/1'], ['/2', '/3'], ['/4']])
+        self.assertEqual(parts[2].get_name(), 'http://a.com:80/ (part 3)')
+
+    def test_collapse_ids(self):
+        scan = BatchScan('http', 'a.com', 80,
+                         policy=PathPolicy(collapse_ids=True))
+
+        for path in ('/users/1/posts/2', '/users/3/posts/4',
+                     '/users/1/edit', '/item?id=10', '/item?id=11',
+                     '/f/0123456789abcdef0123', '/v2/'):
+            scan.add_path(path)
+
+        self.assertEqual(scan.get_paths(),
+                         ['/f/0123456789abcdef0123', '/item?id=10',
+                          '/users/1/edit', '/users/1/posts/2', '/v2/'])
+
+
+class TestPlan(unittest.TestCase):
+    def test_write_and_read(self):
+        urls = ['http://a.com/1', 'http://a.com/2', 'https://a.com/',
+                'http://b.com/\xc3\xa9', 'http://a.com/3']
+        policy = PathPolicy(max_paths=2, split=True)
+        scans = [part for scan in create_scans(urls, policy=policy)
+                 for part in scan.split()]
+
+        plan_file = StringIO()
+        summary = write_plan(scans, plan_file)
+
+        lines = [json.loads(l) for l in plan_file.getvalue().splitlines()]
+        self.assertEqual([l['type'] for l in lines], ['scan'] * 4 + ['summary'])
+        self.assertEqual(lines[1]['root_url'], 'http://a.com:80/')
+        self.assertEqual(lines[1]['part'], 2)
+        self.assertEqual(lines[1]['paths'], ['/3'])
+
+        # a.com is only queried for the first scan
+        self.assertEqual([l['api_calls']['min'] for l in lines[:4]],
+                         [3, 2, 2, 3])
+        self.assertEqual(summary, lines[-1])
+        self.assertEqual(summary['paths'], 5)
+        self.assertEqual(summary['api_calls'], {'min': 13, 'max': 18})
+
+        fd, filename = tempfile.mkstemp()
+        self.addCleanup(os.unlink, filename)
+
+        with os.fdopen(fd, 'w') as fh:
+            fh.write(plan_file.getvalue())
+
+        self.assertEqual([(s.get_name(), s.get_paths())
+                          for s in iter_plan_scans(filename)],
+                         [(s.get_name(), s.get_paths()) for s in scans])
+
+
+    def test_non_utf8_path(self):
+        scans = list(create_scans(['http://a.com/\xe9?q=\xff',
+                                   'http://a.com/caf\xc3\xa9']))
+
+        plan_file = StringIO()
+        write_plan(scans, plan_file)
+
+        fd, filename = tempfile.mkstemp()
+        self.addCleanup(os.unlink, filename)
+
+        with os.fdopen(fd, 'w') as fh:
+            fh.write(plan_file.getvalue())
+
+        # Valid UTF-8 is kept, the rest is percent-encoded
+        self.assertEqual([s.get_paths() for s in iter_plan_scans(filename)],
+                         [['/%E9?q=%FF', '/caf\xc3\xa9']])
+
+    def test_plan_error(self):
+        plan_dir = tempfile.mkdtemp()
+        self.addCleanup(os.rmdir, plan_dir)
+
+        cmd_args = Mock()
+        cmd_args.plan = os.path.join(plan_dir, 'plan.jsonl')
+
+        def write_plan(scans, plan_file):
+            plan_file.write('{"type": "scan"')
+            raise KeyboardInterrupt()
+
+        with patch('tagcube_cli.subcommands.batch.get_scans'), \
+             patch('tagcube_cli.subcommands.batch.write_plan', write_plan):
+            self.assertRaises(KeyboardInterrupt, do_batch_plan, cmd_args)
+
+        # No partial plan, and the temporary file was removed
+        self.assertEqual(os.listdir(plan_dir), [])
+
+
+class TestScanLauncher(unittest.TestCase):
+    def get_scans(self, count):
+        return [BatchScan('http', 'host-%s.com' % i, 80, '/')
+                for i in xrange(count)]
+
+    def test_concurrent_launch(self):
+        threads = set()
+        calls = []
+
+        def quick_scan(root_url, **kwargs):
+            # Mock's call_count is not thread-safe
+            calls.append(root_url)
+            threads.add(threading.current_thread().name)
+            return Resource({'id': root_url})
+
+        client = Mock()
+        client.quick_scan.side_effect = quick_scan
+
+        launcher = ScanLauncher(client, concurrency=4)
+        launcher.run(self.get_scans(50))
+
+        self.assertEqual(len(calls), 50)
+        self.assertEqual(len(launcher.launched), 50)
+        self.assertEqual(launcher.failed, [])
+        self.assertEqual(launcher.log_summary(), 0)
+        self.assertNotIn(threading.current_thread().name, threads)
+
+    def test_partial_failure(self):
+        def quick_scan(root_url, **kwargs):
+            if 'host-3.' in root_url:
+                raise TagCubeAPIException('Domain quota exceeded')
+            return Resource({'id': 1})
+
+        client = Mock()
+        client.quick_scan.side_effect = quick_scan
+
+        for concurrency in (1, 3):
+            launcher = ScanLauncher(client, concurrency=concurrency)
+            launcher.run(self.get_scans(10))
+
+            self.assertEqual(len(launcher.launched), 9)
+            self.assertEqual([url for url, _ in launcher.failed],
+                             ['http://host-3.com:80/'])
+            self.assertEqual(launcher.log_summary(), PARTIAL_FAILURE_EXIT_CODE)
+
+    def test_non_ascii_error(self):
+        def quick_scan(root_url, **kwargs):
+            if 'host-3.' in root_url:
+                raise TagCubeAPIException(u'Invalid domain b\xfccher.de')
+            return Resource({'id': 1})
+
+        client = Mock()
+        client.quick_scan.side_effect = quick_scan
+
+        launcher = ScanLauncher(client, concurrency=3)
+
+        with patch('tagcube_cli.subcommands.batch.cli_logger') as logger:
+            launcher.run(self.get_scans(6))
+            self.assertEqual(launcher.log_summary(),
+                             PARTIAL_FAILURE_EXIT_CODE)
+
+        self.assertEqual(len(launcher.launched), 5)
+        self.assertEqual(len(launcher.failed), 1)
+        logger.error.assert_called_once_with(
+            'Failed to launch scan to http://host-3.com:80/: '
+            '"Invalid domain b\xc3\xbccher.de"')
+
+    def test_unexpected_error_is_raised(self):
+        client = Mock()
+        client.quick_scan.side_effect = KeyError('unexpected')
+
+        launcher = ScanLauncher(client, concurrency=3)
+        self.assertRaises(KeyError, launcher.run, self.get_scans(10))
+
+    def test_same_new_domain(self):
+        created = []
+        event = threading.Event()
+
+        def quick_scan(root_url, **kwargs):
+            # Check-then-create, like TagCubeClient.quick_scan()
+            if 'a.com' not in created:
+                # Give the other worker time to start the same launch
+                event.wait(0.2)
+                created.append('a.com')
+            else:
+                event.set()
+            return Resource({'id': root_url})
+
+        client = Mock()
+        client.quick_scan.side_effect = quick_scan
+
+        scans = [BatchScan('http', 'a.com', 80, '/'),
+                 BatchScan('https', 'a.com', 443, '/'),
+                 BatchScan('http', 'b.com', 80, '/')]
+
+        launcher = ScanLauncher(client, concurrency=2)
+        launcher.run(scans)
+
+        self.assertEqual(created, ['a.com'])
+        self.assertEqual(len(launcher.launched), 3)
+        self.assertEqual(launcher._domain_locks, {})
+
+    def test_prepare_shared_resources(self):
+        client = Mock()
+        client.email = 'user@example.com'
+        client.get_email_notification.return_value = None
+        client.quick_scan.return_value = Resource({'id': 1})
+
+        launcher = ScanLauncher(client, concurrency=4)
+        launcher.run(self.get_scans(10))
+
+        client.get_scan_profile.assert_called_once_with('full_audit')
+        client.email_notification_add.assert_called_once_with(
+            'user@example.com')
+        self.assertEqual(client.quick_scan.call_count, 10)
+
+        client = Mock()
+        client.get_scan_profile.return_value = None
+
+        launcher = ScanLauncher(client, scan_profile='not_exists',
+                                concurrency=4)
+        self.assertRaises(ValueError, launcher.run, self.get_scans(10))
+        self.assertEqual(client.quick_scan.call_count, 0)
+
+
+class TestBatchJournal(unittest.TestCase):
+    def setUp(self):
+        fd, self.filename = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.unlink, self.filename)
+
+    def test_fsync_batching(self):
+        journal = BatchJournal(self.filename, fsync_every=3,
+                               fsync_interval=3600)
+
+        with patch('tagcube_cli.subcommands.batch.os.fsync') as fsync_mock:
+            for i in xrange(7):
+                scan = BatchScan('http', 'host-%s.com' % i, 80, '/')
+                journal.record(scan, scan_id=i)
+
+            self.assertEqual(fsync_mock.call_count, 2)
+
+            journal.close()
+            self.assertEqual(fsync_mock.call_count, 3)
+
+        self.assertEqual(len(BatchJournal.read_completed(self.filename)), 7)
+
+    def test_non_ascii_error(self):
+        journal = BatchJournal(self.filename)
+        error = TagCubeAPIException(u'Invalid domain b\xfccher.de')
+        journal.record(BatchScan('http', 'a.com', 80), error=error)
+        journal.close()
+
+        records = list(BatchJournal.iter_records(self.filename))
+        self.assertEqual([r['error'] for r in records],
+                         [u'Invalid domain b\xfccher.de'])
+
+    def test_resume_retries_failed(self):
+        def quick_scan(root_url, **kwargs):
+            if 'host-3.' in root_url:
+                raise TagCubeAPIException('Domain quota exceeded')
+            return Resource({'id': 1})
+
+        client = Mock()
+        client.quick_scan.side_effect = quick_scan
+        scans = [BatchScan('http', 'host-%s.com' % i, 80, '/')
+                 for i in xrange(5)]
+
+        journal = BatchJournal(self.filename)
+        ScanLauncher(client, concurrency=2, journal=journal).run(scans)
+        journal.close()
+
+        # Simulate the process being killed while writing a line
+        with open(self.filename, 'a') as fh:
+            fh.write('{"protocol": "ht')
+
+        completed = BatchJournal.read_completed(self.filename)
+        self.assertEqual(len(completed), 4)
+
+        pending = list(iter_pending_scans(scans, completed))
+        self.assertEqual([s.get_root_url() for s in pending],
+                         ['http://host-3.com:80/'])
+
+        client.quick_scan.side_effect = None
+        client.quick_scan.return_value = Resource({'id': 2})
+
+        journal = BatchJournal(self.filename)
+        ScanLauncher(client, journal=journal).run(pending)
+        journal.close()
+
+        self.assertEqual(len(BatchJournal.read_completed(self.filename)), 5)
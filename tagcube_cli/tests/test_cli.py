@@ -73,4 +73,37 @@ class TestTagCubeCLI(unittest.TestCase):
             self.assertRaises(TypeError, TagCubeCLI.parse_args, args)
 
             self.assertEqual(exit_mock.call_args_list, [call(2)])
-            self.assertEqual(stderr_mock.call_args_list, [])
\ No newline at end of file
+            self.assertEqual(stderr_mock.call_args_list, [])
+
+    def test_rate_limit_file_without_rate(self):
+        args = self.SIMPLE_ARGS + ['--rate-limit-file', '/tmp/tagcube.rate']
+
+        with patch('argparse._sys.stderr'):
+            self.assertRaises(SystemExit, TagCubeCLI.parse_args, args)
+
+        parsed_args = TagCubeCLI.parse_args(args + ['--rate-limit', '2'])
+        self.assertEqual(parsed_args.rate_limit_file, '/tmp/tagcube.rate')
+
+    def test_batch_plan_without_credentials(self):
+        urls_file = tempfile.NamedTemporaryFile('w', delete=False)
+        urls_file.write('http://a.com/foo\nhttp://a.com/bar\n')
+        urls_file.close()
+
+        plan_file = tempfile.NamedTemporaryFile('w', delete=False)
+        plan_file.close()
+
+        args = ['batch', '--urls-file', urls_file.name,
+                '--plan', plan_file.name]
+
+        parsed_args = TagCubeCLI.parse_args(args)
+        self.assertEqual(TagCubeCLI(parsed_args).run(), 0)
+
+        args = ['batch', '--from-plan', plan_file.name]
+        parsed_args = TagCubeCLI.parse_args(args)
+        self.assertTrue(TagCubeCLI(parsed_args).needs_client())
+
+        with open(plan_file.name) as fh:
+            self.assertIn('"paths": ["/bar", "/foo"]', fh.read())
+
+        os.unlink(urls_file.name)
+        os.unlink(plan_file.name)
@@ -1,8 +1,13 @@
 import unittest
 import tempfile
+import gzip
 import os
 
-from tagcube_cli.utils import _parse_config_file_impl
+from StringIO import StringIO
+
+from tagcube_cli.utils import (_parse_config_file_impl, open_urls_file,
+                               open_urls_stream, iter_lines,
+                               GzipStreamReader)
 
 
 CONFIG_FMT = '''\
@@ -38,3 +43,52 @@ class TestParseConfigFile(unittest.TestCase):
         email, api_token = _parse_config_file_impl(fh.name)
         self.assertEqual(email, None)
         self.assertEqual(api_token, None)
+
+
+class TestOpenURLsFile(unittest.TestCase):
+
+    URLS = 'http://a.com/1\nhttp://a.com/2\n'
+
+    def test_plain(self):
+        fh = tempfile.NamedTemporaryFile('w', delete=False)
+        fh.write(self.URLS)
+        fh.close()
+
+        self.assertEqual(''.join(open_urls_file(fh.name)), self.URLS)
+        os.unlink(fh.name)
+
+    def test_gzip(self):
+        fh = tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False)
+        fh.close()
+
+        gzip_fh = gzip.open(fh.name, 'wb')
+        gzip_fh.write(self.URLS)
+        gzip_fh.close()
+
+        self.assertEqual(list(open_urls_file(fh.name)),
+                         ['http://a.com/1\n', 'http://a.com/2\n'])
+        os.unlink(fh.name)
+
+    def test_stream(self):
+        compressed = StringIO()
+
+        # Two gzip members, like the output of "cat a.gz b.gz"
+        for data in (self.URLS, 'http://b.com/\n'):
+            gzip_fh = gzip.GzipFile(fileobj=compressed, mode='wb')
+            gzip_fh.write(data)
+            gzip_fh.close()
+
+        for stream in (StringIO(self.URLS + 'http://b.com/\n'),
+                       StringIO(compressed.getvalue())):
+            self.assertEqual(list(open_urls_stream(stream)),
+                             ['http://a.com/1\n', 'http://a.com/2\n',
+                              'http://b.com/\n'])
+
+        reader = GzipStreamReader(StringIO(compressed.getvalue()))
+        self.assertEqual(list(iter_lines(reader, chunk_size=3)),
+                         ['http://a.com/1\n', 'http://a.com/2\n',
+                          'http://b.com/\n'])
+
+    def test_iter_lines(self):
+        self.assertEqual(list(iter_lines(StringIO('a\nbc\nd'), chunk_size=3)),
+                         ['a\n', 'bc\n', 'd'])
@@ -0,0 +1,66 @@
+import os
+import tempfile
+import unittest
+
+from mock import Mock, patch
+
+from tagcube.utils.exceptions import TagCubeNotFoundException
+from tagcube.utils.resource import Resource, ResourceDict
+from tagcube_cli.subcommands.batch import BatchJournal, BatchScan
+from tagcube_cli.subcommands.watch import (do_watch, get_scan_ids,
+                                           WATCH_TIMEOUT_EXIT_CODE,
+                                           WATCH_FAILED_EXIT_CODE)
+
+
+class TestWatch(unittest.TestCase):
+    def get_cmd_args(self, scan_ids, journal=None):
+        return Mock(scan_ids=scan_ids, journal=journal, timeout=None,
+                    min_interval=5, max_interval=120)
+
+    def test_scan_ids_from_journal(self):
+        fd, filename = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.unlink, filename)
+
+        journal = BatchJournal(filename)
+        journal.record(BatchScan('http', 'a.com', 80), scan_id=10)
+        journal.record(BatchScan('http', 'b.com', 80), error='Quota')
+        journal.record(BatchScan('http', 'c.com', 80), scan_id=11)
+        journal.close()
+
+        cmd_args = self.get_cmd_args(['11', '12'], journal=filename)
+        self.assertEqual(get_scan_ids(cmd_args), ['11', '12', '10'])
+
+    def test_exit_code(self):
+        client = Mock()
+        client.SCAN_STATUS_FIELD = 'status'
+        client.get_scan_progress.return_value = None
+        results = ResourceDict({'1': Resource({'status': 'a'})})
+        client.wait_for_scans.return_value = results
+
+        client.is_scan_finished.return_value = True
+        self.assertEqual(do_watch(client, self.get_cmd_args(['1'])), 0)
+
+        client.is_scan_finished.return_value = False
+        self.assertEqual(do_watch(client, self.get_cmd_args(['1'])),
+                         WATCH_TIMEOUT_EXIT_CODE)
+        self.assertEqual(do_watch(client, self.get_cmd_args(['1', '2'])),
+                         WATCH_TIMEOUT_EXIT_CODE)
+
+    def test_failed_scan(self):
+        client = Mock()
+        client.SCAN_STATUS_FIELD = 'status'
+        client.get_scan_progress.return_value = None
+        client.is_scan_finished.return_value = True
+
+        results = ResourceDict({'1': Resource({'status': 'finished'})})
+        results.errors['2'] = TagCubeNotFoundException('Unknown scan')
+        client.wait_for_scans.return_value = results
+
+        with patch('tagcube_cli.subcommands.watch.cli_logger') as logger:
+            exit_code = do_watch(client, self.get_cmd_args(['1', '2']))
+
+        self.assertEqual(exit_code, WATCH_FAILED_EXIT_CODE)
+        logger.error.assert_called_once_with('Scan #2: Unknown scan')
+        logger.info.assert_called_with('Watch finished: 1 scans finished, '
+                                       '0 running, 1 failed')
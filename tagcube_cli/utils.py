@@ -1,5 +1,8 @@
 import re
 import os
+import sys
+import gzip
+import zlib
 import yaml
 import argparse
 
@@ -9,6 +12,13 @@ INVALID_UUID = ('Invalid REST API key, the right format looks like'
                 ' 208e57a8-1173-49c9-b5f3-e15535e70e83 (include the dashes and'
                 ' verify length)')
 
+GZIP_MAGIC = '\x1f\x8b'
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+ZSTD_MAGIC = '\x28\xb5\x2f\xfd'
+
+ZSTD_NOT_INSTALLED = ('Reading zstd compressed files requires the zstandard'
+                      ' package, install it using "pip install zstandard"')
+
 INVALID_FILE = '''\
 Invalid .tagcube configuration file found, the expected format is:
 
@@ -185,6 +195,204 @@ def argparse_url_type(url):
     raise argparse.ArgumentTypeError(msg % url)
 
 
+def argparse_positive_int_type(value):
+    try:
+        value = int(value)
+    except ValueError:
+        value = 0
+
+    if value < 1:
+        msg = 'Expected a positive integer.'
+        raise argparse.ArgumentTypeError(msg)
+
+    return value
+
+
+def argparse_non_negative_int_type(value):
+    try:
+        value = int(value)
+    except ValueError:
+        value = -1
+
+    if value < 0:
+        msg = 'Expected zero or a positive integer.'
+        raise argparse.ArgumentTypeError(msg)
+
+    return value
+
+
+def argparse_positive_float_type(value):
+    try:
+        value = float(value)
+    except ValueError:
+        value = 0
+
+    if value <= 0:
+        msg = 'Expected a positive number.'
+        raise argparse.ArgumentTypeError(msg)
+
+    return value
+
+
+def argparse_urls_file_type(filename):
+    try:
+        return open_urls_file(filename)
+    except IOError, ioe:
+        msg = 'The provided --urls-file can not be read: %s'
+        raise argparse.ArgumentTypeError(msg % ioe)
+    except ImportError, ie:
+        raise argparse.ArgumentTypeError(str(ie))
+
+
+def argparse_readable_file_type(filename):
+    if not os.path.isfile(filename):
+        msg = 'The provided file %s does not exist'
+        raise argparse.ArgumentTypeError(msg % filename)
+
+    if not os.access(filename, os.R_OK):
+        msg = 'The provided file %s can not be read'
+        raise argparse.ArgumentTypeError(msg % filename)
+
+    return filename
+
+
+def open_urls_file(filename):
+    """
+    Open the batch input file, which can be plain text, gzip or zstd
+    compressed (detected using the file's magic bytes). A dash means that the
+    URLs are read from stdin.
+
+    :return: An iterable yielding the lines in the file
+    """
+    if filename == '-':
+        return open_urls_stream(sys.stdin)
+
+    urls_fd = open(filename, 'rb')
+    magic = urls_fd.read(4)
+    urls_fd.seek(0)
+
+    if magic.startswith(GZIP_MAGIC):
+        return gzip.GzipFile(fileobj=urls_fd)
+
+    if magic.startswith(ZSTD_MAGIC):
+        try:
+            import zstandard
+        except ImportError:
+            urls_fd.close()
+            raise ImportError(ZSTD_NOT_INSTALLED)
+
+        reader = zstandard.ZstdDecompressor().stream_reader(urls_fd)
+        return iter_lines(reader)
+
+    return urls_fd
+
+
+def open_urls_stream(stream):
+    """
+    Same as open_urls_file() for inputs which can't seek (stdin), the magic
+    bytes are read and then put back in front of the stream.
+
+    :return: An iterable yielding the lines in the stream
+    """
+    magic = stream.read(4)
+    reader = PrefixedReader(magic, stream)
+
+    if magic.startswith(GZIP_MAGIC):
+        return iter_lines(GzipStreamReader(reader))
+
+    if magic.startswith(ZSTD_MAGIC):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError(ZSTD_NOT_INSTALLED)
+
+        return iter_lines(zstandard.ZstdDecompressor().stream_reader(reader))
+
+    return iter_lines(reader)
+
+
+class PrefixedReader(object):
+    """
+    Read `prefix` and then the rest of `reader`
+    """
+    def __init__(self, prefix, reader):
+        self.prefix = prefix
+        self.reader = reader
+
+    def read(self, size=-1):
+        if not self.prefix:
+            return self.reader.read(size)
+
+        if size < 0:
+            data = self.prefix + self.reader.read()
+            self.prefix = ''
+            return data
+
+        data = self.prefix[:size]
+        self.prefix = self.prefix[size:]
+        return data
+
+
+class GzipStreamReader(object):
+    """
+    Decompress gzip data read from a stream which can't seek, gzip.GzipFile
+    needs to seek to find the end of each member.
+    """
+    def __init__(self, reader):
+        self.reader = reader
+        self.decompressor = zlib.decompressobj(GZIP_WBITS)
+
+    def read(self, size=2 ** 16):
+        """
+        :return: The decompressed data for the next `size` compressed bytes,
+                 an empty string at the end of the stream
+        """
+        while True:
+            chunk = self.reader.read(size)
+
+            if not chunk:
+                return self.decompressor.flush()
+
+            data = self._decompress(chunk)
+            if data:
+                return data
+
+    def _decompress(self, chunk):
+        data = []
+
+        while chunk:
+            data.append(self.decompressor.decompress(chunk))
+
+            # The data after the end of a member is the next member
+            chunk = self.decompressor.unused_data
+            if chunk:
+                self.decompressor = zlib.decompressobj(GZIP_WBITS)
+
+        return ''.join(data)
+
+
+def iter_lines(reader, chunk_size=2 ** 16):
+    """
+    :param reader: A file-like object which only implements read()
+    :return: A generator yielding the lines read from reader
+    """
+    pending = ''
+
+    while True:
+        chunk = reader.read(chunk_size)
+        if not chunk:
+            break
+
+        lines = (pending + chunk).split('\n')
+        pending = lines.pop()
+
+        for line in lines:
+            yield line + '\n'
+
+    if pending:
+        yield pending
+
+
 def argparse_path_list_type(path_file):
     if not os.path.exists(path_file):
         msg = 'The provided --path-file does not exist'